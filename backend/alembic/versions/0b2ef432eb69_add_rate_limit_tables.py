@@ -0,0 +1,40 @@
+"""Add rate limit tables
+
+Revision ID: 0b2ef432eb69
+Revises: 13bae7fe87c6
+Create Date: 2026-10-19 04:51:20.234601
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b2ef432eb69'
+down_revision: Union[str, Sequence[str], None] = '13bae7fe87c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('rate_limit_counters',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limit_counters')
+    op.drop_table('rate_limit_buckets')
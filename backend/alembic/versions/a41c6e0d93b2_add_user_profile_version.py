@@ -0,0 +1,28 @@
+"""Add user profile version
+
+Revision ID: a41c6e0d93b2
+Revises: 7de3eb17340b
+Create Date: 2026-10-19 06:12:40.117263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c6e0d93b2'
+down_revision: Union[str, Sequence[str], None] = '7de3eb17340b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_profiles', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_profiles', 'version')
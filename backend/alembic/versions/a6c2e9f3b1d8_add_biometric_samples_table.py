@@ -0,0 +1,43 @@
+"""Add biometric samples table
+
+Revision ID: a6c2e9f3b1d8
+Revises: d4f1a2b7c8e3
+Create Date: 2026-10-19 12:08:51.402716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e9f3b1d8'
+down_revision: Union[str, Sequence[str], None] = 'd4f1a2b7c8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('biometric_samples',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('value', sa.REAL(), nullable=False),
+    sa.Column('kind', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'kind', 'ts', name='pk_biometric_samples'),
+    postgresql_partition_by='RANGE (ts)'
+    )
+    op.create_index('ix_biometric_samples_ts_brin', 'biometric_samples', ['ts'], unique=False, postgresql_using='brin')
+    # Catch-all partition; monthly ones are added by biometrics.ensure_partitions when enabled
+    op.execute("CREATE TABLE biometric_samples_default PARTITION OF biometric_samples DEFAULT")
+    op.add_column('daily_checkins', sa.Column('wearable', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('daily_checkins', 'wearable')
+    op.drop_index('ix_biometric_samples_ts_brin', table_name='biometric_samples')
+    op.drop_table('biometric_samples')
@@ -0,0 +1,48 @@
+"""Add workout completion slot
+
+Revision ID: b3e8d1f4a9c6
+Revises: f2a7c9d4e5b1
+Create Date: 2026-10-19 10:41:17.230948
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8d1f4a9c6'
+down_revision: Union[str, Sequence[str], None] = 'f2a7c9d4e5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('workout_completions', sa.Column('slot', sa.String(length=50), nullable=True))
+    op.execute("UPDATE workout_completions SET slot = workout_type")
+    # Keep the newest row if concurrent requests ever stored a day twice
+    op.execute("""
+        DELETE FROM workout_completions
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, date, slot ORDER BY created_at DESC, id
+                ) AS n
+                FROM workout_completions
+            ) ranked
+            WHERE n > 1
+        )
+    """)
+    op.alter_column('workout_completions', 'slot', nullable=False)
+    # The unique index also serves (user_id, date) lookups
+    op.drop_index('ix_workout_completions_user_id_date', table_name='workout_completions')
+    op.create_unique_constraint('uq_workout_completions_user_date_slot', 'workout_completions', ['user_id', 'date', 'slot'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_workout_completions_user_date_slot', 'workout_completions', type_='unique')
+    op.create_index('ix_workout_completions_user_id_date', 'workout_completions', ['user_id', 'date'], unique=False)
+    op.drop_column('workout_completions', 'slot')
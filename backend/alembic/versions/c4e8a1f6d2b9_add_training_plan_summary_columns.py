@@ -0,0 +1,68 @@
+"""Add training plan summary columns and plan_data indexes
+
+Revision ID: c4e8a1f6d2b9
+Revises: a9d3e7b5f2c1
+Create Date: 2026-10-19 19:32:51.608413
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# Same DDL create_all runs, so the function and trigger are defined in one place
+from app.models.training_plan import PLAN_SUMMARY_FUNCTIONS
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f6d2b9'
+down_revision: Union[str, Sequence[str], None] = 'a9d3e7b5f2c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('training_plans', sa.Column('planned_minutes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('training_plans', sa.Column('run_minutes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('training_plans', sa.Column('hard_sessions', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('training_plans', sa.Column('minutes_by_type', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False))
+    op.add_column('training_plans', sa.Column('days_by_type', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False))
+
+    op.execute(PLAN_SUMMARY_FUNCTIONS)
+
+    # Backfill without bumping sync_version: the plans themselves haven't changed
+    op.execute("ALTER TABLE training_plans DISABLE TRIGGER training_plans_sync_touch")
+    op.execute("""
+        UPDATE training_plans p
+        SET planned_minutes = s.planned_minutes, run_minutes = s.run_minutes, hard_sessions = s.hard_sessions,
+            minutes_by_type = s.minutes_by_type, days_by_type = s.days_by_type
+        FROM training_plans t CROSS JOIN LATERAL plan_summary(t.plan_data) AS s
+        WHERE t.id = p.id
+    """)
+    op.execute("ALTER TABLE training_plans ENABLE TRIGGER training_plans_sync_touch")
+
+    op.drop_index('ix_training_plans_user_id_week_start_date', table_name='training_plans')
+    op.create_index('ix_training_plans_user_id_week_start_date', 'training_plans', ['user_id', 'week_start_date'], unique=False,
+                    postgresql_include=['is_active', 'planned_minutes', 'run_minutes', 'hard_sessions'])
+    op.create_index('ix_training_plans_plan_data', 'training_plans', ['plan_data'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'plan_data': 'jsonb_path_ops'})
+    op.create_index('ix_training_plans_days_by_type', 'training_plans', ['days_by_type'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_training_plans_days_by_type', table_name='training_plans')
+    op.drop_index('ix_training_plans_plan_data', table_name='training_plans')
+    op.drop_index('ix_training_plans_user_id_week_start_date', table_name='training_plans')
+    op.create_index('ix_training_plans_user_id_week_start_date', 'training_plans', ['user_id', 'week_start_date'], unique=False)
+    op.execute("DROP TRIGGER IF EXISTS training_plans_summary ON training_plans")
+    op.execute("DROP FUNCTION IF EXISTS training_plan_summary()")
+    op.execute("DROP FUNCTION IF EXISTS plan_summary(jsonb)")
+    op.drop_column('training_plans', 'days_by_type')
+    op.drop_column('training_plans', 'minutes_by_type')
+    op.drop_column('training_plans', 'hard_sessions')
+    op.drop_column('training_plans', 'run_minutes')
+    op.drop_column('training_plans', 'planned_minutes')
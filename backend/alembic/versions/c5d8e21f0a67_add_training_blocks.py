@@ -0,0 +1,51 @@
+"""Add training blocks
+
+Revision ID: c5d8e21f0a67
+Revises: a41c6e0d93b2
+Create Date: 2026-10-19 07:03:18.452906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8e21f0a67'
+down_revision: Union[str, Sequence[str], None] = 'a41c6e0d93b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('training_blocks',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('weeks', sa.Integer(), nullable=False),
+    sa.Column('target_race', sa.String(length=200), nullable=True),
+    sa.Column('profile_version', sa.Integer(), nullable=False),
+    sa.Column('skeleton', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('is_active', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_training_blocks_user_id'), 'training_blocks', ['user_id'], unique=False)
+    op.add_column('training_plans', sa.Column('block_id', sa.UUID(), nullable=True))
+    op.add_column('training_plans', sa.Column('week_number', sa.Integer(), nullable=True))
+    op.create_foreign_key('training_plans_block_id_fkey', 'training_plans', 'training_blocks', ['block_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_training_plans_block_id'), 'training_plans', ['block_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_training_plans_block_id'), table_name='training_plans')
+    op.drop_constraint('training_plans_block_id_fkey', 'training_plans', type_='foreignkey')
+    op.drop_column('training_plans', 'week_number')
+    op.drop_column('training_plans', 'block_id')
+    op.drop_index(op.f('ix_training_blocks_user_id'), table_name='training_blocks')
+    op.drop_table('training_blocks')
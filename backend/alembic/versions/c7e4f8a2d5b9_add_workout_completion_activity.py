@@ -0,0 +1,37 @@
+"""Add workout completion activity
+
+Revision ID: c7e4f8a2d5b9
+Revises: a6c2e9f3b1d8
+Create Date: 2026-10-19 13:02:37.118420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4f8a2d5b9'
+down_revision: Union[str, Sequence[str], None] = 'a6c2e9f3b1d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('workout_completions', sa.Column('duration_minutes', sa.Integer(), nullable=True))
+    op.add_column('workout_completions', sa.Column('distance_m', sa.Integer(), nullable=True))
+    op.add_column('workout_completions', sa.Column('avg_hr', sa.Integer(), nullable=True))
+    op.add_column('workout_completions', sa.Column('trimp', sa.Float(), nullable=True))
+    op.add_column('workout_completions', sa.Column('activity', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('workout_completions', 'activity')
+    op.drop_column('workout_completions', 'trimp')
+    op.drop_column('workout_completions', 'avg_hr')
+    op.drop_column('workout_completions', 'distance_m')
+    op.drop_column('workout_completions', 'duration_minutes')
@@ -0,0 +1,82 @@
+"""Add sync versions and tombstones
+
+Revision ID: e3a9d6c1f7b2
+Revises: c7e4f8a2d5b9
+Create Date: 2026-10-19 15:21:44.930215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9d6c1f7b2'
+down_revision: Union[str, Sequence[str], None] = 'c7e4f8a2d5b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['daily_checkins', 'workout_completions', 'training_plans', 'user_profiles']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('row_id', sa.UUID(), nullable=False),
+    sa.Column('sync_version', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_tombstones_user_id_sync_version', 'sync_tombstones', ['user_id', 'sync_version'], unique=False)
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+
+    # Existing rows keep version 0: clients without a token get everything anyway
+    for table in TABLES:
+        op.add_column(table, sa.Column('sync_version', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index('ix_daily_checkins_user_id_sync_version', 'daily_checkins', ['user_id', 'sync_version'], unique=False)
+    op.create_index('ix_workout_completions_user_id_sync_version', 'workout_completions', ['user_id', 'sync_version'], unique=False)
+    op.create_index('ix_training_plans_user_id_sync_version', 'training_plans', ['user_id', 'sync_version'], unique=False)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger AS $$
+        BEGIN
+            NEW.sync_version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM users WHERE id = OLD.user_id) THEN
+                INSERT INTO sync_tombstones (user_id, entity, row_id, sync_version)
+                VALUES (OLD.user_id, TG_TABLE_NAME, OLD.id, pg_current_xact_id()::text::bigint);
+            END IF;
+            RETURN OLD;
+        END $$ LANGUAGE plpgsql
+    """)
+    for table in TABLES:
+        op.execute(f"CREATE TRIGGER {table}_sync_touch BEFORE INSERT OR UPDATE ON {table} "
+                   f"FOR EACH ROW EXECUTE FUNCTION sync_touch()")
+        op.execute(f"CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table} "
+                   f"FOR EACH ROW EXECUTE FUNCTION sync_tombstone()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_touch ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sync_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS sync_touch()")
+    op.drop_index('ix_training_plans_user_id_sync_version', table_name='training_plans')
+    op.drop_index('ix_workout_completions_user_id_sync_version', table_name='workout_completions')
+    op.drop_index('ix_daily_checkins_user_id_sync_version', table_name='daily_checkins')
+    for table in TABLES:
+        op.drop_column(table, 'sync_version')
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_user_id_sync_version', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
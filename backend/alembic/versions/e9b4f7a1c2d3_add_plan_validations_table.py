@@ -0,0 +1,46 @@
+"""Add plan validations table
+
+Revision ID: e9b4f7a1c2d3
+Revises: c5d8e21f0a67
+Create Date: 2026-10-19 08:21:06.731540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b4f7a1c2d3'
+down_revision: Union[str, Sequence[str], None] = 'c5d8e21f0a67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('plan_validations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('source', sa.String(length=30), nullable=False),
+    sa.Column('score_before', sa.Integer(), nullable=False),
+    sa.Column('score_after', sa.Integer(), nullable=False),
+    sa.Column('violations', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('remaining', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('repaired', sa.Boolean(), nullable=False),
+    sa.Column('regenerated', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_plan_validations_user_id'), 'plan_validations', ['user_id'], unique=False)
+    op.create_index(op.f('ix_plan_validations_created_at'), 'plan_validations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_plan_validations_created_at'), table_name='plan_validations')
+    op.drop_index(op.f('ix_plan_validations_user_id'), table_name='plan_validations')
+    op.drop_table('plan_validations')
@@ -0,0 +1,48 @@
+"""Add workout weekly stats table
+
+Revision ID: f2a7c9d4e5b1
+Revises: e9b4f7a1c2d3
+Create Date: 2026-10-19 09:02:44.508117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c9d4e5b1'
+down_revision: Union[str, Sequence[str], None] = 'e9b4f7a1c2d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workout_weekly_stats',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('planned_sessions', sa.Integer(), nullable=False),
+    sa.Column('completed_sessions', sa.Integer(), nullable=False),
+    sa.Column('planned_minutes', sa.Integer(), nullable=False),
+    sa.Column('completed_minutes', sa.Integer(), nullable=False),
+    sa.Column('by_type', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('lead_streak', sa.Integer(), nullable=False),
+    sa.Column('tail_streak', sa.Integer(), nullable=False),
+    sa.Column('best_streak', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'week_start')
+    )
+    # Completions are read per user and date range by the stats refresh
+    op.create_index('ix_workout_completions_user_id_date', 'workout_completions', ['user_id', 'date'], unique=False)
+    op.create_index('ix_training_plans_user_id_week_start_date', 'training_plans', ['user_id', 'week_start_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_training_plans_user_id_week_start_date', table_name='training_plans')
+    op.drop_index('ix_workout_completions_user_id_date', table_name='workout_completions')
+    op.drop_table('workout_weekly_stats')
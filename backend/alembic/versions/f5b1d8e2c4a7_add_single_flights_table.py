@@ -0,0 +1,37 @@
+"""Add single flights table
+
+Revision ID: f5b1d8e2c4a7
+Revises: b8f2c4e6a1d3
+Create Date: 2026-10-19 17:32:48.516204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b1d8e2c4a7'
+down_revision: Union[str, Sequence[str], None] = 'b8f2c4e6a1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('single_flights',
+    sa.Column('key', sa.String(length=300), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('result', sa.LargeBinary(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index(op.f('ix_single_flights_expires_at'), 'single_flights', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_single_flights_expires_at'), table_name='single_flights')
+    op.drop_table('single_flights')
@@ -0,0 +1,337 @@
+"""
+Shared cache for routes and services, with the same backend choices as the
+rate limiter: "memory" (per worker LRU), "redis" or "postgres" (an UNLOGGED
+table, so no extra service is needed to share it across workers).
+
+Values are anything orjson can serialize and come back as plain JSON types.
+Keys live in namespaces that can be invalidated in O(1): each namespace has a
+generation number that is part of every key, and invalidating bumps it so old
+entries are never read again and simply expire.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_engine
+
+
+class CacheBackend:
+    """Storage for namespaced entries with a TTL"""
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def invalidate(self, namespace: str):
+        """Drop every entry in the namespace"""
+        raise NotImplementedError
+
+    def evictions(self) -> int:
+        """Entries dropped before being read again (capacity or expiry), where the backend knows"""
+        return 0
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU; each worker has its own copy"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._evictions = 0
+
+    def _key(self, namespace, key):
+        return namespace, self._generations[namespace], key
+
+    def get(self, namespace, key):
+        with self._lock:
+            full_key = self._key(namespace, key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[full_key]
+                self._evictions += 1
+                return None
+            self._entries.move_to_end(full_key)
+            return value
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            full_key = self._key(namespace, key)
+            self._entries[full_key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._entries.pop(self._key(namespace, key), None)
+
+    def invalidate(self, namespace):
+        # Old generations are never read again and fall out of the LRU
+        with self._lock:
+            self._generations[namespace] += 1
+
+    def evictions(self):
+        return self._evictions
+
+
+class RedisBackend(CacheBackend):
+    """Shared cache in Redis (or any server speaking its protocol)"""
+
+    # Resolve the namespace generation and the entry in one round trip
+    GET_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+return redis.call('GET', KEYS[1] .. ':' .. generation .. ':' .. ARGV[1])
+"""
+    SET_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+redis.call('SET', KEYS[1] .. ':' .. generation .. ':' .. ARGV[1], ARGV[2], 'PX', ARGV[3])
+"""
+    DELETE_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+redis.call('DEL', KEYS[1] .. ':' .. generation .. ':' .. ARGV[1])
+"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._get = self.client.register_script(self.GET_SCRIPT)
+        self._set = self.client.register_script(self.SET_SCRIPT)
+        self._delete = self.client.register_script(self.DELETE_SCRIPT)
+
+    @staticmethod
+    def _namespace_key(namespace):
+        return f"cache:{namespace}"
+
+    def get(self, namespace, key):
+        return self._get(keys=[self._namespace_key(namespace)], args=[key])
+
+    def set(self, namespace, key, value, ttl):
+        self._set(keys=[self._namespace_key(namespace)], args=[key, value, max(1, int(ttl * 1000))])
+
+    def delete(self, namespace, key):
+        self._delete(keys=[self._namespace_key(namespace)], args=[key])
+
+    def invalidate(self, namespace):
+        self.client.incr(self._namespace_key(namespace))
+
+    def evictions(self):
+        # Server-wide: includes keys that aren't cache entries
+        stats = self.client.info("stats")
+        return stats.get("evicted_keys", 0) + stats.get("expired_keys", 0)
+
+
+class PostgresBackend(CacheBackend):
+    """Shared cache in the UNLOGGED cache_entries / cache_namespaces tables"""
+
+    FULL_KEY = """:namespace || ':' || COALESCE(
+        (SELECT generation FROM cache_namespaces WHERE namespace = :namespace), 0) || ':' || :key"""
+
+    GET_SQL = text(f"SELECT value FROM cache_entries WHERE key = {FULL_KEY} AND expires_at > now()")
+
+    SET_SQL = text(f"""
+        INSERT INTO cache_entries (key, value, expires_at)
+        VALUES ({FULL_KEY}, :value, now() + make_interval(secs => :ttl))
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+    """)
+
+    DELETE_SQL = text(f"DELETE FROM cache_entries WHERE key = {FULL_KEY}")
+
+    INVALIDATE_SQL = text("""
+        INSERT INTO cache_namespaces (namespace, generation) VALUES (:namespace, 1)
+        ON CONFLICT (namespace) DO UPDATE SET generation = cache_namespaces.generation + 1
+    """)
+
+    # Expired and superseded rows are swept in small batches from writes
+    SWEEP_SQL = text("""
+        DELETE FROM cache_entries WHERE key IN (
+            SELECT key FROM cache_entries WHERE expires_at <= now() LIMIT :limit
+        )
+    """)
+    SWEEP_EVERY = 100  # sets
+    SWEEP_LIMIT = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._evictions = 0
+
+    def get(self, namespace, key):
+        with get_engine().connect() as conn:
+            value = conn.execute(self.GET_SQL, {"namespace": namespace, "key": key}).scalar()
+        return bytes(value) if value is not None else None
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            self._sets += 1
+            sweep = self._sets % self.SWEEP_EVERY == 0
+        with get_engine().begin() as conn:
+            conn.execute(self.SET_SQL, {"namespace": namespace, "key": key, "value": value, "ttl": ttl})
+            if sweep:
+                swept = conn.execute(self.SWEEP_SQL, {"limit": self.SWEEP_LIMIT}).rowcount
+                with self._lock:
+                    self._evictions += swept
+
+    def delete(self, namespace, key):
+        with get_engine().begin() as conn:
+            conn.execute(self.DELETE_SQL, {"namespace": namespace, "key": key})
+
+    def invalidate(self, namespace):
+        with get_engine().begin() as conn:
+            conn.execute(self.INVALIDATE_SQL, {"namespace": namespace})
+
+    def evictions(self):
+        return self._evictions
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if settings.CACHE_BACKEND == "postgres":
+        return PostgresBackend()
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
+
+
+class _Metrics:
+    """Per-process counters by namespace"""
+
+    FIELDS = ("hits", "misses", "sets", "loads", "coalesced", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def incr(self, namespace: str, name: str):
+        with self._lock:
+            self._counts[namespace][name] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+
+_metrics = _Metrics()
+
+
+def get(namespace: str, key: str) -> Optional[Any]:
+    """
+    The cached value, or None on a miss
+
+    A backend error counts as a miss, so a cache outage only makes requests slower.
+    """
+    try:
+        raw = get_backend().get(namespace, key)
+    except Exception as e:
+        print(f"Cache get failed for {namespace}:{key}: {e}")
+        _metrics.incr(namespace, "errors")
+        raw = None
+    _metrics.incr(namespace, "hits" if raw is not None else "misses")
+    return orjson.loads(raw) if raw is not None else None
+
+
+def set(namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+    """Store `value` for `ttl` seconds (CACHE_DEFAULT_TTL by default)"""
+    try:
+        get_backend().set(namespace, key, orjson.dumps(value), ttl if ttl is not None else settings.CACHE_DEFAULT_TTL)
+        _metrics.incr(namespace, "sets")
+    except Exception as e:
+        print(f"Cache set failed for {namespace}:{key}: {e}")
+        _metrics.incr(namespace, "errors")
+
+
+def delete(namespace: str, key: str):
+    try:
+        get_backend().delete(namespace, key)
+    except Exception as e:
+        print(f"Cache delete failed for {namespace}:{key}: {e}")
+        _metrics.incr(namespace, "errors")
+
+
+def invalidate(namespace: str):
+    """Drop every entry in `namespace`, in all workers"""
+    try:
+        get_backend().invalidate(namespace)
+    except Exception as e:
+        print(f"Cache invalidation failed for {namespace}: {e}")
+        _metrics.incr(namespace, "errors")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[tuple, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_or_load(namespace: str, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+    """
+    Cached value, or `loader()` stored on a miss
+
+    Concurrent misses for the same key in this worker wait for one load
+    instead of each calling the loader. A None result isn't cached.
+    """
+    value = get(namespace, key)
+    if value is not None:
+        return value
+
+    with _flights_lock:
+        flight = _flights.get((namespace, key))
+        leader = flight is None
+        if leader:
+            flight = _flights[(namespace, key)] = _Flight()
+
+    if not leader:
+        _metrics.incr(namespace, "coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        _metrics.incr(namespace, "loads")
+        flight.value = loader()
+        if flight.value is not None:
+            set(namespace, key, flight.value, ttl)
+            # Followers get what a cache hit would have returned (plain JSON types)
+            flight.value = orjson.loads(orjson.dumps(flight.value))
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop((namespace, key), None)
+        flight.done.set()
+
+
+def metrics() -> dict:
+    """Hit/miss/load counters per namespace for this worker, plus backend evictions"""
+    try:
+        evictions = get_backend().evictions()
+    except Exception:
+        evictions = None
+    return {"backend": settings.CACHE_BACKEND, "evictions": evictions, "namespaces": _metrics.snapshot()}
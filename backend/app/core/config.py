@@ -1,21 +1,125 @@
+from functools import lru_cache
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Streaming replica for read-only routes; unset sends everything to the primary.
+    # Needs CACHE_BACKEND redis or postgres, which holds the sticky window for all workers
+    DATABASE_REPLICA_URL: Optional[str] = None
+    REPLICA_STICKY_SECONDS: float = 10  # after a user's write, their reads stay on the primary this long
+    REPLICA_MAX_LAG_SECONDS: float = 2  # a replica further behind is skipped
+    REPLICA_LAG_CHECK_SECONDS: float = 1
 
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30  # sliding: each rotation starts a new window
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 60  # the token just rotated out still refreshes (lost response)
+    REFRESH_TOKEN_REVOKED_RETENTION_DAYS: int = 7  # revoked tokens kept this long to detect reuse
 
     # API Keys
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # e.g. a local OpenAI-compatible server
+
+    # LLM routing: provider is "openai", "local" or "template" (deterministic, no network)
+    LLM_PROVIDER: str = "openai"
+    LLM_TASK_PROVIDERS: Dict[str, str] = {}  # per-task override, e.g. {"daily_recommendation": "local"}
+    LLM_TASK_CLASSES: Dict[str, str] = {}  # per-task latency/cost class override ("fast" or "quality")
+    OPENAI_FAST_MODEL: str = "gpt-4o-mini"
+    OPENAI_QUALITY_MODEL: str = "gpt-4o"
+
+    # Any OpenAI-compatible server (vLLM, llama.cpp, Ollama)
+    LOCAL_LLM_BASE_URL: str = "http://localhost:8080/v1"
+    LOCAL_LLM_API_KEY: str = "not-needed"
+    LOCAL_LLM_FAST_MODEL: str = "local-model"
+    LOCAL_LLM_QUALITY_MODEL: str = "local-model"
+
+    # Rate limiting for LLM-backed endpoints: "memory" (single process), "redis" or "postgres"
+    RATE_LIMIT_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    # Token bucket per user and endpoint class: burst size and seconds to earn back one request
+    RATE_LIMIT_BUCKETS: Dict[str, Dict[str, float]] = {
+        "llm_heavy": {"capacity": 3, "refill_seconds": 1200},
+        "llm_light": {"capacity": 20, "refill_seconds": 180},
+    }
+    LLM_DAILY_TOKEN_QUOTA: int = 60000  # per user per UTC day, 0 disables the quota
+
+    # USD per million tokens, for the cost report (`python -m app.services.usage`); unlisted models cost 0
+    LLM_PRICES: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
+        "gpt-4o": {"prompt": 2.50, "completion": 10.00},
+    }
+    LLM_PROMPT_TOKEN_WARNING: int = 4000  # prompts counted above this are logged
+
+    # Idempotency-Key on the LLM POST endpoints: how long a response is replayed, how long a
+    # retry waits for the first request, and when a request that never finished is given up on
+    IDEMPOTENCY_TTL_HOURS: float = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 120
+    IDEMPOTENCY_STALE_SECONDS: float = 600
+
+    # Identical concurrent LLM calls for a user share one completion: "memory" coalesces within a
+    # worker, "redis" or "postgres" across workers through a lease the first caller holds
+    SINGLE_FLIGHT_BACKEND: str = "memory"
+    SINGLE_FLIGHT_LEASE_SECONDS: float = 180  # taken over after this if the first caller died
+    SINGLE_FLIGHT_RESULT_SECONDS: float = 10  # kept for callers in other workers still polling
+
+    # Wearable samples: monthly range partitions created ahead by `python -m app.services.biometrics`
+    BIOMETRIC_MONTHLY_PARTITIONS: bool = False
+
+    # FIT/GPX/TCX uploads (a 3 hour 1 Hz GPX is ~3 MB; gzipped uploads are checked compressed)
+    ACTIVITY_MAX_UPLOAD_MB: float = 25
+
+    # Shared cache: "memory" (per worker LRU), "redis" (REDIS_URL) or "postgres" (UNLOGGED tables)
+    CACHE_BACKEND: str = "memory"
+    CACHE_MAX_ENTRIES: int = 10000  # memory backend only
+    CACHE_DEFAULT_TTL: float = 300
+
+    # Push channel (/api/events): limits are per worker; a ping goes out after this many idle seconds
+    PUSH_MAX_CONNECTIONS: int = 10000
+    PUSH_MAX_CONNECTIONS_PER_USER: int = 5
+    PUSH_HEARTBEAT_SECONDS: float = 25
+
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    BROTLI_QUALITY: int = 4
+
+    # Request tracing: Server-Timing on every response, slow statements printed with their parameter types
+    TRACING_ENABLED: bool = True
+    SLOW_SQL_MS: float = 200
+    # Sampled traces are appended here as OTLP JSON lines (disabled when unset);
+    # requests slower than TRACE_SLOW_REQUEST_MS are always written
+    TRACE_EXPORT_PATH: Optional[str] = None
+    TRACE_SAMPLE_RATE: float = 0.05
+    TRACE_SLOW_REQUEST_MS: float = 1000
+
+    @model_validator(mode="after")
+    def check_replica_cache(self):
+        # A per-worker sticky window would send a user's next read to the replica
+        # whenever it lands on another worker than their write
+        if self.DATABASE_REPLICA_URL and self.CACHE_BACKEND == "memory":
+            raise ValueError("DATABASE_REPLICA_URL needs CACHE_BACKEND redis or postgres")
+        return self
 
     class Config:
         env_file = ".env"
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Read the environment on first use, not at import"""
+    return Settings()
+
+
+class _LazySettings:
+    """Stand-in for the Settings instance that resolves it on first attribute access"""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+
+settings = _LazySettings()
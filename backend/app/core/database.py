@@ -1,17 +1,86 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.tracing import instrument_engine
 
-load_dotenv()
+Base = declarative_base()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Create the engine on first use so importing the app doesn't touch the database config"""
+    engine = create_engine(settings.DATABASE_URL)
+    instrument_engine(engine)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_replica_engine() -> Optional[Engine]:
+    """Engine for DATABASE_REPLICA_URL, or None when reads should go to the primary"""
+    if not settings.DATABASE_REPLICA_URL:
+        return None
+    engine = create_engine(settings.DATABASE_REPLICA_URL, pool_pre_ping=True)
+    instrument_engine(engine)
+    return engine
+
+
+def _mark_write(session: Session, *args):
+    session.info["wrote"] = True
+
+
+def _mark_bulk_write(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_select:
+        return
+    # Raw SQL reads (e.g. the stats query) aren't writes
+    if isinstance(statement, TextClause) and statement.text.lstrip().upper().startswith(("SELECT", "WITH")):
+        return
+    _mark_write(orm_execute_state.session)
+
+
+def _after_commit(session: Session):
+    # get_current_user tags the request's session with the user, so their next
+    # reads stay on the primary until the replica has this commit
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        from app.core.replicas import record_write
+
+        record_write(session.info["user_id"])
+
+
+@lru_cache(maxsize=None)
+def _get_sessionmaker() -> sessionmaker:
+    maker = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    event.listen(maker, "after_flush", _mark_write)
+    event.listen(maker, "do_orm_execute", _mark_bulk_write)
+    event.listen(maker, "after_commit", _after_commit)
+    return maker
+
+
+@lru_cache(maxsize=None)
+def _get_replica_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_replica_engine())
+
+
+def SessionLocal() -> Session:
+    return _get_sessionmaker()()
+
+
+def ReplicaSessionLocal() -> Session:
+    return _get_replica_sessionmaker()()
+
+
+def dispose_engine():
+    """Close pooled connections if the engines were ever created"""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    if get_replica_engine.cache_info().currsize and get_replica_engine() is not None:
+        get_replica_engine().dispose()
 
-Base = declarative_base()
 
 # Dependency for routes
 def get_db():
@@ -19,4 +88,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,274 @@
+"""
+Idempotency-Key for the POST endpoints that run an LLM generation.
+
+A client that times out can retry with the same key and get the original
+response back, byte for byte, instead of paying for (and storing) a second
+plan. The first request claims (user, key) in idempotency_keys; its response
+is stored there when it finishes and replayed for IDEMPOTENCY_TTL_HOURS. A
+retry that arrives while the first request is still running waits for it
+rather than starting another generation.
+
+Responses with a 5xx or 429 status are not stored: the claim is released so
+a retry runs again. A claim whose request died without finishing is taken
+over after IDEMPOTENCY_STALE_SECONDS.
+"""
+import asyncio
+import hashlib
+import threading
+from typing import Optional
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_engine
+from app.core.security import decode_access_token
+
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_PATHS = frozenset({
+    "/api/coach/training-plan",
+    "/api/coach/training-plan/regenerate-day",
+    "/api/coach/training-plan/adjust-today",
+    "/api/coach/mesocycle",
+})
+
+POLL_SECONDS = (0.05, 0.1, 0.25, 0.5, 1)  # backoff while waiting on the first request
+CLAIM_ATTEMPTS = 3
+
+
+class IdempotencyStore:
+    """Claims and stored responses in the idempotency_keys table"""
+
+    # Returns a row only when this request now owns the key: a new key, an expired
+    # one, or a claim abandoned by a request that never finished
+    CLAIM_SQL = text("""
+        INSERT INTO idempotency_keys AS k (user_id, key, request_hash, status, created_at, expires_at)
+        SELECT u.id, :key, :request_hash, 'pending', now(), now() + make_interval(secs => :ttl)
+        FROM users u WHERE u.email = :email
+        ON CONFLICT (user_id, key) DO UPDATE SET
+            request_hash = EXCLUDED.request_hash,
+            status = 'pending',
+            response_status = NULL,
+            response_headers = NULL,
+            response_body = NULL,
+            created_at = now(),
+            expires_at = EXCLUDED.expires_at
+        WHERE k.expires_at <= now()
+           OR (k.status = 'pending' AND k.created_at < now() - make_interval(secs => :stale))
+        RETURNING k.user_id
+    """)
+
+    LOOKUP_SQL = text("""
+        SELECT k.request_hash, k.status, k.response_status, k.response_headers, k.response_body
+        FROM idempotency_keys k JOIN users u ON u.id = k.user_id
+        WHERE u.email = :email AND k.key = :key AND k.expires_at > now()
+    """)
+
+    STORE_SQL = text("""
+        UPDATE idempotency_keys
+        SET status = 'done', response_status = :status, response_headers = CAST(:headers AS jsonb),
+            response_body = :body
+        WHERE user_id = :user_id AND key = :key AND request_hash = :request_hash AND status = 'pending'
+    """)
+
+    RELEASE_SQL = text("""
+        DELETE FROM idempotency_keys
+        WHERE user_id = :user_id AND key = :key AND request_hash = :request_hash AND status = 'pending'
+    """)
+
+    SWEEP_SQL = text("""
+        DELETE FROM idempotency_keys WHERE (user_id, key) IN (
+            SELECT user_id, key FROM idempotency_keys WHERE expires_at <= now() LIMIT :limit
+        )
+    """)
+    SWEEP_EVERY = 100  # claims
+    SWEEP_LIMIT = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def claim(self, email: str, key: str, request_hash: str):
+        """The user's id if this request owns the key now, otherwise None"""
+        with self._lock:
+            self._claims += 1
+            sweep = self._claims % self.SWEEP_EVERY == 0
+        params = {"email": email, "key": key, "request_hash": request_hash,
+                  "ttl": settings.IDEMPOTENCY_TTL_HOURS * 3600, "stale": settings.IDEMPOTENCY_STALE_SECONDS}
+        with get_engine().begin() as conn:
+            user_id = conn.execute(self.CLAIM_SQL, params).scalar()
+            if sweep:
+                conn.execute(self.SWEEP_SQL, {"limit": self.SWEEP_LIMIT})
+        return user_id
+
+    def lookup(self, email: str, key: str):
+        with get_engine().connect() as conn:
+            return conn.execute(self.LOOKUP_SQL, {"email": email, "key": key}).first()
+
+    def store(self, user_id, key: str, request_hash: str, status: int, headers: list, body: bytes):
+        with get_engine().begin() as conn:
+            conn.execute(self.STORE_SQL, {
+                "user_id": user_id, "key": key, "request_hash": request_hash,
+                "status": status, "headers": orjson.dumps(headers).decode(), "body": body,
+            })
+
+    def release(self, user_id, key: str, request_hash: str):
+        with get_engine().begin() as conn:
+            conn.execute(self.RELEASE_SQL, {"user_id": user_id, "key": key, "request_hash": request_hash})
+
+
+store = IdempotencyStore()
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for header, value in scope["headers"]:
+        if header == name:
+            return value
+    return None
+
+
+def _email(scope) -> Optional[str]:
+    authorization = (_header(scope, b"authorization") or b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    payload = decode_access_token(authorization[7:])
+    return payload.get("sub") if payload else None
+
+
+def _error(status_code: int, detail: str, headers: Optional[dict] = None) -> ORJSONResponse:
+    return ORJSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    Pure ASGI middleware, added innermost so the stored response is exactly what
+    the endpoint produced (compression, CORS and tracing wrap replays too)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = raw_key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _error(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")(scope, receive, send)
+            return
+        email = _email(scope)
+        if email is None:
+            # Let the endpoint answer 401 as usual
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        request_hash = hashlib.sha256(
+            scope["path"].encode() + b"?" + scope.get("query_string", b"") + b"\n" + body
+        ).hexdigest()
+
+        replay_receive = self._replay(body, receive)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+        missing = 0
+        poll = 0
+        while True:
+            user_id = await run_in_threadpool(store.claim, email, key, request_hash)
+            if user_id is not None:
+                await self._run(scope, replay_receive, send, user_id, key, request_hash)
+                return
+
+            row = await run_in_threadpool(store.lookup, email, key)
+            if row is None:
+                # Released or expired in between, or the token's user is gone
+                missing += 1
+                if missing >= CLAIM_ATTEMPTS:
+                    await self.app(scope, replay_receive, send)
+                    return
+                continue
+            if row.request_hash != request_hash:
+                await _error(422, "Idempotency-Key was already used with a different request")(scope, receive, send)
+                return
+            if row.status == "done":
+                await self._send_stored(send, row)
+                return
+
+            # The first request is still generating: wait for its response
+            if loop.time() >= deadline:
+                await _error(409, "A request with this Idempotency-Key is still in progress",
+                             headers={"Retry-After": "5"})(scope, receive, send)
+                return
+            await asyncio.sleep(POLL_SECONDS[min(poll, len(POLL_SECONDS) - 1)])
+            poll += 1
+
+    @staticmethod
+    def _replay(body: bytes, receive):
+        sent = False
+
+        async def replay_receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay_receive
+
+    async def _run(self, scope, receive, send, user_id, key: str, request_hash: str):
+        """Run the endpoint as the key's owner, storing its response before the last chunk goes out"""
+        start = None
+        chunks = []
+        finished = False
+
+        async def capture(message):
+            nonlocal start, finished
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and not finished:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = True
+                    status = start["status"]
+                    if status >= 500 or status == 429:
+                        await run_in_threadpool(store.release, user_id, key, request_hash)
+                    else:
+                        headers = [[name.decode("latin-1"), value.decode("latin-1")]
+                                   for name, value in start.get("headers", [])]
+                        await run_in_threadpool(store.store, user_id, key, request_hash,
+                                                status, headers, b"".join(chunks))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            if not finished:
+                await run_in_threadpool(store.release, user_id, key, request_hash)
+
+    @staticmethod
+    async def _send_stored(send, row):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in row.response_headers]
+        headers.append((REPLAYED_HEADER, b"true"))
+        await send({"type": "http.response.start", "status": row.response_status, "headers": headers})
+        await send({"type": "http.response.body", "body": bytes(row.response_body)})
@@ -0,0 +1,233 @@
+"""
+Per-user push channel: plan and recommendation updates over WebSocket or SSE.
+
+Writers call `notify` inside their transaction; Postgres delivers the
+NOTIFY on commit (and drops it on rollback) to every uvicorn worker. Each
+worker holds one LISTEN connection for all its clients and hands events to
+the subscribers of that user, so an idle client costs a queue and a task,
+never a database connection.
+
+Clients should refetch what they show when they get a "resync" event: the
+worker lost its LISTEN connection or the client fell too far behind, so
+some events may have been missed.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+CHANNEL = "user_events"
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+QUEUE_SIZE = 32  # events buffered per client before it gets a resync instead
+RECONNECT_SECONDS = (0.5, 1, 2, 5, 10)
+CONNECT_WAIT_SECONDS = 5
+
+PING = orjson.dumps({"type": "ping"}).decode()
+RESYNC = orjson.dumps({"type": "resync"}).decode()
+
+
+class PushLimitError(Exception):
+    """The worker or the user already has the maximum number of open channels"""
+
+
+def notify(db: Session, user_id, event_type: str, data: Optional[dict] = None):
+    """
+    Queue an event for the user's open channels, sent when `db` commits
+
+    Keep `data` small (ids, dates): NOTIFY payloads are capped at 8000 bytes,
+    clients fetch the full objects themselves.
+    """
+    payload = orjson.dumps({"user_id": str(user_id), "type": event_type, "data": data or {}}).decode()
+    db.execute(NOTIFY_SQL, {"channel": CHANNEL, "payload": payload})
+
+
+class Subscriber:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, message: str):
+        if self.queue.full():
+            # Slow client: replace the backlog with one resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def next(self, timeout: float) -> str:
+        """Next event as a JSON string, or a ping after `timeout` seconds of silence"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return PING
+
+
+class Hub:
+    """This worker's subscribers plus the LISTEN connection feeding them"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._count = 0
+        self._connection = None
+        self._fileno = None
+        self._connecting: Optional[asyncio.Task] = None
+        self._closed = False
+        self.events_received = 0
+        self.events_delivered = 0
+
+    # --- subscribers ------------------------------------------------------
+
+    async def subscribe(self, user_id) -> Subscriber:
+        """
+        Raises:
+            PushLimitError: PUSH_MAX_CONNECTIONS or PUSH_MAX_CONNECTIONS_PER_USER reached
+        """
+        user_id = str(user_id)
+        if self._count >= settings.PUSH_MAX_CONNECTIONS:
+            raise PushLimitError("Too many open connections on this server")
+        if len(self._subscribers[user_id]) >= settings.PUSH_MAX_CONNECTIONS_PER_USER:
+            raise PushLimitError("Too many open connections for this user")
+
+        subscriber = Subscriber(user_id)
+        self._subscribers[user_id].add(subscriber)
+        self._count += 1
+        await self._ensure_listening()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        self._count -= 1
+        if not subscribers:
+            del self._subscribers[subscriber.user_id]
+
+    def _dispatch(self, payload: str):
+        self.events_received += 1
+        try:
+            event = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return
+        subscribers = self._subscribers.get(event.pop("user_id", None))
+        if not subscribers:
+            return
+        message = orjson.dumps(event).decode()
+        for subscriber in subscribers:
+            subscriber.put(message)
+            self.events_delivered += 1
+
+    def _broadcast(self, message: str):
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.put(message)
+
+    # --- LISTEN connection ------------------------------------------------
+
+    async def _ensure_listening(self):
+        if self._connection is not None or self._closed:
+            return
+        if self._connecting is None or self._connecting.done():
+            self._connecting = asyncio.create_task(self._connect())
+        # The first subscriber waits for LISTEN so it can't miss an event sent right
+        # after; if the database is down it goes ahead and gets a resync later
+        try:
+            await asyncio.wait_for(asyncio.shield(self._connecting), CONNECT_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    def _open(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        connection = psycopg2.connect(url.render_as_string(hide_password=False))
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return connection
+
+    async def _connect(self, resync: bool = False):
+        """Open the LISTEN connection, retrying with backoff while anyone is subscribed"""
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while not self._closed and self._count:
+            try:
+                connection = await loop.run_in_executor(None, self._open)
+            except Exception as e:
+                print(f"Push channel could not LISTEN: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS[min(attempt, len(RECONNECT_SECONDS) - 1)])
+                attempt += 1
+                resync = True
+                continue
+
+            if self._closed:
+                connection.close()
+                return
+            self._connection, self._fileno = connection, connection.fileno()
+            loop.add_reader(self._fileno, self._on_readable)
+            if resync:
+                # Events sent while we weren't listening are lost, so clients refetch
+                self._broadcast(RESYNC)
+            return
+
+    def _on_readable(self):
+        connection = self._connection
+        try:
+            connection.poll()
+        except Exception as e:
+            print(f"Push channel lost its LISTEN connection: {e}")
+            self._drop_connection()
+            self._connecting = asyncio.create_task(self._connect(resync=True))
+            return
+        while connection.notifies:
+            self._dispatch(connection.notifies.pop(0).payload)
+
+    def _drop_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._fileno)
+        except RuntimeError:
+            pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        self._closed = True
+        if self._connecting is not None and not self._connecting.done():
+            self._connecting.cancel()
+        self._drop_connection()
+
+    def metrics(self) -> dict:
+        return {
+            "connections": self._count,
+            "users": len(self._subscribers),
+            "listening": self._connection is not None,
+            "events_received": self.events_received,
+            "events_delivered": self.events_delivered,
+        }
+
+
+hub = Hub()
+
+
+async def stream(subscriber: Subscriber, expires_at: float):
+    """
+    Events for one subscriber as JSON strings, with a ping after every
+    PUSH_HEARTBEAT_SECONDS of silence. Ends when the access token expires
+    (unix time `expires_at`), so the client reconnects with a fresh one.
+    """
+    while time.time() < expires_at:
+        yield await subscriber.next(min(settings.PUSH_HEARTBEAT_SECONDS, max(expires_at - time.time(), 0.01)))
@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_engine
+
+
+class RateLimitBackend:
+    """Storage for token buckets and expiring counters"""
+
+    def take(self, key: str, capacity: float, refill_seconds: float) -> float:
+        """
+        Take one token from the bucket at `key`
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until a token is available
+        """
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int, expires_at: datetime) -> int:
+        """Add `amount` to the counter at `key` (reset after `expires_at`) and return the new value"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process state; limits are per worker when running several uvicorn workers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._counters = {}
+
+    def take(self, key, capacity, refill_seconds):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) / refill_seconds)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) * refill_seconds
+
+    def incr(self, key, amount, expires_at):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            value, current_expiry = self._counters.get(key, (0, expires_at))
+            if current_expiry <= now:
+                value = 0
+            value += amount
+            self._counters[key] = (value, expires_at)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._counters.get(key, (0, None))
+        if expires_at is None or expires_at <= datetime.now(timezone.utc):
+            return 0
+        return value
+
+
+class RedisBackend(RateLimitBackend):
+    """Shared state in Redis (or any server speaking its protocol)"""
+
+    # Refill and take atomically, using the server clock so workers agree on time
+    TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) / refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) * refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity * refill))
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, key, capacity, refill_seconds):
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[capacity, refill_seconds]))
+
+    def incr(self, key, amount, expires_at):
+        pipe = self.client.pipeline()
+        pipe.incrby(f"ratelimit:{key}", amount)
+        pipe.expireat(f"ratelimit:{key}", expires_at)
+        value, _ = pipe.execute()
+        return value
+
+    def get(self, key):
+        value = self.client.get(f"ratelimit:{key}")
+        return int(value) if value else 0
+
+
+class PostgresBackend(RateLimitBackend):
+    """Shared state in the rate_limit_buckets / rate_limit_counters tables"""
+
+    # Only updates (and returns a row) when a whole token is available after refill
+    TAKE_SQL = text("""
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+        VALUES (:key, :capacity - 1, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(:capacity, rate_limit_buckets.tokens
+                + EXTRACT(EPOCH FROM now() - rate_limit_buckets.updated_at) / :refill) - 1,
+            updated_at = now()
+        WHERE LEAST(:capacity, rate_limit_buckets.tokens
+                + EXTRACT(EPOCH FROM now() - rate_limit_buckets.updated_at) / :refill) >= 1
+        RETURNING tokens
+    """)
+
+    WAIT_SQL = text("""
+        SELECT (1 - LEAST(:capacity, tokens + EXTRACT(EPOCH FROM now() - updated_at) / :refill)) * :refill
+        FROM rate_limit_buckets WHERE key = :key
+    """)
+
+    INCR_SQL = text("""
+        INSERT INTO rate_limit_counters (key, value, expires_at)
+        VALUES (:key, :amount, :expires_at)
+        ON CONFLICT (key) DO UPDATE SET
+            value = CASE WHEN rate_limit_counters.expires_at <= now() THEN :amount
+                         ELSE rate_limit_counters.value + :amount END,
+            expires_at = :expires_at
+        RETURNING value
+    """)
+
+    GET_SQL = text("SELECT value FROM rate_limit_counters WHERE key = :key AND expires_at > now()")
+
+    def take(self, key, capacity, refill_seconds):
+        params = {"key": key, "capacity": capacity, "refill": refill_seconds}
+        with get_engine().begin() as conn:
+            if conn.execute(self.TAKE_SQL, params).first() is not None:
+                return 0.0
+            wait = conn.execute(self.WAIT_SQL, params).scalar()
+        return max(float(wait or 0), 0.0)
+
+    def incr(self, key, amount, expires_at):
+        with get_engine().begin() as conn:
+            return conn.execute(self.INCR_SQL, {"key": key, "amount": amount, "expires_at": expires_at}).scalar()
+
+    def get(self, key):
+        with get_engine().connect() as conn:
+            return conn.execute(self.GET_SQL, {"key": key}).scalar() or 0
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend()
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresBackend()
+    raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+
+
+def _next_utc_midnight() -> datetime:
+    now = datetime.now(timezone.utc)
+    return datetime(now.year, now.month, now.day, tzinfo=timezone.utc) + timedelta(days=1)
+
+
+def _quota_key(user_id) -> str:
+    return f"llm_tokens:{user_id}:{datetime.now(timezone.utc).date().isoformat()}"
+
+
+def record_llm_tokens(user_id, tokens: int) -> int:
+    """Charge LLM tokens to the user's daily quota"""
+    return get_backend().incr(_quota_key(user_id), tokens, _next_utc_midnight())
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def check(user_id, endpoint_class: str):
+    """
+    Take a request from the user's `endpoint_class` bucket
+
+    Raises:
+        HTTPException: 429 with Retry-After when the bucket is empty or the
+            daily LLM token quota is used up
+    """
+    backend = get_backend()
+
+    quota = settings.LLM_DAILY_TOKEN_QUOTA
+    if quota and backend.get(_quota_key(user_id)) >= quota:
+        retry_after = (_next_utc_midnight() - datetime.now(timezone.utc)).total_seconds()
+        raise _too_many_requests("Daily AI coach quota reached. Try again tomorrow.", retry_after)
+
+    bucket = settings.RATE_LIMIT_BUCKETS.get(endpoint_class)
+    if bucket:
+        wait = backend.take(f"{endpoint_class}:{user_id}", bucket["capacity"], bucket["refill_seconds"])
+        if wait > 0:
+            raise _too_many_requests("Too many requests. Please slow down.", wait)
+
+
+def track_usage(user_id, endpoint: str):
+    """
+    Charge LLM tokens used from here on in this context to the user's daily
+    quota, and record usage under `endpoint` ("GET /api/...")
+    """
+    from app.services.llm import Caller, llm_caller, usage_recorder
+
+    usage_recorder.set(lambda tokens: record_llm_tokens(user_id, tokens))
+    llm_caller.set(Caller(str(user_id), endpoint))
+
+
+def allow(user_id, endpoint_class: str) -> bool:
+    """
+    Whether background LLM work for the user fits the daily quota and the
+    `endpoint_class` bucket (taking a token when it does); nothing to answer 429 to
+    """
+    try:
+        check(user_id, endpoint_class)
+    except HTTPException:
+        return False
+    return True
+
+
+def enforce(user_id, endpoint_class: str, endpoint: str):
+    """
+    In-handler version of the rate_limit dependency (app.routes.coach), for
+    routes that only sometimes reach the LLM. Call it from sync code right
+    before the LLM work.
+    """
+    check(user_id, endpoint_class)
+    track_usage(user_id, endpoint)
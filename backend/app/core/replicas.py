@@ -0,0 +1,140 @@
+"""
+Read-replica routing for read-only routes.
+
+`get_read_db` hands out a replica session unless
+- no replica is configured (DATABASE_REPLICA_URL),
+- the user committed a write in the last REPLICA_STICKY_SECONDS, so they
+  always read their own writes, or
+- the replica is more than REPLICA_MAX_LAG_SECONDS behind or unreachable.
+
+Read routes take the user from `get_read_user`, which is looked up on the
+same session, so a replica read never checks out a primary connection.
+
+Recent writers are tracked in the shared cache, which has to be redis or
+postgres when a replica is configured, so the sticky window holds across
+workers.
+"""
+import threading
+import time
+from typing import Optional
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.core.config import settings
+from app.core.database import ReplicaSessionLocal, SessionLocal, get_replica_engine
+from app.models.user import User
+from app.routes.auth import credentials_exception, oauth2_scheme, token_email
+
+STICKY_NAMESPACE = "replica_sticky"
+
+# Zero when the replica has replayed everything it received, otherwise the age
+# of the last replayed transaction. Run on the primary it's always zero.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def record_write(user_id):
+    """Send the user's reads to the primary for the sticky window"""
+    if settings.REPLICA_STICKY_SECONDS <= 0:
+        return
+    cache.set(STICKY_NAMESPACE, str(user_id), time.time(), ttl=settings.REPLICA_STICKY_SECONDS)
+
+
+def recently_wrote(user_id) -> bool:
+    return cache.get(STICKY_NAMESPACE, str(user_id)) is not None
+
+
+class _LagMonitor:
+    """Replica lag, measured at most every REPLICA_LAG_CHECK_SECONDS per worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._lag: Optional[float] = None
+
+    def lag(self) -> Optional[float]:
+        """Seconds behind the primary, or None if the replica can't be reached"""
+        with self._lock:
+            if time.monotonic() - self._checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+                return self._lag
+            # Other requests keep using the last value while this one checks
+            self._checked_at = time.monotonic()
+
+        try:
+            with get_replica_engine().connect() as conn:
+                lag = float(conn.execute(LAG_SQL).scalar() or 0)
+        except Exception as e:
+            print(f"Replica lag check failed: {e}")
+            lag = None
+
+        with self._lock:
+            self._lag = lag
+        return lag
+
+
+_lag_monitor = _LagMonitor()
+
+
+def replica_lag() -> Optional[float]:
+    return _lag_monitor.lag()
+
+
+def replica_available() -> bool:
+    if get_replica_engine() is None:
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+def use_replica(user_id) -> bool:
+    return replica_available() and not recently_wrote(user_id)
+
+
+def _lookup(db, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+
+def get_read_db(token: str = Depends(oauth2_scheme)):
+    """
+    Session for read-only routes: the replica when it's safe, otherwise the primary
+
+    The token's user is looked up on that session too (see get_read_user).
+    Routes using it must not write.
+    """
+    email = token_email(token)
+    db, user = None, None
+    if replica_available():
+        db = ReplicaSessionLocal()
+        try:
+            user = _lookup(db, email)
+        except Exception:
+            db.close()
+            raise
+        # Not replicated yet (just registered), or reading their own writes
+        if user is None or recently_wrote(user.id):
+            db.close()
+            db = None
+    if db is None:
+        db = SessionLocal()
+        user = None
+    try:
+        user = user or _lookup(db, email)
+        if user is None:
+            raise credentials_exception()
+        db.info["read_user"] = user
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_user(db: Session = Depends(get_read_db)) -> User:
+    """The current user, for routes reading through get_read_db"""
+    return db.info["read_user"]
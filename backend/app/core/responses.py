@@ -0,0 +1,46 @@
+from typing import Any, Dict
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.core.tracing import span
+
+# One TypeAdapter per response schema, built lazily and reused across requests
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _get_adapter(schema: Any) -> TypeAdapter:
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = TypeAdapter(schema)
+        _adapters[schema] = adapter
+    return adapter
+
+
+def serialize(schema: Any, obj: Any, exclude_none: bool = False) -> bytes:
+    """Validate ORM objects against `schema` once and dump them straight to JSON bytes"""
+    adapter = _get_adapter(schema)
+    with span("serialization", "serialize", schema=getattr(schema, "__name__", str(schema))):
+        return adapter.dump_json(adapter.validate_python(obj, from_attributes=True), exclude_none=exclude_none)
+
+
+def orm_response(schema: Any, obj: Any, status_code: int = 200, exclude_none: bool = False) -> Response:
+    """
+    Build a JSON response from ORM objects without FastAPI's second validation pass.
+
+    Returning a Response directly makes FastAPI skip `response_model` handling,
+    so the route decorator keeps `response_model` for the OpenAPI docs only.
+
+    Args:
+        schema: Pydantic model (or List[...] of one) describing the payload
+        obj: ORM instance or list of instances
+        status_code: HTTP status code for the response
+        exclude_none: Leave out null fields (compact payloads, e.g. for sync)
+
+    Returns:
+        Response with the serialized JSON body
+    """
+    return Response(
+        content=serialize(schema, obj, exclude_none=exclude_none),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -0,0 +1,295 @@
+"""
+Single-flight for expensive calls: concurrent identical calls share one.
+
+A double-tapped "Generate plan", or two devices asking for the daily
+recommendation at once, would otherwise pay for the same LLM completion
+twice. The first caller for a key runs the function; callers that arrive
+while it runs wait and get its result (or its error).
+
+Within a worker the waiters block on the leader's thread event, as in
+cache.get_or_load. With SINGLE_FLIGHT_BACKEND "redis" or "postgres" the
+leader also holds a lease on the key, and callers in other workers poll it
+until the leader stores its result there for SINGLE_FLIGHT_RESULT_SECONDS.
+Only calls that overlap are shared: a call arriving after the leader
+finished runs again. A lease whose leader died is taken over once
+SINGLE_FLIGHT_LEASE_SECONDS have passed. If the shared backend is down,
+calls simply run uncoalesced. A remote leader's HTTPException or builtin
+exception reaches its waiters as the same type, other errors as Exception.
+"""
+import builtins
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_engine
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+POLL_SECONDS = (0.05, 0.1, 0.25, 0.5, 1)  # backoff while another worker's leader runs
+
+
+class FlightBackend:
+    """Leases and results shared between workers"""
+
+    def claim(self, key: str, lease: float) -> bool:
+        """Take the lease on `key` unless another call holds an unexpired one"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Tuple[Optional[str], Optional[bytes]]:
+        """(status, result) for `key`, or (None, None) when there's no live entry"""
+        raise NotImplementedError
+
+    def finish(self, key: str, status: str, result: bytes, ttl: float):
+        """Replace the lease with the leader's result for `ttl` seconds"""
+        raise NotImplementedError
+
+
+class RedisBackend(FlightBackend):
+    """Leases in Redis (or any server speaking its protocol): "running" or "<status>:<result>" """
+
+    # A finished entry is only kept for callers already waiting; a new call takes it over
+    CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) == 'running' then
+    return 0
+end
+redis.call('SET', KEYS[1], 'running', 'PX', ARGV[1])
+return 1
+"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+
+    def claim(self, key, lease):
+        return bool(self._claim(keys=[f"flight:{key}"], args=[max(1, int(lease * 1000))]))
+
+    def get(self, key):
+        value = self.client.get(f"flight:{key}")
+        if value is None:
+            return None, None
+        status, _, result = value.partition(b":")
+        return status.decode(), result
+
+    def finish(self, key, status, result, ttl):
+        self.client.set(f"flight:{key}", status.encode() + b":" + result, px=max(1, int(ttl * 1000)))
+
+
+class PostgresBackend(FlightBackend):
+    """Leases in the UNLOGGED single_flights table"""
+
+    # Returns a row unless another call holds a live lease: a finished entry is only kept
+    # for callers already waiting on it, a new call starts over
+    CLAIM_SQL = text("""
+        INSERT INTO single_flights (key, status, result, expires_at)
+        VALUES (:key, 'running', NULL, now() + make_interval(secs => :lease))
+        ON CONFLICT (key) DO UPDATE SET status = 'running', result = NULL, expires_at = excluded.expires_at
+        WHERE single_flights.expires_at <= now() OR single_flights.status <> 'running'
+        RETURNING key
+    """)
+
+    GET_SQL = text("SELECT status, result FROM single_flights WHERE key = :key AND expires_at > now()")
+
+    FINISH_SQL = text("""
+        UPDATE single_flights SET status = :status, result = :result, expires_at = now() + make_interval(secs => :ttl)
+        WHERE key = :key
+    """)
+
+    SWEEP_SQL = text("""
+        DELETE FROM single_flights WHERE key IN (
+            SELECT key FROM single_flights WHERE expires_at <= now() LIMIT :limit
+        )
+    """)
+    SWEEP_EVERY = 100  # claims
+    SWEEP_LIMIT = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def claim(self, key, lease):
+        with self._lock:
+            self._claims += 1
+            sweep = self._claims % self.SWEEP_EVERY == 0
+        with get_engine().begin() as conn:
+            claimed = conn.execute(self.CLAIM_SQL, {"key": key, "lease": lease}).first() is not None
+            if sweep:
+                conn.execute(self.SWEEP_SQL, {"limit": self.SWEEP_LIMIT})
+        return claimed
+
+    def get(self, key):
+        with get_engine().connect() as conn:
+            row = conn.execute(self.GET_SQL, {"key": key}).first()
+        if row is None:
+            return None, None
+        return row.status, bytes(row.result) if row.result is not None else None
+
+    def finish(self, key, status, result, ttl):
+        with get_engine().begin() as conn:
+            conn.execute(self.FINISH_SQL, {"key": key, "status": status, "result": result, "ttl": ttl})
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> Optional[FlightBackend]:
+    """The shared backend, or None to coalesce within this worker only"""
+    if settings.SINGLE_FLIGHT_BACKEND == "memory":
+        return None
+    if settings.SINGLE_FLIGHT_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if settings.SINGLE_FLIGHT_BACKEND == "postgres":
+        return PostgresBackend()
+    raise ValueError(f"Unknown single-flight backend: {settings.SINGLE_FLIGHT_BACKEND}")
+
+
+class _Metrics:
+    """Per-process counters by namespace"""
+
+    # calls: the function ran; coalesced: waited on a leader in this worker;
+    # coalesced_remote: got the result from another worker's leader
+    FIELDS = ("calls", "coalesced", "coalesced_remote", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def incr(self, namespace: str, name: str):
+        with self._lock:
+            self._counts[namespace][name] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+
+_metrics = _Metrics()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[tuple, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def run(namespace: str, key: str, fn: Callable[[], Any]) -> Any:
+    """
+    `fn()`, shared with every concurrent call for the same (namespace, key)
+
+    The result must be serializable with orjson when a shared backend is
+    configured. Callers that waited get the leader's exception if it failed.
+    """
+    with _flights_lock:
+        flight = _flights.get((namespace, key))
+        leader = flight is None
+        if leader:
+            flight = _flights[(namespace, key)] = _Flight()
+
+    if not leader:
+        _metrics.incr(namespace, "coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = _run_shared(namespace, key, fn)
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop((namespace, key), None)
+        flight.done.set()
+
+
+def _run_shared(namespace: str, key: str, fn: Callable[[], Any]) -> Any:
+    """Run `fn` under the cross-worker lease, or wait for the worker holding it"""
+    backend = get_backend()
+    full_key = f"{namespace}:{key}"
+    while backend is not None:
+        try:
+            if backend.claim(full_key, settings.SINGLE_FLIGHT_LEASE_SECONDS):
+                break
+            status, result = _wait(backend, full_key)
+        except Exception as e:
+            print(f"Single-flight lease failed for {full_key}: {e}")
+            _metrics.incr(namespace, "errors")
+            backend = None
+            break
+
+        # The claim failed, so a DONE or FAILED entry is from a leader that overlapped this call
+        if status == DONE:
+            _metrics.incr(namespace, "coalesced_remote")
+            return orjson.loads(result)
+        if status == FAILED:
+            _metrics.incr(namespace, "coalesced_remote")
+            raise _load_error(result)
+        # No live entry: the leader's lease expired, so claim again
+
+    _metrics.incr(namespace, "calls")
+    try:
+        value = fn()
+    except Exception as e:
+        _finish(backend, namespace, full_key, FAILED, _dump_error(e))
+        raise
+    _finish(backend, namespace, full_key, DONE, orjson.dumps(value))
+    return value
+
+
+def _dump_error(e: Exception) -> bytes:
+    if isinstance(e, HTTPException):
+        return orjson.dumps({"status_code": e.status_code, "detail": e.detail, "headers": e.headers}, default=str)
+    return orjson.dumps({"type": type(e).__name__, "message": str(e)})
+
+
+def _load_error(result: bytes) -> Exception:
+    """The leader's exception, re-created so callers' except clauses still match"""
+    error = orjson.loads(result)
+    if "status_code" in error:
+        return HTTPException(status_code=error["status_code"], detail=error["detail"], headers=error["headers"])
+    error_type = getattr(builtins, error["type"], None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        return error_type(error["message"])
+    return Exception(error["message"])
+
+
+def _wait(backend: FlightBackend, full_key: str) -> Tuple[Optional[str], Optional[bytes]]:
+    """Poll until the leader holding the lease finishes, or the lease is gone"""
+    poll = 0
+    while True:
+        status, result = backend.get(full_key)
+        if status != RUNNING:
+            return status, result
+        time.sleep(POLL_SECONDS[min(poll, len(POLL_SECONDS) - 1)])
+        poll += 1
+
+
+def _finish(backend: Optional[FlightBackend], namespace: str, full_key: str, status: str, result: bytes):
+    if backend is None:
+        return
+    try:
+        backend.finish(full_key, status, result, settings.SINGLE_FLIGHT_RESULT_SECONDS)
+    except Exception as e:
+        # Waiters in other workers take the lease over when it expires
+        print(f"Single-flight result could not be stored for {full_key}: {e}")
+        _metrics.incr(namespace, "errors")
+
+
+def metrics() -> dict:
+    """Calls run vs. coalesced per namespace for this worker"""
+    return {"backend": settings.SINGLE_FLIGHT_BACKEND, "namespaces": _metrics.snapshot()}
@@ -0,0 +1,238 @@
+"""
+Per-request timing: total, DB, LLM and serialization time plus SQL query counts.
+
+TracingMiddleware starts a Trace for every HTTP request and reports it in the
+Server-Timing header. SQLAlchemy cursor events, llm.complete and
+responses.serialize add to the current trace through `span()`. A sample of
+traces is appended to TRACE_EXPORT_PATH as OTLP JSON (one ExportTraceServiceRequest
+per line, the format the OpenTelemetry collector's otlpjsonfile receiver reads).
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+# Categories reported in Server-Timing, in this order
+CATEGORIES = ("db", "llm", "serialization")
+
+MAX_SPANS = 200  # per trace, so a runaway N+1 loop can't grow one without bound
+MAX_STATEMENT_LENGTH = 500
+# Long-lived streams (the push channel) would only ever show up as slow requests
+UNTRACED_PREFIXES = ("/api/events/",)
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int
+    attributes: Dict[str, object]
+
+
+@dataclass
+class Trace:
+    method: str
+    path: str
+    trace_id: str = field(default_factory=lambda: os.urandom(16).hex())
+    start_ns: int = field(default_factory=time.time_ns)
+    durations: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(CATEGORIES, 0.0))
+    query_count: int = 0
+    spans: List[Span] = field(default_factory=list)
+    # LLM batches run in worker threads that share the request's trace
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, category: str, name: str, start_ns: int, end_ns: int, attributes: Optional[dict] = None):
+        with self.lock:
+            self.durations[category] += (end_ns - start_ns) / 1e6
+            if category == "db":
+                self.query_count += 1
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(Span(name, start_ns, end_ns, dict(attributes or {}, category=category)))
+
+    def elapsed_ms(self) -> float:
+        return (time.time_ns() - self.start_ns) / 1e6
+
+    def server_timing(self) -> str:
+        parts = [f"total;dur={self.elapsed_ms():.1f}"]
+        for category in CATEGORIES:
+            desc = f';desc="{self.query_count} queries"' if category == "db" else ""
+            parts.append(f"{category};dur={self.durations[category]:.1f}{desc}")
+        return ", ".join(parts)
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(category: str, name: str, **attributes):
+    """Time a block and charge it to `category` of the current request (no-op outside a request)"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.time_ns()
+    try:
+        yield
+    finally:
+        trace.add(category, name, start, time.time_ns(), attributes)
+
+
+def param_shape(parameters) -> object:
+    """Types of the bound parameters without their values, e.g. {"user_id": "UUID"}"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one shape for the batch
+            return {"rows": len(parameters), "row": param_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+# The start time lives on the statement's execution context rather than the
+# connection, so a statement that fails can't leave one behind for the next
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._trace_start_ns = time.time_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_trace_start_ns", None)
+    if start is None:
+        return
+    end = time.time_ns()
+    elapsed_ms = (end - start) / 1e6
+
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add("db", "sql", start, end, {"db.statement": statement[:MAX_STATEMENT_LENGTH]})
+
+    if elapsed_ms >= settings.SLOW_SQL_MS:
+        where = f" in {trace.method} {trace.path}" if trace is not None else ""
+        print(f"Slow SQL ({elapsed_ms:.0f}ms){where}: {' '.join(statement.split())[:MAX_STATEMENT_LENGTH]} "
+              f"params={json.dumps(param_shape(parameters))}")
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement the engine runs"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_export_lock = threading.Lock()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp(trace: Trace, status_code: int, end_ns: int) -> dict:
+    """The trace as an OTLP/JSON ExportTraceServiceRequest: a root span with one child per operation"""
+    root_id = os.urandom(8).hex()
+    root = {
+        "traceId": trace.trace_id,
+        "spanId": root_id,
+        "name": f"{trace.method} {trace.path}",
+        "kind": 2,  # SERVER
+        "startTimeUnixNano": str(trace.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attributes({
+            "http.request.method": trace.method,
+            "url.path": trace.path,
+            "http.response.status_code": status_code,
+            "db.query_count": trace.query_count,
+            **{f"{category}.duration_ms": round(trace.durations[category], 2) for category in CATEGORIES}
+        })
+    }
+    children = [
+        {
+            "traceId": trace.trace_id,
+            "spanId": os.urandom(8).hex(),
+            "parentSpanId": root_id,
+            "name": s.name,
+            "kind": 3 if s.attributes.get("category") in ("db", "llm") else 1,  # CLIENT or INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attributes(s.attributes)
+        }
+        for s in trace.spans
+    ]
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": "forathlete-api"})},
+        "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [root] + children}]
+    }]}
+
+
+def export(trace: Trace, status_code: int):
+    """Append a sampled trace to TRACE_EXPORT_PATH; slow requests are always kept"""
+    path = settings.TRACE_EXPORT_PATH
+    if not path:
+        return
+    end_ns = time.time_ns()
+    slow = (end_ns - trace.start_ns) / 1e6 >= settings.TRACE_SLOW_REQUEST_MS
+    if not slow and random.random() >= settings.TRACE_SAMPLE_RATE:
+        return
+    line = json.dumps(to_otlp(trace, status_code, end_ns), separators=(",", ":"))
+    try:
+        with _export_lock, open(path, "a") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not export trace: {e}")
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware, so the trace context reaches sync routes (run in a
+    threadpool with a copy of the context) and the Server-Timing header is
+    added without buffering the body
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED or scope["path"].startswith(UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = current_trace.set(trace)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            # Name exported traces by route template, not by the concrete URL
+            route = scope.get("route")
+            if route is not None:
+                trace.path = getattr(route, "path", trace.path)
+            export(trace, status_code)
@@ -1,9 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, checkin, coach, profile, workout_completion
+from fastapi.responses import ORJSONResponse
+from brotli_asgi import BrotliMiddleware
+from app.core import cache, single_flight
+from app.core.config import settings
+from app.core.database import dispose_engine
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.push import hub
+from app.core.tracing import TracingMiddleware
+from app.routes import auth, biometrics, checkin, coach, events, profile, sync, workout_completion
 
 
-app = FastAPI(title="ForAthlete API", version="1.0.0")
+class CompressionMiddleware(BrotliMiddleware):
+    """BrotliMiddleware that reads its settings when the middleware stack is built, not at import"""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app, quality=settings.BROTLI_QUALITY, minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+                         **kwargs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Settings, the DB engine and LLM clients are all created on first use,
+    # so startup does no I/O and the first request can be served right away
+    yield
+    await hub.close()
+    dispose_engine()
+
+
+app = FastAPI(
+    title="ForAthlete API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# Innermost, so Idempotency-Key replays store and return exactly what the endpoint sent
+app.add_middleware(IdempotencyMiddleware)
 
 # CORS configuration
 app.add_middleware(
@@ -12,17 +46,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Idempotent-Replayed"],
 )
 
+# Brotli for clients that accept it, gzip fallback for everyone else
+app.add_middleware(
+    CompressionMiddleware,
+    gzip_fallback=True,
+    excluded_handlers=["^/api/events/"],  # compressors buffer, which would hold back SSE events
+)
+
+# Added last so it wraps everything else: Server-Timing covers compression too
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 
 app.include_router(checkin.router)
 
+app.include_router(biometrics.router)
+
 app.include_router(coach.router)
 
+app.include_router(events.router)
+
 app.include_router(profile.router)
 
+app.include_router(sync.router)
+
 app.include_router(workout_completion.router)
 
 @app.get("/")
@@ -31,4 +82,9 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+def metrics():
+    """Cache hits, coalesced LLM calls and push connections, counted by the worker that answers"""
+    return {"cache": cache.metrics(), "single_flight": single_flight.metrics(), "push": hub.metrics()}
\ No newline at end of file
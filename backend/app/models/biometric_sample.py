@@ -0,0 +1,44 @@
+from sqlalchemy import DDL, Column, SmallInteger, Float, DateTime, ForeignKey, Index, PrimaryKeyConstraint, event
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+# kind codes; kept as a smallint so rows stay narrow (~40 bytes with the tuple header)
+HEART_RATE = 1  # bpm
+RR_INTERVAL = 2  # beat-to-beat interval, ms
+HRV_RMSSD = 3  # ms, when the device reports RMSSD per window instead of RR intervals
+SLEEP_STAGE = 4  # value is a SLEEP_STAGES code, valid until the next stage sample
+
+KINDS = {"heart_rate": HEART_RATE, "rr_interval": RR_INTERVAL, "hrv_rmssd": HRV_RMSSD, "sleep_stage": SLEEP_STAGE}
+SLEEP_STAGES = {"awake": 0, "light": 1, "deep": 2, "rem": 3}
+
+
+class BiometricSample(Base):
+    """
+    Intraday wearable samples, range partitioned by ts (monthly partitions are
+    optional, see app.services.biometrics.ensure_partitions)
+
+    The primary key doubles as the per-user index: a month of one user's
+    samples is one index range scan. BRIN on ts serves the time-window scans
+    of the rollup and partition maintenance at a tiny fraction of a btree's size.
+    """
+    __tablename__ = "biometric_samples"
+
+    # Widest to narrowest so no alignment padding is needed between columns
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
+    value = Column(Float(precision=24), nullable=False)  # real
+    kind = Column(SmallInteger, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('user_id', 'kind', 'ts', name='pk_biometric_samples'),
+        Index('ix_biometric_samples_ts_brin', 'ts', postgresql_using='brin'),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+
+# Rows outside every monthly partition (or all rows, when partitioning is off) land here
+event.listen(
+    BiometricSample.__table__,
+    "after_create",
+    DDL("CREATE TABLE biometric_samples_default PARTITION OF biometric_samples DEFAULT")
+)
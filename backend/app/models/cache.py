@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, LargeBinary
+from app.core.database import Base
+
+
+class CacheEntry(Base):
+    """Shared cache entries when CACHE_BACKEND=postgres; UNLOGGED, so losing them on a crash is fine"""
+    __tablename__ = "cache_entries"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(300), primary_key=True)  # "<namespace>:<generation>:<key>"
+    value = Column(LargeBinary, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class CacheNamespace(Base):
+    """Generation per namespace; bumping it invalidates every entry in the namespace"""
+    __tablename__ = "cache_namespaces"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    namespace = Column(String(100), primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
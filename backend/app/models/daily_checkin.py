@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Date, ForeignKey, CheckConstraint
+from sqlalchemy import BigInteger, Column, String, DateTime, Integer, Date, FetchedValue, ForeignKey, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -24,9 +24,20 @@ class DailyCheckin(Base):
     energy_level = Column(Integer, CheckConstraint('energy_level >= 1 AND energy_level <= 5'), nullable=True)
 
     notes = Column(String, nullable=True)
+
+    # Nightly wearable rollup: {"rmssd", "min_hr", "sleep_minutes", "stages": {"deep": 84, ...}, "samples"}.
+    # hrv, rhr and sleep_hours are filled from it unless the athlete entered their own values.
+    wearable = Column(JSONB, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Transaction id of the last write, set by a trigger (app.models.sync)
+    sync_version = Column(BigInteger, nullable=False, server_default='0', server_onupdate=FetchedValue())
+
     __table_args__ = (
         # One check-in per user per day
         CheckConstraint('date IS NOT NULL', name='date_not_null'),
-    )
\ No newline at end of file
+        Index('ix_daily_checkins_user_id_sync_version', 'user_id', 'sync_version'),
+    )
+
+    # Read sync_version back with RETURNING instead of a reload per row
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Text, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class DailyRecommendation(Base):
+    __tablename__ = "daily_recommendations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    date = Column(Date, nullable=False)
+
+    # sha256 of the check-in metrics and planned workout the text was generated from
+    input_hash = Column(String(64), nullable=False)
+    recommendation = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', name='uq_daily_recommendations_user_date'),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """A POST made with an Idempotency-Key and, once finished, its response (app.core.idempotency)"""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 of path + body, to catch a reused key
+    status = Column(String(20), nullable=False)  # "pending" while the first request runs, then "done"
+
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(JSONB, nullable=True)  # [[name, value], ...] as sent
+    response_body = Column(LargeBinary, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Date, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class LLMUsage(Base):
+    """
+    LLM calls and tokens per user, UTC day, endpoint and model, added to as
+    completions finish (see app.services.usage)
+    """
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        Index("ix_llm_usage_day", "day"),
+    )
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    endpoint = Column(String(100), primary_key=True)  # "POST /api/coach/training-plan", or the background job
+    task = Column(String(50), primary_key=True)  # key of app.services.llm.TASK_CLASSES
+    model = Column(String(100), primary_key=True)
+    provider = Column(String(20), nullable=False)
+
+    calls = Column(Integer, nullable=False)
+    prompt_tokens = Column(BigInteger, nullable=False)
+    completion_tokens = Column(BigInteger, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
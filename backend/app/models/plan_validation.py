@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class PlanValidation(Base):
+    """One validator run over a generated plan (see app.services.plan_validator)"""
+    __tablename__ = "plan_validations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    source = Column(String(30), nullable=False)  # "weekly_plan", "single_day", "mesocycle"
+
+    score_before = Column(Integer, nullable=False)
+    score_after = Column(Integer, nullable=False)
+    violations = Column(JSONB, nullable=False)  # codes found, e.g. ["avoid_day", "volume"]
+    remaining = Column(JSONB, nullable=False)  # codes left after repair
+
+    repaired = Column(Boolean, nullable=False, default=False)
+    regenerated = Column(Boolean, nullable=False, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Float, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class RateLimitBucket(Base):
+    """Token bucket state shared by all workers when RATE_LIMIT_BACKEND=postgres"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(200), primary_key=True)  # "<endpoint_class>:<user_id>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class RateLimitCounter(Base):
+    """Expiring counters, e.g. LLM tokens spent per user per day"""
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String(200), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
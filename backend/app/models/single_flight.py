@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary
+from app.core.database import Base
+
+
+class SingleFlight(Base):
+    """Leases and results for calls shared across workers when SINGLE_FLIGHT_BACKEND=postgres; UNLOGGED"""
+    __tablename__ = "single_flights"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(300), primary_key=True)  # "<namespace>:<key>"
+    status = Column(String(10), nullable=False)  # "running", then "done" or "failed"
+    result = Column(LargeBinary, nullable=True)  # JSON value, or the error message
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
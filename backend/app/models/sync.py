@@ -0,0 +1,64 @@
+from sqlalchemy import DDL, BigInteger, Column, DateTime, Index, String, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# Tables the delta sync API serves (app.services.sync), by entity name
+SYNC_TABLES = {
+    "checkins": "daily_checkins",
+    "completions": "workout_completions",
+    "plans": "training_plans",
+    "profile": "user_profiles",
+}
+
+
+class SyncTombstone(Base):
+    """
+    A deleted row the sync API still has to report. No foreign key: the
+    delete trigger skips rows removed by a user's own cascade delete.
+    """
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    entity = Column(String(50), nullable=False)  # table name
+    row_id = Column(UUID(as_uuid=True), nullable=False)
+    sync_version = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_sync_tombstones_user_id_sync_version', 'user_id', 'sync_version'),
+        Index('ix_sync_tombstones_deleted_at', 'deleted_at'),
+    )
+
+
+# sync_version is the id of the last transaction that wrote the row. Transaction
+# ids only grow, and unlike a sequence value the reader can tell which ones may
+# still be uncommitted (see app.services.sync), so no change is ever skipped.
+SYNC_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_version := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM users WHERE id = OLD.user_id) THEN
+        INSERT INTO sync_tombstones (user_id, entity, row_id, sync_version)
+        VALUES (OLD.user_id, TG_TABLE_NAME, OLD.id, pg_current_xact_id()::text::bigint);
+    END IF;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+"""
+
+SYNC_TRIGGERS = "".join(
+    f"CREATE TRIGGER {table}_sync_touch BEFORE INSERT OR UPDATE ON {table} "
+    f"FOR EACH ROW EXECUTE FUNCTION sync_touch();\n"
+    f"CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table} "
+    f"FOR EACH ROW EXECUTE FUNCTION sync_tombstone();\n"
+    for table in SYNC_TABLES.values()
+)
+
+# create_all (benchmarks) creates the tables first, then the triggers
+event.listen(Base.metadata, "after_create", DDL(SYNC_FUNCTIONS + SYNC_TRIGGERS))
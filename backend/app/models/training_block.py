@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class TrainingBlock(Base):
+    """A multi-week mesocycle; its weeks are stored as training_plans rows"""
+    __tablename__ = "training_blocks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    start_date = Column(Date, nullable=False)
+    weeks = Column(Integer, nullable=False)
+    target_race = Column(String(200), nullable=True)
+    profile_version = Column(Integer, nullable=False)  # profile the block was planned from
+
+    # Per-week targets from app.services.periodization: phase, run_minutes, long_run_minutes, ...
+    skeleton = Column(JSONB, nullable=False)
+
+    is_active = Column(Integer, default=1)  # 1 = current block, 0 = archived
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Text, Date
+from sqlalchemy import DDL, BigInteger, Column, String, Integer, FetchedValue, ForeignKey, Text, Date, Index, event
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy import DateTime
@@ -15,6 +15,98 @@ class TrainingPlan(Base):
     week_start_date = Column(Date, nullable=False)  # Monday of the week
     plan_data = Column(JSONB, nullable=False)  # The full week plan
 
+    # Set when the week belongs to a multi-week block
+    block_id = Column(UUID(as_uuid=True), ForeignKey('training_blocks.id', ondelete='CASCADE'), nullable=True, index=True)
+    week_number = Column(Integer, nullable=True)
+
     is_active = Column(Integer, default=1)  # 1 = current plan, 0 = archived
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Transaction id of the last write, set by a trigger (app.models.sync)
+    sync_version = Column(BigInteger, nullable=False, server_default='0', server_onupdate=FetchedValue())
+
+    # Summary of plan_data kept by the training_plans_summary trigger, so plans can be
+    # filtered and aggregated in SQL without reading the document. Counts every session
+    # of the week, extras on a day (badminton, strength, core) included; rest days aren't.
+    planned_minutes = Column(Integer, nullable=False, server_default='0', server_onupdate=FetchedValue())
+    run_minutes = Column(Integer, nullable=False, server_default='0', server_onupdate=FetchedValue())
+    hard_sessions = Column(Integer, nullable=False, server_default='0', server_onupdate=FetchedValue())  # hard or competition
+    minutes_by_type = Column(JSONB, nullable=False, server_default='{}', server_onupdate=FetchedValue())  # {"run": 190, ...}
+    days_by_type = Column(JSONB, nullable=False, server_default='{}', server_onupdate=FetchedValue())  # {"strength": ["tuesday"], ...}
+
+    __table_args__ = (
+        # Weekly totals ride along, so volume over a date range is an index-only scan
+        Index('ix_training_plans_user_id_week_start_date', 'user_id', 'week_start_date',
+              postgresql_include=['is_active', 'planned_minutes', 'run_minutes', 'hard_sessions']),
+        Index('ix_training_plans_user_id_sync_version', 'user_id', 'sync_version'),
+        # Containment and jsonpath over the document: plan_data @> '{"tuesday": {"type": "strength"}}'
+        Index('ix_training_plans_plan_data', 'plan_data', postgresql_using='gin',
+              postgresql_ops={'plan_data': 'jsonb_path_ops'}),
+        Index('ix_training_plans_days_by_type', 'days_by_type', postgresql_using='gin'),
+    )
+
+    # Read sync_version back with RETURNING instead of a reload per row
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# Summary of a plan document. Durations the model wrote as text or fractions are
+# rounded, anything else counts as 0, so a malformed day never fails the write.
+# Migration c4e8a1f6d2b9 runs this too; a change needs a new migration that
+# replaces the functions.
+PLAN_SUMMARY_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION plan_summary(plan jsonb,
+    OUT planned_minutes integer, OUT run_minutes integer, OUT hard_sessions integer,
+    OUT minutes_by_type jsonb, OUT days_by_type jsonb) AS $$
+    WITH days AS (
+        SELECT d.key AS day, d.value,
+               array_position(ARRAY['monday','tuesday','wednesday','thursday','friday','saturday','sunday'], d.key) AS pos
+        FROM jsonb_each(CASE jsonb_typeof(plan) WHEN 'object' THEN plan ELSE '{}' END) AS d
+        WHERE jsonb_typeof(d.value) = 'object'
+    ),
+    sessions AS (
+        SELECT day, pos, value->>'type' AS type, value->>'intensity' AS intensity,
+               value->>'duration_minutes' AS minutes
+        FROM days
+        UNION ALL
+        SELECT day, pos, e->>'type', e->>'intensity', e->>'duration_minutes'
+        FROM days
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE jsonb_typeof(value->'extras') WHEN 'array' THEN value->'extras' ELSE '[]' END) AS e
+        WHERE jsonb_typeof(e) = 'object'
+    ),
+    typed AS (
+        SELECT day, pos, type, intensity,
+               CASE WHEN minutes ~ '^[0-9]+([.][0-9]+)?$' THEN round(minutes::numeric)::int ELSE 0 END AS minutes
+        FROM sessions
+        WHERE type IS NOT NULL AND type <> 'rest'
+    ),
+    by_type AS (
+        SELECT type, SUM(minutes)::int AS minutes,
+               (SELECT jsonb_agg(day ORDER BY pos)
+                FROM (SELECT DISTINCT t2.day, t2.pos FROM typed t2 WHERE t2.type = typed.type) AS type_days) AS days
+        FROM typed
+        GROUP BY type
+    )
+    SELECT COALESCE(SUM(minutes), 0)::int,
+           COALESCE(SUM(minutes) FILTER (WHERE type = 'run'), 0)::int,
+           (SELECT COUNT(*) FROM typed WHERE intensity IN ('hard', 'competition'))::int,
+           COALESCE(jsonb_object_agg(type, minutes), '{}'),
+           COALESCE(jsonb_object_agg(type, days), '{}')
+    FROM by_type
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION training_plan_summary() RETURNS trigger AS $$
+BEGIN
+    SELECT s.planned_minutes, s.run_minutes, s.hard_sessions, s.minutes_by_type, s.days_by_type
+    INTO NEW.planned_minutes, NEW.run_minutes, NEW.hard_sessions, NEW.minutes_by_type, NEW.days_by_type
+    FROM plan_summary(NEW.plan_data) AS s;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER training_plans_summary BEFORE INSERT OR UPDATE OF plan_data ON training_plans
+FOR EACH ROW EXECUTE FUNCTION training_plan_summary();
+"""
+
+# create_all (benchmarks) creates the table first, then the trigger
+event.listen(TrainingPlan.__table__, "after_create", DDL(PLAN_SUMMARY_FUNCTIONS))
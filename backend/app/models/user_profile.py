@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, Text
+from sqlalchemy import BigInteger, Column, String, Integer, FetchedValue, Float, Boolean, ForeignKey, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy import DateTime
@@ -35,5 +35,14 @@ class UserProfile(Base):
     sleep_average = Column(Float, nullable=True)  # Average sleep hours
     other_commitments = Column(Text, nullable=True)  # Free text for constraints
 
+    # Bumped on every update; keys the cached coach snapshot (app.services.profile_snapshot)
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Transaction id of the last write, set by a trigger (app.models.sync)
+    sync_version = Column(BigInteger, nullable=False, server_default='0', server_onupdate=FetchedValue())
+
+    # Read sync_version back with RETURNING instead of a reload per row
+    __mapper_args__ = {"eager_defaults": True}
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, Date, Text, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, Column, String, Boolean, Date, FetchedValue, Float, Index, Integer, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from sqlalchemy import DateTime
 import uuid
@@ -13,6 +13,26 @@ class WorkoutCompletion(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     date = Column(Date, nullable=False)
     workout_type = Column(String(50), nullable=False)
+    # Which session of the day this is (e.g. "run", "badminton"); defaults to the workout type
+    slot = Column(String(50), nullable=False)
     completed = Column(Boolean, default=True)
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+
+    # Filled from an uploaded activity file (FIT/GPX/TCX)
+    duration_minutes = Column(Integer, nullable=True)  # moving time
+    distance_m = Column(Integer, nullable=True)
+    avg_hr = Column(Integer, nullable=True)
+    trimp = Column(Float, nullable=True)
+    activity = Column(JSONB, nullable=True)  # full analysis: HR zones, splits, elevation, ...
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Transaction id of the last write, set by a trigger (app.models.sync)
+    sync_version = Column(BigInteger, nullable=False, server_default='0', server_onupdate=FetchedValue())
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', 'slot', name='uq_workout_completions_user_date_slot'),
+        Index('ix_workout_completions_user_id_sync_version', 'user_id', 'sync_version'),
+    )
+
+    # Read sync_version back with RETURNING instead of a reload per row
+    __mapper_args__ = {"eager_defaults": True}
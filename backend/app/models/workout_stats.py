@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class WorkoutWeeklyStats(Base):
+    """
+    Planned vs completed sessions for one user and week, refreshed whenever a
+    completion or plan in that week changes (see app.services.workout_stats)
+    """
+    __tablename__ = "workout_weekly_stats"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # Monday
+
+    planned_sessions = Column(Integer, nullable=False)
+    completed_sessions = Column(Integer, nullable=False)
+    planned_minutes = Column(Integer, nullable=False)
+    completed_minutes = Column(Integer, nullable=False)
+    by_type = Column(JSONB, nullable=False)  # {"run": {"planned_sessions": 4, "completed_sessions": 3, ...}}
+
+    # Completed planned sessions in a row from the start and up to the end of
+    # the week, and the longest run inside it, so streaks join across weeks
+    lead_streak = Column(Integer, nullable=False)
+    tail_streak = Column(Integer, nullable=False)
+    best_streak = Column(Integer, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+import uuid
 
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from app.core.security import (
+    verify_password, get_password_hash, create_access_token, decode_access_token,
+    create_refresh_token, hash_refresh_token
+)
 from app.core.config import settings
 from app.models.user import User
-from app.schemas.user import UserCreate, UserResponse, Token
+from app.models.refresh_token import RefreshToken
+from app.schemas.user import UserCreate, UserResponse, Token, RefreshRequest
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -48,34 +53,145 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token
+    # Create access token, plus a refresh token that starts a new rotation family
+    refresh_token = _issue_refresh_token(db, user.id, family_id=uuid.uuid4())
+    response = _token_response(user, refresh_token)
+    db.commit()
+
+    return response
+
+
+@router.post("/refresh", response_model=Token)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    invalid_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    # Lock the row so concurrent refreshes with the same token can't both rotate it
+    stored = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(request.refresh_token)
+    ).with_for_update().first()
+    if not stored:
+        raise invalid_exception
+
+    now = datetime.now(timezone.utc)
+
+    if stored.revoked_at is not None and _retried(db, stored, now):
+        # The client never got the last response: rotate its replacement instead
+        stored = db.query(RefreshToken).filter(
+            RefreshToken.id == stored.replaced_by
+        ).with_for_update().first()
+        if stored is None or stored.revoked_at is not None:
+            # The replacement was used in the meantime
+            raise invalid_exception
+    elif stored.revoked_at is not None:
+        # A rotated-out token came back: assume it was stolen and end the whole session
+        db.query(RefreshToken).filter(
+            RefreshToken.family_id == stored.family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({"revoked_at": now}, synchronize_session=False)
+        db.commit()
+        raise invalid_exception
+
+    if stored.expires_at <= now:
+        raise invalid_exception
+
+    user = db.query(User).filter(User.id == stored.user_id).first()
+    if user is None:
+        raise invalid_exception
+
+    new_token = _issue_refresh_token(db, user.id, family_id=stored.family_id)
+    stored.revoked_at = now
+    stored.replaced_by = new_token.id
+    response = _token_response(user, new_token)
+    db.commit()
+
+    return response
+
+
+@router.post("/logout")
+def logout(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke every refresh token in the session the given token belongs to"""
+    stored = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(request.refresh_token)
+    ).first()
+
+    if stored:
+        db.query(RefreshToken).filter(
+            RefreshToken.family_id == stored.family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({"revoked_at": datetime.now(timezone.utc)}, synchronize_session=False)
+        db.commit()
+
+    return {"message": "Logged out"}
+
+
+def _retried(db: Session, stored: RefreshToken, now: datetime) -> bool:
+    """
+    Whether a revoked token is the one rotated out moments ago and its
+    replacement hasn't been used yet, i.e. a retry rather than a replay
+    """
+    grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+    if stored.replaced_by is None or now - stored.revoked_at > grace:
+        return False
+    return db.query(RefreshToken.id).filter(
+        RefreshToken.id == stored.replaced_by,
+        RefreshToken.revoked_at.is_(None)
+    ).first() is not None
+
+
+def _issue_refresh_token(db: Session, user_id, family_id) -> RefreshToken:
+    raw_token = create_refresh_token()
+    token = RefreshToken(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        token_hash=hash_refresh_token(raw_token),
+        family_id=family_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    # Only the hash is persisted; keep the raw value on the instance for the response
+    token.raw_token = raw_token
+    db.add(token)
+    return token
+
+
+def _token_response(user: User, refresh_token: RefreshToken) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token.raw_token}
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def token_email(token: str) -> str:
+    """The email an access token was issued to; 401 when the token is invalid"""
     payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
+    if payload is None or payload.get("sub") is None:
+        raise credentials_exception()
+    return payload["sub"]
 
-    email: str = payload.get("sub")
-    if email is None:
-        raise credentials_exception
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    email = token_email(token)
 
     user = db.query(User).filter(User.email == email).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
 
+    # Commits on this session send the user's next reads to the primary (see app.core.replicas)
+    db.info["user_id"] = user.id
     return user
 
 
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.routes.auth import get_current_user
+from app.models.biometric_sample import KINDS, BiometricSample
+from app.models.user import User
+from app.schemas.biometrics import (
+    MAX_SAMPLES_PER_BATCH, BiometricBatch, BiometricIngestResponse, BiometricSeries, SampleKind
+)
+from app.services import biometrics
+from app.services.recommendations import schedule_refresh
+
+router = APIRouter(prefix="/api/biometrics", tags=["biometrics"])
+
+MAX_QUERY_DAYS = 92
+
+
+@router.post("/samples", response_model=BiometricIngestResponse)
+def ingest_samples(
+        batch: BiometricBatch,
+        background_tasks: BackgroundTasks,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Store wearable samples and roll up the nights they belong to into the check-ins"""
+    if any(len(series.ts) != len(series.value) for series in batch.series):
+        raise HTTPException(status_code=400, detail="ts and value must have the same length")
+    total = sum(len(series.ts) for series in batch.series)
+    if total > MAX_SAMPLES_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SAMPLES_PER_BATCH} samples per request")
+
+    rows = [(ts, KINDS[series.kind], value) for series in batch.series for ts, value in series.rows()]
+    if not rows:
+        return ORJSONResponse({"samples": 0, "nights": []})
+
+    biometrics.ingest(db, current_user.id, rows)
+    nights = sorted(biometrics.nights_for((ts for ts, _, _ in rows), batch.utc_offset_minutes))
+    changed = [day for day in nights if biometrics.rollup(db, current_user.id, day, batch.utc_offset_minutes)]
+    db.commit()
+
+    # New HRV / resting HR change the inputs of an already generated recommendation
+    for day in changed:
+        schedule_refresh(background_tasks, db, current_user, day)
+
+    return ORJSONResponse({"samples": len(rows), "nights": [day.isoformat() for day in nights]})
+
+
+@router.get("/samples", response_model=BiometricSeries)
+def get_samples(
+        kind: SampleKind,
+        start: datetime,
+        end: datetime,
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
+):
+    """Raw samples of one kind in [start, end), as parallel arrays"""
+    if end <= start or end - start > timedelta(days=MAX_QUERY_DAYS):
+        raise HTTPException(status_code=400, detail=f"end must be after start and at most {MAX_QUERY_DAYS} days later")
+
+    # Primary key range scan: (user_id, kind, ts)
+    rows = db.query(BiometricSample.ts, BiometricSample.value).filter(
+        BiometricSample.user_id == current_user.id,
+        BiometricSample.kind == KINDS[kind],
+        BiometricSample.ts >= start,
+        BiometricSample.ts < end
+    ).order_by(BiometricSample.ts).all()
+
+    return ORJSONResponse({"kind": kind, "ts": [row.ts for row in rows], "value": [row.value for row in rows]})
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import date
 from typing import List
 
 from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.core.responses import orm_response
 from app.routes.auth import get_current_user
 from app.models.user import User
 from app.models.daily_checkin import DailyCheckin
 from app.schemas.checkin import DailyCheckinCreate, DailyCheckinResponse
+from app.services.biometrics import update_checkin
+from app.services.recommendations import schedule_refresh
 
 router = APIRouter(prefix="/api/checkins", tags=["check-ins"])
 
@@ -15,6 +19,7 @@ router = APIRouter(prefix="/api/checkins", tags=["check-ins"])
 @router.post("", response_model=DailyCheckinResponse, status_code=status.HTTP_201_CREATED)
 def create_checkin(
         checkin_data: DailyCheckinCreate,
+        background_tasks: BackgroundTasks,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -26,12 +31,12 @@ def create_checkin(
 
     if existing:
         # Update existing check-in instead of failing
-        for key, value in checkin_data.model_dump().items():
-            if key != 'date':  # Don't update the date
-                setattr(existing, key, value)
+        update_checkin(existing, checkin_data.model_dump(exclude={"date"}))
         db.commit()
         db.refresh(existing)
-        return existing
+        response = orm_response(DailyCheckinResponse, existing, status_code=status.HTTP_201_CREATED)
+        schedule_refresh(background_tasks, db, current_user, existing.date)
+        return response
 
     # Create new check-in
     checkin = DailyCheckin(
@@ -41,14 +46,18 @@ def create_checkin(
     db.add(checkin)
     db.commit()
     db.refresh(checkin)
+    response = orm_response(DailyCheckinResponse, checkin, status_code=status.HTTP_201_CREATED)
 
-    return checkin
+    # Generate the day's recommendation now so the dashboard read is a lookup
+    schedule_refresh(background_tasks, db, current_user, checkin.date)
+
+    return response
 
 
 @router.get("/today", response_model=DailyCheckinResponse)
 def get_today_checkin(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
 ):
     today = date.today()
     checkin = db.query(DailyCheckin).filter(
@@ -62,17 +71,17 @@ def get_today_checkin(
             detail="No check-in found for today"
         )
 
-    return checkin
+    return orm_response(DailyCheckinResponse, checkin)
 
 
 @router.get("/history", response_model=List[DailyCheckinResponse])
 def get_checkin_history(
         limit: int = 30,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
 ):
     checkins = db.query(DailyCheckin).filter(
         DailyCheckin.user_id == current_user.id
     ).order_by(DailyCheckin.date.desc()).limit(limit).all()
 
-    return checkins
\ No newline at end of file
+    return orm_response(List[DailyCheckinResponse], checkins)
\ No newline at end of file
@@ -1,22 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
-from typing import Optional
+from typing import Dict, List, Optional
 
+from app.core import push
 from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.core.rate_limit import check, enforce, track_usage
 from app.routes.auth import get_current_user
 from app.models.user import User
-from app.models.user_profile import UserProfile
-from app.models.daily_checkin import DailyCheckin
-from app.services.ai_coach import get_daily_recommendation, generate_weekly_training_plan
 from app.models.training_plan import TrainingPlan
-from pydantic import BaseModel
+from app.services import (
+    periodization, plan_validator, profile_snapshot, recommendations, training_plans, workout_stats
+)
+from pydantic import BaseModel, Field
 
 
 
 router = APIRouter(prefix="/api/coach", tags=["coach"])
 
 
+def rate_limit(endpoint_class: str):
+    """
+    Dependency that enforces the user's token bucket for `endpoint_class` and the
+    daily LLM token quota, and charges LLM tokens used by the request to that quota.
+    """
+    # Async so the usage recorder is set in the request's context, which sync
+    # endpoints inherit when FastAPI moves them to the threadpool
+    async def dependency(request: Request, current_user: User = Depends(get_current_user)):
+        await run_in_threadpool(check, current_user.id, endpoint_class)
+        # Route template, so usage groups by endpoint rather than by URL
+        route = request.scope.get("route")
+        track_usage(current_user.id, f"{request.method} {getattr(route, 'path', request.url.path)}")
+
+    return dependency
+
+
 class RecommendationResponse(BaseModel):
     recommendation: str
 
@@ -30,6 +51,43 @@ class TrainingPlanResponse(BaseModel):
     generated_at: str
 
 
+class MesocycleRequest(BaseModel):
+    weeks: int = Field(8, ge=periodization.MIN_WEEKS, le=periodization.MAX_WEEKS)
+    start_date: Optional[str] = None
+
+
+class MesocycleWeek(BaseModel):
+    week_number: int
+    week_start_date: str
+    phase: str
+    run_minutes: int
+    long_run_minutes: int
+    quality_sessions: int
+    race_date: Optional[str] = None
+    plan: dict
+
+
+class MesocycleResponse(BaseModel):
+    block_id: str
+    start_date: str
+    weeks: List[MesocycleWeek]
+    generated_at: str
+
+
+class PlanWeekSummary(BaseModel):
+    week_start_date: str
+    week_number: Optional[int] = None
+    planned_minutes: int
+    run_minutes: int
+    hard_sessions: int
+    minutes_by_type: Dict[str, int]
+    days_by_type: Dict[str, List[str]]
+
+
+class PlanSummaryResponse(BaseModel):
+    weeks: List[PlanWeekSummary]
+
+
 @router.get("/daily-recommendation", response_model=RecommendationResponse)
 def get_daily_recommendation_endpoint(
         current_user: User = Depends(get_current_user),
@@ -37,65 +95,47 @@ def get_daily_recommendation_endpoint(
 ):
     today = date.today()
 
-    # Get today's check-in
-    checkin = db.query(DailyCheckin).filter(
-        DailyCheckin.user_id == current_user.id,
-        DailyCheckin.date == today
-    ).first()
-
-    if not checkin:
+    inputs = recommendations.recommendation_inputs(db, current_user.id, today)
+    if inputs is None:
         raise HTTPException(
             status_code=404,
             detail="No check-in found for today. Complete your check-in first."
         )
+    checkin_data, planned_workout = inputs
+    input_hash = recommendations.inputs_hash(checkin_data, planned_workout)
 
-    checkin_data = {
-        'sleep_hours': checkin.sleep_hours,
-        'sleep_quality': checkin.sleep_quality,
-        'hrv': checkin.hrv,
-        'rhr': checkin.rhr,
-        'energy_level': checkin.energy_level,
-        'soreness_level': checkin.soreness_level,
-        'notes': checkin.notes
-    }
+    # Precomputed when the check-in (or today's planned workout) was saved
+    stored = recommendations.get_stored(db, current_user.id, today)
+    if stored and stored.input_hash == input_hash:
+        return {"recommendation": stored.recommendation}
 
-    # Get today's planned workout from training plan
-    planned_workout = None
-    try:
-        plan = db.query(TrainingPlan).filter(
-            TrainingPlan.user_id == current_user.id,
-            TrainingPlan.is_active == 1
-        ).order_by(TrainingPlan.created_at.desc()).first()
+    # Not ready yet, or generated from older inputs: generate it here and keep it for the next read
 
-        if plan:
-            day_names = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-            today_name = day_names[today.weekday()]
-            today_workout = plan.plan_data.get(today_name)
+    enforce(current_user.id, "llm_light", "GET /api/coach/daily-recommendation")
+
+    from app.services.ai_coach import generate_daily_recommendation
 
-            if today_workout:
-                planned_workout = f"{today_workout.get('type', 'workout').upper()}: {today_workout.get('workout', 'N/A')} ({today_workout.get('duration_minutes', 0)}min)"
+    try:
+        recommendation = generate_daily_recommendation(
+            user_name=current_user.name,
+            checkin_data=checkin_data,
+            planned_workout=planned_workout
+        )
     except Exception as e:
-        print(f"Could not fetch planned workout: {e}")
-        planned_workout = None
+        return {"recommendation": f"Error getting recommendation: {str(e)}"}
 
-    recommendation = get_daily_recommendation(
-        user_name=current_user.name,
-        checkin_data=checkin_data,
-        planned_workout=planned_workout
-    )
+    recommendations.store(db, current_user.id, today, input_hash, recommendation)
 
     return {"recommendation": recommendation}
 
 @router.get("/training-plan/current", response_model=TrainingPlanResponse)
 def get_current_training_plan(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
 ):
     """Get the current active training plan"""
-    plan = db.query(TrainingPlan).filter(
-        TrainingPlan.user_id == current_user.id,
-        TrainingPlan.is_active == 1
-    ).order_by(TrainingPlan.created_at.desc()).first()
+    # This week's plan from the active block, if there is one
+    plan = training_plans.get_active_plan(db, current_user.id)
 
     if not plan:
         raise HTTPException(
@@ -103,21 +143,38 @@ def get_current_training_plan(
             detail="No active training plan found. Generate one first."
         )
 
-    return {
+    # plan_data is already plain JSON, so skip response_model re-validation
+    return ORJSONResponse({
         "plan": plan.plan_data,
         "generated_at": plan.created_at.isoformat()
-    }
+    })
 
 
-@router.post("/training-plan", response_model=TrainingPlanResponse)
+@router.get("/training-plan/summary", response_model=PlanSummaryResponse)
+def get_training_plan_summary(
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        session_type: Optional[str] = None,
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Planned minutes, run minutes, hard sessions and per-type minutes and days
+    for each active week, optionally only weeks with a `session_type` session
+    """
+    weeks = training_plans.summaries(db, current_user.id, start_date, end_date, session_type)
+    return ORJSONResponse({"weeks": weeks})
+
+
+@router.post("/training-plan", response_model=TrainingPlanResponse,
+             dependencies=[Depends(rate_limit("llm_heavy"))])
 def generate_training_plan_endpoint(
+        background_tasks: BackgroundTasks,
         request: TrainingPlanRequest = None,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    profile = db.query(UserProfile).filter(
-        UserProfile.user_id == current_user.id
-    ).first()
+    profile = profile_snapshot.get_snapshot(db, current_user.id)
 
     if not profile:
         raise HTTPException(
@@ -125,21 +182,6 @@ def generate_training_plan_endpoint(
             detail="Profile not found. Complete onboarding first."
         )
 
-    # Prepare profile data with all fields
-    profile_data = {
-        'badminton_sessions': profile.badminton_sessions or [],
-        'primary_sport': profile.primary_sport,
-        'running_goal': profile.running_goal,
-        'target_race': profile.target_race,
-        'weekly_run_volume_target': profile.weekly_run_volume_target or 180,
-        'running_experience': profile.running_experience or {},
-        'preferred_run_days': profile.preferred_run_days or [],
-        'avoid_run_days': profile.avoid_run_days or [],
-        'current_injuries': profile.current_injuries or [],
-        'sleep_average': profile.sleep_average,
-        'other_commitments': profile.other_commitments
-    }
-
     start_date = None
     if request and request.start_date:
         try:
@@ -151,13 +193,16 @@ def generate_training_plan_endpoint(
             )
 
     try:
-        plan = generate_weekly_training_plan(profile_data, start_date)
+        from app.services.ai_coach import generate_weekly_training_plan
 
-        # Archive old plans
-        db.query(TrainingPlan).filter(
-            TrainingPlan.user_id == current_user.id,
-            TrainingPlan.is_active == 1
-        ).update({"is_active": 0})
+        plan = generate_weekly_training_plan(profile, start_date)
+        plan = plan_validator.check(
+            db, current_user.id, "weekly_plan", plan, profile.data,
+            regenerate=lambda: generate_weekly_training_plan(profile, start_date)
+        )
+
+        # Archive old plans (and the block they belong to)
+        training_plans.archive_active(db, current_user.id)
 
         # Determine week start date
         if start_date:
@@ -175,22 +220,115 @@ def generate_training_plan_endpoint(
             is_active=1
         )
         db.add(new_plan)
+        workout_stats.refresh(db, current_user.id, week_start, week_start + timedelta(days=6))
+        push.notify(db, current_user.id, "plan.updated", {"week_start": week_start.isoformat()})
         db.commit()
         db.refresh(new_plan)
 
-        return {
+        # The new plan is active right away, so today's planned workout may have changed
+        recommendations.schedule_refresh(background_tasks, db, current_user, date.today())
+
+        return ORJSONResponse({
             "plan": plan,
             "generated_at": new_plan.created_at.isoformat()
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate training plan: {str(e)}"
         )
 
-@router.post("/training-plan/regenerate-day")
-async def regenerate_day_endpoint(
+def _mesocycle_response(block, weeks) -> dict:
+    plans = {week.week_number: week.plan_data for week in weeks}
+    return {
+        "block_id": str(block.id),
+        "start_date": block.start_date.isoformat(),
+        "weeks": [dict(target, plan=plans.get(target['week_number'], {})) for target in block.skeleton],
+        "generated_at": block.created_at.isoformat()
+    }
+
+
+@router.get("/mesocycle/current", response_model=MesocycleResponse)
+def get_current_mesocycle(
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
+):
+    """Get the active training block with every week's plan"""
+    block = training_plans.get_active_block(db, current_user.id)
+    if not block:
+        raise HTTPException(
+            status_code=404,
+            detail="No active training block found. Generate one first."
+        )
+
+    return ORJSONResponse(_mesocycle_response(block, training_plans.block_weeks(db, block)))
+
+
+@router.post("/mesocycle", response_model=MesocycleResponse,
+             dependencies=[Depends(rate_limit("llm_heavy"))])
+def generate_mesocycle_endpoint(
+        background_tasks: BackgroundTasks,
+        request: MesocycleRequest = None,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Generate a 4-12 week periodized block in one go. Volume, deloads and taper
+    are planned locally; the LLM writes the sessions. Each week is then served
+    from storage by /training-plan/current.
+    """
+    request = request or MesocycleRequest()
+
+    profile = profile_snapshot.get_snapshot(db, current_user.id)
+    if not profile:
+        raise HTTPException(
+            status_code=404,
+            detail="Profile not found. Complete onboarding first."
+        )
+
+    if request.start_date:
+        try:
+            start_date = date.fromisoformat(request.start_date)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid date format. Use ISO format (YYYY-MM-DD)"
+            )
+    else:
+        # Next Monday, like the weekly plan
+        today = date.today()
+        days_until_monday = (7 - today.weekday()) % 7
+        start_date = today + timedelta(days=days_until_monday if days_until_monday > 0 else 7)
+
+    skeleton = periodization.build_skeleton(profile.data, start_date, request.weeks)
+
+    try:
+        from app.services.ai_coach import generate_mesocycle
+
+        week_plans = [
+            plan_validator.check(db, current_user.id, "mesocycle", plan, profile.data, targets=week)
+            for week, plan in zip(skeleton, generate_mesocycle(profile, skeleton))
+        ]
+
+        block = training_plans.store_block(
+            db, current_user.id, start_date, profile.version, profile.data['target_race'], skeleton, week_plans
+        )
+
+        # The block replaces the active plan, so today's planned workout may have changed
+        recommendations.schedule_refresh(background_tasks, db, current_user, date.today())
+
+        return ORJSONResponse(_mesocycle_response(block, training_plans.block_weeks(db, block)))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate training block: {str(e)}"
+        )
+
+@router.post("/training-plan/regenerate-day", dependencies=[Depends(rate_limit("llm_heavy"))])
+# Plain def: the LLM call can wait on another worker's single-flight leader
+def regenerate_day_endpoint(
             day_request: dict,
+            background_tasks: BackgroundTasks,
             current_user: User = Depends(get_current_user),
             db: Session = Depends(get_db)
     ):
@@ -208,40 +346,44 @@ async def regenerate_day_endpoint(
             raise HTTPException(status_code=400, detail="Invalid day name")
 
         # Get user profile
-        profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+        profile = profile_snapshot.get_snapshot(db, current_user.id)
         if not profile:
             raise HTTPException(status_code=404, detail="User profile not found")
 
-        # Get current training plan
-        current_plan = db.query(TrainingPlan).filter(
-            TrainingPlan.user_id == current_user.id,
-            TrainingPlan.is_active == 1
-        ).order_by(TrainingPlan.created_at.desc()).first()
+        try:
+            workout_date = date.fromisoformat(date_str)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid date format. Use ISO format (YYYY-MM-DD)"
+            )
+
+        # Get the training plan for the week of this date
+        current_plan = training_plans.get_active_plan(db, current_user.id, workout_date)
 
         if not current_plan:
             raise HTTPException(status_code=404, detail="No active training plan found")
 
-        # Prepare profile data
-        profile_data = {
-            'badminton_sessions': profile.badminton_sessions or [],
-            'primary_sport': profile.primary_sport,
-            'running_goal': profile.running_goal,
-            'target_race': profile.target_race,
-            'weekly_run_volume_target': profile.weekly_run_volume_target or 180,
-            'running_experience': profile.running_experience or {},
-            'current_injuries': profile.current_injuries or []
-        }
-
         try:
             # Generate new workout for this day
             from app.services.ai_coach import generate_single_day_workout
 
-            new_workout = generate_single_day_workout(
-                user_profile=profile_data,
-                day=day,
-                date_str=date_str,
-                existing_plan=current_plan.plan_data
+            def generate_week():
+                workout = generate_single_day_workout(
+                    profile=profile,
+                    day=day,
+                    date_str=date_str,
+                    existing_plan=current_plan.plan_data
+                )
+                return dict(current_plan.plan_data, **{day: workout})
+
+            # Check the new day against the rest of the week; repairs only touch this day
+            week = plan_validator.check(
+                db, current_user.id, "single_day", generate_week(), profile.data,
+                targets=training_plans.week_targets(db, current_plan),
+                scope=[day], baseline=current_plan.plan_data, regenerate=generate_week
             )
+            new_workout = week[day]
 
             # Update the training plan
             plan_data = current_plan.plan_data
@@ -251,10 +393,17 @@ async def regenerate_day_endpoint(
             # Mark as modified
             from sqlalchemy.orm.attributes import flag_modified
             flag_modified(current_plan, "plan_data")
+            workout_stats.refresh(db, current_user.id, current_plan.week_start_date)
+            push.notify(db, current_user.id, "plan.updated",
+                        {"week_start": current_plan.week_start_date.isoformat(), "day": day})
 
             db.commit()
             db.refresh(current_plan)
 
+            today = date.today()
+            if day == valid_days[today.weekday()]:
+                recommendations.schedule_refresh(background_tasks, db, current_user, today)
+
             return {
                 "workout": new_workout,
                 "message": f"{day.capitalize()} workout regenerated successfully"
@@ -265,9 +414,11 @@ async def regenerate_day_endpoint(
                 detail=f"Failed to regenerate workout: {str(e)}"
             )
 
-@router.post("/training-plan/adjust-today")
-async def adjust_today_workout(
+@router.post("/training-plan/adjust-today", dependencies=[Depends(rate_limit("llm_light"))])
+# Plain def: the LLM call can wait on another worker's single-flight leader
+def adjust_today_workout(
             request: dict,
+            background_tasks: BackgroundTasks,
             current_user: User = Depends(get_current_user),
             db: Session = Depends(get_db)
     ):
@@ -284,10 +435,7 @@ async def adjust_today_workout(
             )
 
         # Get current training plan
-        current_plan = db.query(TrainingPlan).filter(
-            TrainingPlan.user_id == current_user.id,
-            TrainingPlan.is_active == 1
-        ).order_by(TrainingPlan.created_at.desc()).first()
+        current_plan = training_plans.get_active_plan(db, current_user.id)
 
         if not current_plan:
             raise HTTPException(status_code=404, detail="No active training plan found")
@@ -314,10 +462,15 @@ async def adjust_today_workout(
             # CRITICAL: Mark the JSON column as modified so SQLAlchemy knows to save it
             from sqlalchemy.orm.attributes import flag_modified
             flag_modified(current_plan, "plan_data")
+            workout_stats.refresh(db, current_user.id, today)
+            push.notify(db, current_user.id, "plan.updated",
+                        {"week_start": current_plan.week_start_date.isoformat(), "day": today_name})
 
             db.commit()
             db.refresh(current_plan)
 
+            recommendations.schedule_refresh(background_tasks, db, current_user, today)
+
             return {
                 "adjusted_workout": adjusted_workout,
                 "message": "Workout adjusted based on your recovery metrics"
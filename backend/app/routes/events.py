@@ -0,0 +1,124 @@
+import asyncio
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.core import push
+from app.core.database import SessionLocal
+from app.core.security import decode_access_token
+from app.models.user import User
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# WebSocket close codes
+POLICY_VIOLATION = 1008
+TRY_AGAIN_LATER = 1013
+
+
+def _lookup_user(email: str):
+    # Short-lived session: an open channel must not hold a database connection
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.email == email).scalar()
+    finally:
+        db.close()
+
+
+async def _authenticate(token: Optional[str]) -> Optional[Tuple[object, float]]:
+    """(user id, token expiry as unix time) for a valid access token"""
+    payload = decode_access_token(token) if token else None
+    if not payload or not payload.get("sub") or not payload.get("exp"):
+        return None
+    user_id = await run_in_threadpool(_lookup_user, payload["sub"])
+    return (user_id, float(payload["exp"])) if user_id is not None else None
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Push channel: {"type": "plan.updated" | "recommendation.updated" | "sync.updated" | "resync" | "ping", "data": {...}}
+
+    Browsers can't set headers on a WebSocket, so the access token comes as ?token=.
+    The socket closes when the token expires; reconnect with a fresh one.
+    """
+    identity = await _authenticate(token)
+    if identity is None:
+        await websocket.close(code=POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    user_id, expires_at = identity
+
+    try:
+        subscriber = await push.hub.subscribe(user_id)
+    except push.PushLimitError as e:
+        await websocket.close(code=TRY_AGAIN_LATER, reason=str(e))
+        return
+
+    await websocket.accept()
+
+    async def send_events():
+        async for message in push.stream(subscriber, expires_at):
+            await websocket.send_text(message)
+
+    async def wait_for_disconnect():
+        # Clients don't send anything; reading is how a closed socket is noticed between pings
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if tasks[0] in done and tasks[0].exception() is None:
+            await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        push.hub.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def events_stream(request: Request, token: Optional[str] = Query(None)):
+    """
+    Server-Sent Events fallback for the same channel
+
+    Takes the token from the Authorization header or, for EventSource, ?token=.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+
+    identity = await _authenticate(token)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_id, expires_at = identity
+
+    try:
+        subscriber = await push.hub.subscribe(user_id)
+    except push.PushLimitError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "30"})
+
+    async def events():
+        try:
+            # EventSource reconnects after `retry` ms when the stream ends
+            yield "retry: 3000\n\n"
+            async for message in push.stream(subscriber, expires_at):
+                if message is push.PING:
+                    yield ": ping\n\n"
+                else:
+                    yield f"data: {message}\n\n"
+        finally:
+            push.hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
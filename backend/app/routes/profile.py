@@ -2,10 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.core.responses import orm_response
 from app.routes.auth import get_current_user
 from app.models.user import User
 from app.models.user_profile import UserProfile
-from app.schemas.profile import UserProfileCreate, UserProfileUpdate, UserProfileResponse
+from app.schemas.profile import PerformanceResponse, UserProfileCreate, UserProfileUpdate, UserProfileResponse
+from app.services import profile_snapshot
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
@@ -52,20 +55,22 @@ def create_profile(
         morning_person=profile_data.morning_person,
         current_injuries=injuries_dict,
         sleep_average=profile_data.sleep_average,
-        other_commitments=profile_data.other_commitments
+        other_commitments=profile_data.other_commitments,
+        version=1
     )
 
     db.add(profile)
     db.commit()
     db.refresh(profile)
+    profile_snapshot.invalidate(current_user.id, profile.version)
 
-    return profile
+    return orm_response(UserProfileResponse, profile, status_code=status.HTTP_201_CREATED)
 
 
 @router.get("", response_model=UserProfileResponse)
 def get_profile(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
 ):
     profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
     if not profile:
@@ -73,7 +78,27 @@ def get_profile(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found. Please complete onboarding."
         )
-    return profile
+    return orm_response(UserProfileResponse, profile)
+
+
+@router.get("/performance", response_model=PerformanceResponse)
+def get_performance(
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
+):
+    """VDOT, training pace bands and race predictions from the profile's recent race times"""
+    snapshot = profile_snapshot.get_snapshot(db, current_user.id)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found. Please complete onboarding."
+        )
+    if snapshot.performance is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Add a recent race time (1500m to marathon) to get training paces."
+        )
+    return orm_response(PerformanceResponse, snapshot.performance)
 
 
 @router.put("", response_model=UserProfileResponse)
@@ -99,7 +124,10 @@ def update_profile(
     for key, value in update_data.items():
         setattr(profile, key, value)
 
+    # Incremented in SQL so concurrent updates each get their own version
+    profile.version = UserProfile.version + 1
+
     db.commit()
     db.refresh(profile)
 
-    return profile
\ No newline at end of file
+    return orm_response(UserProfileResponse, profile)
\ No newline at end of file
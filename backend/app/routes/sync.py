@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.core.responses import orm_response
+from app.routes.auth import get_current_user
+from app.models.user import User
+from app.schemas.sync import SyncResponse, SyncWriteBatch, SyncWriteResponse
+from app.services import sync
+from app.services.recommendations import schedule_refresh
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncResponse, response_model_exclude_none=True)
+def get_changes(
+        since: Optional[str] = None,
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Check-ins, completions, plans and profile changed since the `since` token,
+    plus ids deleted since then. Without a token (or with an expired one) the
+    response has reset=true and the recent data to start over from.
+    """
+    try:
+        changes = sync.changes(db, current_user.id, since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return orm_response(SyncResponse, changes, exclude_none=True)
+
+
+@router.post("", response_model=SyncWriteResponse, response_model_exclude_none=True)
+def push_changes(
+        batch: SyncWriteBatch,
+        background_tasks: BackgroundTasks,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Apply check-ins, completions and completion deletes queued offline. Each
+    carries the sync_version it was based on; writes to rows that changed on
+    the server since come back under `conflicts` with the server's row and
+    are not applied.
+    """
+    result = sync.apply(db, current_user.id, batch)
+    response = orm_response(SyncWriteResponse, result, exclude_none=True)
+    db.commit()
+
+    today = date.today()
+    if any(checkin.date == today for checkin in result.get("checkins", [])):
+        schedule_refresh(background_tasks, db, current_user, today)
+    return response
@@ -1,16 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.replicas import get_read_db, get_read_user
+from app.core.responses import orm_response
 from app.routes.auth import get_current_user
+from app.models.daily_checkin import DailyCheckin
 from app.models.user import User
 from app.models.workout_completion import WorkoutCompletion
-from app.schemas.workout_completion import WorkoutCompletionCreate, WorkoutCompletionResponse
-from typing import List
+from app.schemas.workout_completion import (
+    WorkoutCompletionBatch, WorkoutCompletionCreate, WorkoutCompletionResponse, WorkoutStatsResponse
+)
+from app.services import profile_snapshot, training_plans, workout_stats
+from typing import List, Optional
 
 router = APIRouter(prefix="/api/workouts", tags=["workouts"])
 
+# Sport named by the activity file -> plan workout type
+ACTIVITY_TYPES = {
+    "running": "run", "trail_running": "run", "treadmill_running": "run",
+    "badminton": "badminton", "racket": "badminton", "tennis": "badminton",
+    "training": "strength", "fitness_equipment": "strength", "strength_training": "strength",
+    "cycling": "cross-training", "biking": "cross-training", "swimming": "cross-training",
+    "rowing": "cross-training", "walking": "cross-training", "hiking": "cross-training",
+}
+DEFAULT_MAX_HR = 190
+DEFAULT_RESTING_HR = 60
+
+
+def _upsert(db: Session, user_id, completions: List[WorkoutCompletionCreate]) -> List[WorkoutCompletion]:
+    """Insert or update completions by (date, slot) in one statement (caller commits)"""
+    # Postgres can't update a row twice in one statement, so the last entry per slot wins
+    rows = {}
+    for completion in completions:
+        slot = completion.slot or completion.workout_type
+        rows[(completion.date, slot)] = {
+            "user_id": user_id,
+            "date": completion.date,
+            "slot": slot,
+            "workout_type": completion.workout_type,
+            "completed": completion.completed,
+            "notes": completion.notes
+        }
+
+    stmt = insert(WorkoutCompletion).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_workout_completions_user_date_slot',
+        set_={"workout_type": stmt.excluded.workout_type, "completed": stmt.excluded.completed,
+              "notes": stmt.excluded.notes}
+    ).returning(WorkoutCompletion)
+    saved = db.scalars(stmt, execution_options={"populate_existing": True}).all()
+    return sorted(saved, key=lambda c: (c.date, c.slot))
+
 
 @router.post("/complete", response_model=WorkoutCompletionResponse)
 def mark_workout_complete(
@@ -18,40 +62,111 @@ def mark_workout_complete(
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    # Check if already exists
-    existing = db.query(WorkoutCompletion).filter(
+    saved = _upsert(db, current_user.id, [completion])[0]
+    workout_stats.refresh(db, current_user.id, completion.date)
+    db.commit()
+    return orm_response(WorkoutCompletionResponse, saved)
+
+
+@router.post("/complete/batch", response_model=List[WorkoutCompletionResponse])
+def mark_workouts_complete(
+        batch: WorkoutCompletionBatch,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Log several completions (e.g. a week of catch-up) in one transaction"""
+    saved = _upsert(db, current_user.id, batch.completions)
+    dates = [completion.date for completion in batch.completions]
+    workout_stats.refresh(db, current_user.id, min(dates), max(dates))
+    db.commit()
+    return orm_response(List[WorkoutCompletionResponse], saved)
+
+
+def _heart_rate_limits(db: Session, user_id, observed_max: Optional[int]):
+    """(max, resting) HR: the profile's max_hr and the latest check-in's resting HR, else defaults"""
+    snapshot = profile_snapshot.get_snapshot(db, user_id)
+    max_hr = snapshot.data['running_experience'].get('max_hr') if snapshot else None
+    if not max_hr:
+        max_hr = max(DEFAULT_MAX_HR, observed_max or 0)
+
+    resting_hr = db.query(DailyCheckin.rhr).filter(
+        DailyCheckin.user_id == user_id,
+        DailyCheckin.rhr.isnot(None)
+    ).order_by(DailyCheckin.date.desc()).limit(1).scalar()
+    return float(max_hr), float(resting_hr or DEFAULT_RESTING_HR)
+
+
+def _workout_type(db: Session, user_id, sport: Optional[str], day: date) -> str:
+    workout_type = ACTIVITY_TYPES.get((sport or "").lower().replace(" ", "_"))
+    if workout_type:
+        return workout_type
+    # "generic"/"other": assume it was the day's planned session
+    plan = training_plans.get_active_plan(db, user_id, day)
+    planned = (plan.plan_data or {}).get(day.strftime('%A').lower(), {}) if plan else {}
+    planned_type = planned.get('type') if isinstance(planned, dict) else None
+    return planned_type if planned_type and planned_type != 'rest' else "workout"
+
+
+@router.post("/activity", response_model=WorkoutCompletionResponse)
+def upload_activity(
+        file: UploadFile = File(...),
+        utc_offset_minutes: int = Query(0, ge=-14 * 60, le=14 * 60),  # athlete's local time, as BiometricBatch
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Upload a FIT, GPX or TCX file (optionally gzipped) and attach its metrics
+    to that day's completion: duration, distance, HR zones, TRIMP, splits and
+    elevation. The completion for the matching workout type is created if it
+    wasn't logged yet.
+    """
+    from app.services.activity_analysis import analyze
+    from app.services.activity_files import ActivityFileError, read_activity
+
+    if file.size is not None and file.size > settings.ACTIVITY_MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Activity files are limited to {settings.ACTIVITY_MAX_UPLOAD_MB:g} MB")
+
+    try:
+        track = read_activity(file.file, file.filename or "")
+    except ActivityFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    observed = track.heart_rate[track.heart_rate > 0]
+    max_hr, resting_hr = _heart_rate_limits(db, current_user.id, int(observed.max()) if len(observed) else None)
+    summary = analyze(track, max_hr=max_hr, resting_hr=resting_hr)
+
+    start = datetime.fromisoformat(summary["start_time"]) + timedelta(minutes=utc_offset_minutes)
+    day = start.date()
+    workout_type = _workout_type(db, current_user.id, track.sport, day)
+
+    completion = db.query(WorkoutCompletion).filter(
         WorkoutCompletion.user_id == current_user.id,
-        WorkoutCompletion.date == completion.date
+        WorkoutCompletion.date == day,
+        WorkoutCompletion.slot == workout_type
     ).first()
+    if completion is None:
+        completion = WorkoutCompletion(user_id=current_user.id, date=day, slot=workout_type,
+                                       workout_type=workout_type, completed=True)
+        db.add(completion)
 
-    if existing:
-        # Update existing
-        existing.workout_type = completion.workout_type
-        existing.completed = completion.completed
-        existing.notes = completion.notes
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    # Create new
-    new_completion = WorkoutCompletion(
-        user_id=current_user.id,
-        date=completion.date,
-        workout_type=completion.workout_type,
-        completed=completion.completed,
-        notes=completion.notes
-    )
-    db.add(new_completion)
+    completion.completed = True
+    completion.duration_minutes = round(summary["moving_seconds"] / 60)
+    completion.distance_m = summary["distance_m"] or None
+    completion.avg_hr = summary["avg_hr"]
+    completion.trimp = summary["trimp"]
+    completion.activity = summary
+    db.flush()
+
+    workout_stats.refresh(db, current_user.id, day)
     db.commit()
-    db.refresh(new_completion)
-    return new_completion
+    return orm_response(WorkoutCompletionResponse, completion)
 
 
 @router.get("/week", response_model=List[WorkoutCompletionResponse])
 def get_week_completions(
         week_start: date,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_read_user),
+        db: Session = Depends(get_read_db)
 ):
     week_end = week_start + timedelta(days=6)
 
@@ -61,23 +176,43 @@ def get_week_completions(
         WorkoutCompletion.date <= week_end
     ).all()
 
-    return completions
+    return orm_response(List[WorkoutCompletionResponse], completions)
+
+
+@router.get("/stats", response_model=WorkoutStatsResponse)
+def get_workout_stats(
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Adherence, streaks and planned vs completed minutes by workout type (last 12 weeks by default)"""
+    end = end or date.today()
+    start = start or end - timedelta(weeks=12) + timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+
+    return orm_response(WorkoutStatsResponse, workout_stats.get_stats(db, current_user.id, start, end))
 
 
 @router.delete("/{completion_date}")
 def delete_completion(
         completion_date: date,
+        slot: Optional[str] = None,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    completion = db.query(WorkoutCompletion).filter(
+    """Delete one slot's completion, or every completion of the day when no slot is given"""
+    query = db.query(WorkoutCompletion).filter(
         WorkoutCompletion.user_id == current_user.id,
         WorkoutCompletion.date == completion_date
-    ).first()
+    )
+    if slot is not None:
+        query = query.filter(WorkoutCompletion.slot == slot)
 
-    if not completion:
+    if not query.delete(synchronize_session=False):
         raise HTTPException(status_code=404, detail="Completion not found")
 
-    db.delete(completion)
+    workout_stats.refresh(db, current_user.id, completion_date)
     db.commit()
     return {"message": "Completion deleted"}
\ No newline at end of file
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal
+
+from app.models.biometric_sample import SLEEP_STAGES
+
+SampleKind = Literal["heart_rate", "rr_interval", "hrv_rmssd", "sleep_stage"]
+
+MAX_SAMPLES_PER_BATCH = 50000  # a few nights of 1-minute data from every sensor
+
+
+class BiometricSeries(BaseModel):
+    """One sensor's samples as parallel arrays, the compact form wearables export"""
+    kind: SampleKind
+    ts: List[datetime]
+    # Sleep stages as numbers (awake 0, light 1, deep 2, rem 3) or names
+    value: List[float | Literal["awake", "light", "deep", "rem"]]
+
+    def rows(self):
+        for ts, value in zip(self.ts, self.value):
+            yield ts, SLEEP_STAGES[value] if isinstance(value, str) else value
+
+
+class BiometricBatch(BaseModel):
+    series: List[BiometricSeries] = Field(..., min_length=1)
+    utc_offset_minutes: int = Field(0, ge=-14 * 60, le=14 * 60)  # athlete's local time, to split nights
+
+
+class BiometricIngestResponse(BaseModel):
+    samples: int
+    nights: List[str]  # check-in dates that were rolled up
@@ -28,7 +28,9 @@ class DailyCheckinResponse(BaseModel):
     soreness_areas: Optional[List[str]]
     energy_level: Optional[int]
     notes: Optional[str]
+    wearable: Optional[dict] = None
     created_at: datetime
+    sync_version: Optional[int] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
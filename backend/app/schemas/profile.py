@@ -81,6 +81,23 @@ class UserProfileResponse(BaseModel):
     sleep_average: Optional[float]
     other_commitments: Optional[str]
     created_at: datetime
+    sync_version: Optional[int] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class PaceBand(BaseModel):
+    fast_s_per_km: int
+    slow_s_per_km: int
+
+
+class TargetRacePrediction(BaseModel):
+    distance_m: int
+    seconds: int
+
+
+class PerformanceResponse(BaseModel):
+    vdot: float
+    paces: Dict[str, PaceBand]  # easy, long_run, threshold, interval
+    predictions: Dict[str, int]  # race name -> seconds
+    target_race: Optional[TargetRacePrediction] = None
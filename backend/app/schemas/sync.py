@@ -0,0 +1,80 @@
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import List, Optional
+import uuid
+
+from app.schemas.checkin import DailyCheckinCreate, DailyCheckinResponse
+from app.schemas.profile import UserProfileResponse
+from app.schemas.workout_completion import WorkoutCompletionCreate, WorkoutCompletionResponse
+
+
+MAX_SYNC_WRITES = 200  # per list in one offline batch
+
+
+class SyncPlan(BaseModel):
+    id: uuid.UUID
+    week_start_date: date
+    plan_data: dict
+    block_id: Optional[uuid.UUID]
+    week_number: Optional[int]
+    is_active: int
+    created_at: datetime
+    sync_version: int
+
+    class Config:
+        from_attributes = True
+
+
+class SyncDeleted(BaseModel):
+    checkins: Optional[List[uuid.UUID]] = None
+    completions: Optional[List[uuid.UUID]] = None
+    plans: Optional[List[uuid.UUID]] = None
+    profile: Optional[List[uuid.UUID]] = None
+
+
+class SyncResponse(BaseModel):
+    """Changes since the client's token; empty lists and null fields are left out"""
+    token: str  # pass back as ?since= next time
+    reset: Optional[bool] = None  # true: token unknown or expired, drop local data and store these rows
+    checkins: Optional[List[DailyCheckinResponse]] = None
+    completions: Optional[List[WorkoutCompletionResponse]] = None
+    plans: Optional[List[SyncPlan]] = None
+    profile: Optional[UserProfileResponse] = None
+    deleted: Optional[SyncDeleted] = None
+
+
+class SyncCheckin(DailyCheckinCreate):
+    # sync_version the client last saw for this date; null for a check-in created offline
+    base_version: Optional[int] = None
+
+
+class SyncCompletion(WorkoutCompletionCreate):
+    base_version: Optional[int] = None  # as for check-ins, per (date, slot)
+
+
+class SyncCompletionDelete(BaseModel):
+    date: date
+    slot: str
+    base_version: int
+
+
+class SyncWriteBatch(BaseModel):
+    """Writes queued while offline, applied in one transaction"""
+    checkins: List[SyncCheckin] = Field(default_factory=list, max_length=MAX_SYNC_WRITES)
+    completions: List[SyncCompletion] = Field(default_factory=list, max_length=MAX_SYNC_WRITES)
+    completion_deletes: List[SyncCompletionDelete] = Field(default_factory=list, max_length=MAX_SYNC_WRITES)
+
+
+class SyncConflict(BaseModel):
+    entity: str  # "checkins", "completions" or "completion_deletes"
+    index: int  # position in the request list
+    # The server's row, or null when it was deleted; the write was not applied
+    checkin: Optional[DailyCheckinResponse] = None
+    completion: Optional[WorkoutCompletionResponse] = None
+
+
+class SyncWriteResponse(BaseModel):
+    checkins: Optional[List[DailyCheckinResponse]] = None
+    completions: Optional[List[WorkoutCompletionResponse]] = None
+    deleted: Optional[SyncDeleted] = None
+    conflicts: Optional[List[SyncConflict]] = None
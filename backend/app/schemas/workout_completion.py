@@ -1,23 +1,60 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional
+from typing import Dict, List, Optional
 import uuid
 
 
+MAX_BATCH_COMPLETIONS = 50
+
+
 class WorkoutCompletionCreate(BaseModel):
     date: date
     workout_type: str
+    slot: Optional[str] = None  # defaults to workout_type; one completion per (date, slot)
     completed: bool = True
     notes: Optional[str] = None
 
 
+class WorkoutCompletionBatch(BaseModel):
+    completions: List[WorkoutCompletionCreate] = Field(..., min_length=1, max_length=MAX_BATCH_COMPLETIONS)
+
+
 class WorkoutCompletionResponse(BaseModel):
     id: uuid.UUID
     user_id: uuid.UUID
     date: date
     workout_type: str
+    slot: str
     completed: bool
     notes: Optional[str]
+    duration_minutes: Optional[int] = None
+    distance_m: Optional[int] = None
+    avg_hr: Optional[int] = None
+    trimp: Optional[float] = None
+    activity: Optional[dict] = None
+    sync_version: Optional[int] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class SessionStats(BaseModel):
+    planned_sessions: int
+    completed_sessions: int
+    planned_minutes: int
+    completed_minutes: int
+    adherence: Optional[float]  # completed / planned sessions, None when nothing was planned
+
+
+class PeriodStats(SessionStats):
+    period: str  # week start date or "YYYY-MM"
+
+
+class WorkoutStatsResponse(SessionStats):
+    start: date
+    end: date
+    by_type: Dict[str, SessionStats]
+    weekly: List[PeriodStats]
+    monthly: List[PeriodStats]
+    current_streak: int  # completed planned sessions in a row, up to today
+    longest_streak: int
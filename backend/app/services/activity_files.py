@@ -0,0 +1,314 @@
+"""
+Streaming readers for FIT, GPX and TCX activity files.
+
+Each reader walks the file once and appends trackpoints to typed column
+buffers (8 bytes per value), so memory is bounded by the number of samples,
+never by the size of the XML. A 3 hour file recorded at 1 Hz is ~11k points,
+about 0.5 MB of columns. Gzipped files (.fit.gz, .gpx.gz, ...) are read through
+gzip transparently.
+"""
+import gzip
+import io
+import math
+import struct
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+COLUMNS = ("time", "lat", "lon", "altitude", "heart_rate", "distance")
+
+NAN = float("nan")
+
+# Two days at 1 Hz; also stops a gzip bomb from filling memory with points
+MAX_POINTS = 172800
+
+
+class ActivityFileError(ValueError):
+    """The upload isn't a readable FIT, GPX or TCX activity"""
+
+
+@dataclass
+class Track:
+    """Trackpoint columns as float64 arrays; NaN where the file had no value"""
+    time: np.ndarray  # unix seconds
+    lat: np.ndarray
+    lon: np.ndarray
+    altitude: np.ndarray  # m
+    heart_rate: np.ndarray  # bpm
+    distance: np.ndarray  # cumulative m, when the device recorded it
+    sport: Optional[str] = None  # "running", "cycling", ... as named by the file
+    source: str = ""
+
+    def __len__(self):
+        return len(self.time)
+
+
+class _TrackBuilder:
+    def __init__(self, source: str):
+        self.source = source
+        self.sport: Optional[str] = None
+        self.columns = {name: array("d") for name in COLUMNS}
+
+    def add(self, time, lat=NAN, lon=NAN, altitude=NAN, heart_rate=NAN, distance=NAN):
+        columns = self.columns
+        if len(columns["time"]) >= MAX_POINTS:
+            raise ActivityFileError(f"Activity has more than {MAX_POINTS} trackpoints")
+        columns["time"].append(time)
+        columns["lat"].append(lat)
+        columns["lon"].append(lon)
+        columns["altitude"].append(altitude)
+        columns["heart_rate"].append(heart_rate)
+        columns["distance"].append(distance)
+
+    def build(self) -> Track:
+        if not self.columns["time"]:
+            raise ActivityFileError("No trackpoints with a timestamp in the file")
+        arrays = {name: np.frombuffer(column, dtype=np.float64) for name, column in self.columns.items()}
+        # Devices occasionally write points out of order
+        order = np.argsort(arrays["time"], kind="stable")
+        if np.any(order != np.arange(len(order))):
+            arrays = {name: values[order] for name, values in arrays.items()}
+        return Track(**arrays, sport=self.sport, source=self.source)
+
+
+# --- FIT -------------------------------------------------------------------
+
+FIT_EPOCH = 631065600  # 1989-12-31T00:00:00Z in unix seconds
+SEMICIRCLES = 180.0 / 2 ** 31
+
+# base type number -> (struct code, size, invalid value)
+FIT_BASE_TYPES = {
+    0x00: ("B", 1, 0xFF), 0x01: ("b", 1, 0x7F), 0x02: ("B", 1, 0xFF),
+    0x83: ("h", 2, 0x7FFF), 0x84: ("H", 2, 0xFFFF), 0x85: ("i", 4, 0x7FFFFFFF),
+    0x86: ("I", 4, 0xFFFFFFFF), 0x88: ("f", 4, None), 0x89: ("d", 8, None),
+    0x0A: ("B", 1, 0x00), 0x8B: ("H", 2, 0x0000), 0x8C: ("I", 4, 0x00000000),
+    0x8E: ("q", 8, 0x7FFFFFFFFFFFFFFF), 0x8F: ("Q", 8, 0xFFFFFFFFFFFFFFFF), 0x90: ("Q", 8, 0),
+}
+
+RECORD = 20
+SESSION = 18
+SPORT = 12
+TIMESTAMP_FIELD = 253
+
+# record field number -> (name, scale, offset)
+RECORD_FIELDS = {
+    0: ("lat", SEMICIRCLES, 0), 1: ("lon", SEMICIRCLES, 0),
+    2: ("altitude", 1 / 5, -500), 78: ("altitude", 1 / 5, -500),  # enhanced_altitude wins, it's later
+    3: ("heart_rate", 1, 0), 5: ("distance", 1 / 100, 0),
+}
+
+FIT_SPORTS = {0: "generic", 1: "running", 2: "cycling", 4: "fitness_equipment", 5: "swimming",
+              10: "training", 11: "walking", 15: "rowing", 17: "hiking", 26: "tennis", 64: "racket"}
+
+
+class _FitDefinition:
+    def __init__(self, global_number: int, big_endian: bool, fields, developer_size: int):
+        self.global_number = global_number
+        fmt = ">" if big_endian else "<"
+        self.slots = []  # (field number, invalid value) per unpacked value
+        for number, size, base_type in fields:
+            code, base_size, invalid = FIT_BASE_TYPES.get(base_type, ("s", 1, None))
+            if code == "s" or size != base_size:
+                fmt += f"{size}x"  # arrays and strings aren't needed
+            else:
+                fmt += code
+                self.slots.append((number, invalid))
+        if developer_size:
+            fmt += f"{developer_size}x"
+        self.struct = struct.Struct(fmt)
+
+    def decode(self, data: bytes) -> dict:
+        values = {}
+        for (number, invalid), value in zip(self.slots, self.struct.unpack(data)):
+            if value != invalid:
+                values[number] = value
+        return values
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise ActivityFileError("FIT file is truncated")
+    return data
+
+
+def read_fit(stream: BinaryIO) -> Track:
+    header_size = _read_exact(stream, 1)[0]
+    header = _read_exact(stream, header_size - 1)
+    if header_size < 12 or header[7:11] != b".FIT":
+        raise ActivityFileError("Not a FIT file")
+    data_size = struct.unpack_from("<I", header, 3)[0]
+
+    builder = _TrackBuilder("fit")
+    definitions = {}
+    last_timestamp = None
+    read = 0
+    while read < data_size:
+        record_header = _read_exact(stream, 1)[0]
+        read += 1
+
+        if record_header & 0x80:
+            # Compressed timestamp header: 5-bit offset from the last full timestamp
+            local_type = (record_header >> 5) & 0x03
+            offset = record_header & 0x1F
+            if last_timestamp is not None:
+                last_timestamp = (last_timestamp & ~0x1F) + offset + (0x20 if offset < (last_timestamp & 0x1F) else 0)
+            is_definition = False
+        else:
+            local_type = record_header & 0x0F
+            is_definition = bool(record_header & 0x40)
+
+        if is_definition:
+            has_developer_fields = bool(record_header & 0x20)
+            fixed = _read_exact(stream, 5)
+            big_endian = fixed[1] == 1
+            global_number = struct.unpack_from(">H" if big_endian else "<H", fixed, 2)[0]
+            raw_fields = _read_exact(stream, 3 * fixed[4])
+            fields = [tuple(raw_fields[i:i + 3]) for i in range(0, len(raw_fields), 3)]
+            read += 5 + len(raw_fields)
+            developer_size = 0
+            if has_developer_fields:
+                count = _read_exact(stream, 1)[0]
+                raw = _read_exact(stream, 3 * count)
+                developer_size = sum(raw[i + 1] for i in range(0, len(raw), 3))
+                read += 1 + len(raw)
+            definitions[local_type] = _FitDefinition(global_number, big_endian, fields, developer_size)
+            continue
+
+        definition = definitions.get(local_type)
+        if definition is None:
+            raise ActivityFileError("FIT data message without a definition")
+        values = definition.decode(_read_exact(stream, definition.struct.size))
+        read += definition.struct.size
+
+        if TIMESTAMP_FIELD in values:
+            last_timestamp = values[TIMESTAMP_FIELD]
+        if definition.global_number == RECORD and last_timestamp is not None:
+            point = {}
+            for number, value in values.items():
+                field = RECORD_FIELDS.get(number)
+                if field is not None:
+                    name, scale, offset = field
+                    point[name] = value * scale + offset
+            builder.add(FIT_EPOCH + last_timestamp, **point)
+        elif builder.sport is None and definition.global_number in (SESSION, SPORT):
+            sport = values.get(5 if definition.global_number == SESSION else 0)
+            if sport is not None:
+                builder.sport = FIT_SPORTS.get(sport, "other")
+
+    return builder.build()
+
+
+# --- GPX / TCX -------------------------------------------------------------
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        return None
+
+
+def _number(value: Optional[str]) -> float:
+    try:
+        return float(value) if value is not None else NAN
+    except ValueError:
+        return NAN
+
+
+def read_gpx(stream: BinaryIO) -> Track:
+    builder = _TrackBuilder("gpx")
+    point = {}
+    for event, element in ET.iterparse(stream, events=("end",)):
+        tag = _local(element.tag)
+        if tag == "trkpt":
+            time = _timestamp(point.pop("time", None))
+            if time is not None:
+                builder.add(time, _number(element.get("lat")), _number(element.get("lon")),
+                            _number(point.get("ele")), _number(point.get("hr")))
+            point.clear()
+            element.clear()
+        elif tag in ("time", "ele", "hr"):
+            point[tag] = element.text
+        elif tag == "type" and builder.sport is None and element.text:
+            builder.sport = element.text.strip().lower()
+    return builder.build()
+
+
+def read_tcx(stream: BinaryIO) -> Track:
+    builder = _TrackBuilder("tcx")
+    point = {}
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        tag = _local(element.tag)
+        if event == "start":
+            if tag == "Activity" and builder.sport is None:
+                builder.sport = (element.get("Sport") or "other").lower()
+            elif tag == "Trackpoint":
+                point.clear()  # drop lap summary values (e.g. the average HR's <Value>)
+            continue
+        if tag == "Trackpoint":
+            time = _timestamp(point.get("Time"))
+            if time is not None:
+                builder.add(time, _number(point.get("LatitudeDegrees")), _number(point.get("LongitudeDegrees")),
+                            _number(point.get("AltitudeMeters")), _number(point.get("Value")),
+                            _number(point.get("DistanceMeters")))
+            element.clear()
+        elif tag in ("Time", "LatitudeDegrees", "LongitudeDegrees", "AltitudeMeters", "DistanceMeters", "Value"):
+            point[tag] = element.text
+    return builder.build()
+
+
+READERS = {"fit": read_fit, "gpx": read_gpx, "tcx": read_tcx}
+
+
+def detect_format(filename: str, head: bytes) -> Optional[str]:
+    if len(head) >= 12 and head[8:12] == b".FIT":
+        return "fit"
+    name = (filename or "").lower().removesuffix(".gz")
+    for extension in READERS:
+        if name.endswith("." + extension):
+            return extension
+    text = head.lstrip()[:512].lower()
+    if b"<gpx" in text:
+        return "gpx"
+    if b"<trainingcenterdatabase" in text:
+        return "tcx"
+    return None
+
+
+def read_activity(stream: BinaryIO, filename: str = "") -> Track:
+    """
+    Parse an uploaded activity file
+
+    Raises:
+        ActivityFileError: Unknown format or unreadable content
+    """
+    magic = stream.read(2)
+    stream.seek(0)
+    if magic == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+    # Sniff the format without consuming it (gzip streams can't seek back cheaply)
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+
+    file_format = detect_format(filename, stream.peek(1024)[:1024])
+    if file_format is None:
+        raise ActivityFileError("Unsupported file: upload a .fit, .gpx or .tcx activity")
+
+    try:
+        track = READERS[file_format](stream)
+    except (ET.ParseError, struct.error, EOFError, OSError) as e:
+        raise ActivityFileError(f"Could not read the {file_format.upper()} file: {e}")
+
+    if not math.isfinite(track.time[0]):
+        raise ActivityFileError("Activity has no valid timestamps")
+    return track
@@ -1,15 +1,25 @@
-from openai import OpenAI
-from app.core.config import settings
+from app.services.llm import complete
+from app.services import scheduler, tokens
+from app.services.profile_snapshot import ProfileSnapshot
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
+import contextvars
 import json
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
 
 def get_daily_recommendation(user_name: str, checkin_data: dict, planned_workout: str = None):
     """Generate AI coaching recommendation based on check-in data"""
+    try:
+        return generate_daily_recommendation(user_name, checkin_data, planned_workout)
+    except Exception as e:
+        return f"Error getting recommendation: {str(e)}"
+
+
+def generate_daily_recommendation(user_name: str, checkin_data: dict, planned_workout: str = None):
+    """Same as get_daily_recommendation, but raises on failure so callers can avoid storing errors"""
 
     planned_text = f"Planned workout: {planned_workout}" if planned_workout else "No workout planned for today."
+    notes = tokens.fit(checkin_data.get('notes'), "checkin_notes") or 'None'
 
     context = f"""You are a knowledgeable running and badminton coach. Your athlete {user_name} has completed their morning check-in.
 
@@ -19,7 +29,7 @@ Today's recovery metrics:
 - Resting HR: {checkin_data.get('rhr', 'N/A')} bpm
 - Energy level: {checkin_data.get('energy_level', 'N/A')}/5
 - Soreness level: {checkin_data.get('soreness_level', 'N/A')}/5
-- Notes: {checkin_data.get('notes', 'None')}
+- Notes: {notes}
 
 {planned_text}
 
@@ -37,29 +47,74 @@ Your recommendation should:
 
 Keep it concise, actionable, and coach-like in tone."""
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": "You are an experienced endurance coach specializing in running and badminton training. You prioritize athlete health and smart training decisions."},
-                {"role": "user", "content": context}
-            ],
-            max_tokens=250,
-            temperature=0.7
-        )
+    return complete(
+        "daily_recommendation",
+        messages=[
+            {"role": "system",
+             "content": "You are an experienced endurance coach specializing in running and badminton training. You prioritize athlete health and smart training decisions."},
+            {"role": "user", "content": context}
+        ],
+        max_tokens=tokens.max_tokens("daily_recommendation"),
+        temperature=0.7,
+        context={"user_name": user_name, "checkin_data": checkin_data, "planned_workout": planned_workout}
+    )
+
+
+# Shared by the weekly and block prompts; the schedule itself is solved locally
+INTENSITY_GUIDELINES = """WORKOUT INTENSITY GUIDELINES
+- Easy runs (Z2): HR 65–75% HRmax, conversational, RPE 2–3.
+- Tempo / Threshold: continuous (e.g., 20min at LT pace) or broken (e.g., 3×10min with jog rest). Around 10k/HM effort, HR ~80–88% HRmax, RPE 6–7.
+- Intervals (VO2 focus): work 12–24 min total, reps of 2–5min (e.g., 6–8×800m), 90–120s jog rest. Around 3–5k effort, HR ~90–95% HRmax by rep end.
+- Long runs: Z2 steady, HR 65–75% HRmax, RPE 3–4.
+- Strength: heavy = compound lifts and plyometrics; light = mobility, activation, stability. Core mixes stability (planks, bird dogs) with dynamic (twists, V-ups)."""
+
+
+def _strip_json(text: str) -> str:
+    # Remove markdown code blocks if present
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+        text = text.strip()
+    return text
+
+
+def _athlete_summary(profile: ProfileSnapshot) -> str:
+    data = profile.data
+    target_race = profile.target_race_text
+    return f"""ATHLETE:
+- Primary focus: {data['primary_sport']}
+- Goal: {profile.goal_text}
+{f"- Target race: {target_race}" if target_race else ""}
+- Experience: {profile.exp_desc}
+{f"- {profile.pace_desc}" if profile.pace_desc else ""}
+- {profile.injury_text}
 
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error getting recommendation: {str(e)}"
+CONSTRAINTS & PREFERENCES:
+{profile.constraints_text}"""
 
 
-def generate_weekly_training_plan(user_profile: dict, start_date: date = None):
+def _schedule_lines(week: dict) -> str:
+    return "\n".join(f"{day}: {scheduler.summarize(slot)}" for day, slot in week.items())
+
+
+def _dated(plan: dict, week_start: date) -> dict:
+    # Add dates to each day
+    for i, day in enumerate(scheduler.DAYS):
+        if day in plan:
+            plan[day]['date'] = (week_start + timedelta(days=i)).isoformat()
+    return plan
+
+
+def generate_weekly_training_plan(profile: ProfileSnapshot, start_date: date = None):
     """
     Generate a complete weekly training plan based on detailed user profile
 
+    Session types and durations come from the local scheduler; the LLM only
+    writes the workout descriptions.
+
     Args:
-        user_profile: Dict with badminton_sessions, running details, preferences, constraints
+        profile: Snapshot of the user's profile with pre-rendered prompt fragments
         start_date: Start date for the plan (defaults to next Monday)
 
     Returns:
@@ -71,166 +126,135 @@ def generate_weekly_training_plan(user_profile: dict, start_date: date = None):
         days_until_monday = (7 - today.weekday()) % 7
         start_date = today + timedelta(days=days_until_monday if days_until_monday > 0 else 7)
 
-    # Extract all profile data
-    badminton_sessions = user_profile.get('badminton_sessions', [])
-    primary_sport = user_profile.get('primary_sport', 'both')
-    running_goal = user_profile.get('running_goal', 'general fitness')
-    target_race = user_profile.get('target_race')
-    weekly_volume = user_profile.get('weekly_run_volume_target', 180)
-    running_exp = user_profile.get('running_experience', {})
-    preferred_run_days = user_profile.get('preferred_run_days', [])
-    avoid_run_days = user_profile.get('avoid_run_days', [])
-    injuries = user_profile.get('current_injuries', [])
-    sleep_avg = user_profile.get('sleep_average')
-    other_commitments = user_profile.get('other_commitments')
-
-    # Build badminton schedule description
-    badminton_desc = ""
-    if badminton_sessions:
-        session_list = []
-        for session in badminton_sessions:
-            day = session.get('day', 'unknown')
-            duration = session.get('duration_minutes', 0)
-            intensity = session.get('intensity', 'moderate')
-            session_type = session.get('type', 'training')
-            session_list.append(f"{day}: {duration}min {intensity} {session_type}")
-        badminton_desc = "\n".join(session_list)
-    else:
-        badminton_desc = "No badminton scheduled"
-
-    # Build running experience description
-    exp_desc = ""
-    if running_exp:
-        exp_parts = []
-        if running_exp.get('years_running'):
-            exp_parts.append(f"{running_exp['years_running']} years running")
-        if running_exp.get('current_weekly_volume'):
-            exp_parts.append(f"currently {running_exp['current_weekly_volume']}min/week")
-        if running_exp.get('longest_run'):
-            exp_parts.append(f"longest run: {running_exp['longest_run']}min")
-        if running_exp.get('recent_race_times'):
-            times = ", ".join([f"{dist}: {time}" for dist, time in running_exp['recent_race_times'].items()])
-            exp_parts.append(f"recent times: {times}")
-        exp_desc = ", ".join(exp_parts) if exp_parts else "beginner runner"
-    else:
-        exp_desc = "experience level not specified"
-
-    # Build injury description
-    injury_text = "No current injuries"
-    if injuries and len(injuries) > 0:
-        injury_list = [f"{inj.get('area', 'unknown')} ({inj.get('severity', 'unknown')})"
-                       for inj in injuries]
-        injury_text = f"Current injuries: {', '.join(injury_list)}"
-
-    # Build constraints
-    constraints = []
-    if preferred_run_days:
-        constraints.append(f"Prefers to run on: {', '.join(preferred_run_days)}")
-    if avoid_run_days:
-        constraints.append(f"Cannot run on: {', '.join(avoid_run_days)}")
-    if sleep_avg:
-        constraints.append(f"Average sleep: {sleep_avg} hours")
-    if other_commitments:
-        constraints.append(f"Other commitments: {other_commitments}")
-
-    constraints_text = "\n".join(constraints) if constraints else "No specific constraints"
-
-    context = f"""Create a weekly training plan for an athlete with the following detailed profile:
-
-BADMINTON SCHEDULE:
-{badminton_desc}
-
-RUNNING PROFILE:
-- Primary focus: {primary_sport}
-- Goal: {running_goal}
-{f"- Target race: {target_race}" if target_race else ""}
-- Weekly run volume target: {weekly_volume} minutes
-- Experience: {exp_desc}
+    week = scheduler.solve_week(profile.data)
 
-CONSTRAINTS & PREFERENCES:
-{constraints_text}
-
-RECOVERY STATUS:
-{injury_text}
-
-CRITICAL REQUIREMENTS
-1.	Account for badminton load – if user has hard/long/competition badminton sessions, adjust running so no hard runs occur right before or after. Easy jogs or full rest are allowed if recovery is sufficient.
-2.	Running volume must align with weekly_volume_min target – stay within ±5–10% of goal, respecting recent training history.
-3.	Experienced runners – must have weekly variety: at least 1 easy run, 1 threshold/tempo or cruise intervals, 1 long run. Add intervals if total volume and recovery allow.
-4.	Beginners – focus on building aerobic base: mostly Z2 easy runs, optional strides, long run progression. Minimal structured intensity until consistent.
-5.	Respect user constraints – honor preferred/avoid run days, daily time availability, and total weekly schedule.
-6.	Hard badminton protection – never schedule tempo/intervals the day before or after hard/competition badminton. On those days: only rest or optional 20–30min Z1–Z2.
-7.	Race-goal alignment – include at least one workout per week that trains the specific demand of the goal event (tempo for 5k/10k, intervals for 800/1500, long aerobic for half/marathon). Progress toward specificity as race nears.
-8.	Injury adjustments – replace high-impact runs with bike, elliptical, or aqua-jog; emphasize rehab and mobility on affected areas. Reduce volume/intensity.
-9.	Strength training (30–45min) – 2 sessions per week on easy run or rest days. Avoid strength on hard badminton or interval days.
-10.	Strength balance – one session should be lighter maintenance (mobility, activation, stability), one should be harder (compound lifts, plyometrics).
-11.	Core training (10–20min) – 3× per week on easy run or rest days. Mix stability (planks, bird dogs) with dynamic (twists, V-ups).
-12. Every 3-4 weeks, include a recovery week: reduce volume by 20-30%, keep intensity days but shorter, prioritize sleep and mobility.
-13. Progressive overload: Increase volume by max 10% per week. Add intensity before adding volume. Respect fatigue signals.
-
-
-WORKOUT INTENSITY GUIDELINES
-- Easy runs (Z2): Beginners 20–45 min, HR 65–75% HRmax (conversational). Experienced 45–90 min (can extend to 120 if well-trained).
-- Tempo / Threshold: 20–40 min total at comfortably hard effort. Continuous (e.g., 20min at LT pace) or broken (e.g., 3×10min with jog rest). Pace = around 10k/HM effort, HR ~80–88% HRmax, RPE 6–7.
-- Intervals (VO2 focus): Session length with warm-up/cooldown 45–75 min. Work 12–24 min total, reps of 2–5min (e.g., 6–8×800m). Rest 90–120s jog or equal time. Pace = around 3–5k effort, HR ~90–95% HRmax by rep end.
-- Long runs: Beginners 50–80 min. Experienced 70–120 min (150 max only for marathon prep). Effort Z2 steady, HR 65–75% HRmax, RPE 3–4.
-
-Return ONLY a valid JSON object with this exact structure:
-{{
-  "monday": {{"type": "type": "run|badminton|rest|strength|cross-training", "workout": "detailed description", "duration_minutes": number, "notes": "rationale/modifications"}},
-  "tuesday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}},
-  "wednesday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}},
-  "thursday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}},
-  "friday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}},
-  "saturday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}},
-  "sunday": {{"type": "...", "workout": "...", "duration_minutes": ..., "notes": "..."}}
-}}
+    context = f"""Write the workouts for this athlete's week. The schedule is final: keep every
+day's session type and duration, and describe how to do it (structure, effort, cues).
+
+SCHEDULE (week of {start_date.isoformat()}):
+{_schedule_lines(week)}
+
+{_athlete_summary(profile)}
+
+{INTENSITY_GUIDELINES}
+
+Return ONLY a valid JSON object with one entry per day:
+{{"monday": {{"workout": "detailed description", "notes": "one-line rationale"}}, "tuesday": {{...}}, ..., "sunday": {{...}}}}
 
 Do not include any markdown formatting, just the JSON object."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        descriptions = json.loads(_strip_json(complete(
+            "weekly_plan",
             messages=[
                 {"role": "system",
                  "content": "You are an expert coach creating personalized training plans. Always return valid JSON only."},
                 {"role": "user", "content": context}
             ],
-            max_tokens=1500,
-            temperature=0.7
-        )
+            max_tokens=tokens.max_tokens("weekly_plan"),
+            temperature=0.7,
+            context={"profile": profile.data, "start_date": start_date, "week": week}
+        ).strip()))
+
+        return _dated(scheduler.to_plan(week, descriptions), start_date)
 
-        plan_json = response.choices[0].message.content.strip()
+    except json.JSONDecodeError as e:
+        raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Error generating training plan: {str(e)}")
+
+
+# Weeks written per LLM call when filling in a block; batches run in parallel
+MESOCYCLE_BATCH_WEEKS = 4
+
+
+def _describe_week(target: dict, week: dict) -> str:
+    header = (f"WEEK {target['week_number']} (starts {target['week_start_date']}, {target['phase']}"
+              f"{', race on ' + target['race_date'] if target.get('race_date') else ''}):")
+    return f"{header}\n{_schedule_lines(week)}"
 
-        # Remove markdown code blocks if present
-        if plan_json.startswith("```"):
-            plan_json = plan_json.split("```")[1]
-            if plan_json.startswith("json"):
-                plan_json = plan_json[4:]
-            plan_json = plan_json.strip()
 
-        plan = json.loads(plan_json)
+def _generate_mesocycle_batch(profile: ProfileSnapshot, targets: list, weeks: list) -> dict:
+    week_keys = ", ".join(f'"{target["week_number"]}"' for target in targets)
+    schedule = "\n\n".join(_describe_week(target, week) for target, week in zip(targets, weeks))
 
-        # Add dates to each day
-        days_of_week = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        for i, day in enumerate(days_of_week):
-            if day in plan:
-                plan[day]['date'] = (start_date + timedelta(days=i)).isoformat()
+    context = f"""Write the workouts for these weeks of a periodized training block. The schedule is
+final: keep every day's session type and duration, and describe how to do it. Make
+deload and taper weeks feel lighter and build toward the goal across the block.
 
-        return plan
+{schedule}
+
+{_athlete_summary(profile)}
+
+{INTENSITY_GUIDELINES}
+
+Return ONLY a valid JSON object keyed by week number ({week_keys}). Each value has one entry per day:
+{{"monday": {{"workout": "detailed description", "notes": "one-line rationale"}}, ..., "sunday": {{...}}}}
+
+Do not include any markdown formatting, just the JSON object."""
+
+    return json.loads(_strip_json(complete(
+        "mesocycle",
+        messages=[
+            {"role": "system",
+             "content": "You are an expert coach creating personalized training plans. Always return valid JSON only."},
+            {"role": "user", "content": context}
+        ],
+        max_tokens=tokens.max_tokens("mesocycle", len(targets)),
+        temperature=0.7,
+        context={"profile": profile.data, "weeks": [{"week_number": t["week_number"], "days": w}
+                                                     for t, w in zip(targets, weeks)]}
+    ).strip()))
+
+
+def generate_mesocycle(profile: ProfileSnapshot, skeleton: list):
+    """
+    Fill in the day-by-day sessions for a periodized block
+
+    Args:
+        profile: Snapshot of the user's profile with pre-rendered prompt fragments
+        skeleton: Per-week targets from periodization.build_skeleton
+
+    Returns:
+        List of week plans (same shape as generate_weekly_training_plan), in skeleton order
+    """
+    weeks = [
+        scheduler.solve_week(profile.data, target, date.fromisoformat(target['week_start_date']))
+        for target in skeleton
+    ]
+    batches = [range(i, min(i + MESOCYCLE_BATCH_WEEKS, len(skeleton)))
+               for i in range(0, len(skeleton), MESOCYCLE_BATCH_WEEKS)]
+
+    try:
+        # Each thread gets a copy of the request context so token usage is still charged
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _generate_mesocycle_batch, profile,
+                            [skeleton[i] for i in batch], [weeks[i] for i in batch])
+                for batch in batches
+            ]
+            described = {}
+            for future in futures:
+                described.update(future.result())
+
+        return [
+            _dated(scheduler.to_plan(week, described.get(str(target['week_number']))),
+                   date.fromisoformat(target['week_start_date']))
+            for target, week in zip(skeleton, weeks)
+        ]
 
     except json.JSONDecodeError as e:
         raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
     except Exception as e:
-        raise Exception(f"Error generating training plan: {str(e)}")
+        raise Exception(f"Error generating training block: {str(e)}")
 
 
-def generate_single_day_workout(user_profile: dict, day: str, date_str: str, existing_plan: dict = None):
+def generate_single_day_workout(profile: ProfileSnapshot, day: str, date_str: str, existing_plan: dict = None):
     """
     Regenerate a single day's workout
 
     Args:
-        user_profile: Dict with user's training profile
+        profile: Snapshot of the user's profile with pre-rendered prompt fragments
         day: Day of week (e.g., "monday")
         date_str: ISO date string for this day
         existing_plan: The current week's plan to maintain consistency
@@ -239,12 +263,7 @@ def generate_single_day_workout(user_profile: dict, day: str, date_str: str, exi
         Dict with workout for the specified day
     """
 
-    badminton_sessions = user_profile.get('badminton_sessions', [])
-    primary_sport = user_profile.get('primary_sport', 'both')
-    running_goal = user_profile.get('running_goal', 'general fitness')
-    weekly_volume = user_profile.get('weekly_run_volume_target', 180)
-    running_exp = user_profile.get('running_experience', {})
-    injuries = user_profile.get('current_injuries', [])
+    data = profile.data
 
     # Build context about the week
     week_context = ""
@@ -257,34 +276,20 @@ def generate_single_day_workout(user_profile: dict, day: str, date_str: str, exi
                 other_days.append(f"{d.capitalize()}: {workout.get('type')} - {workout.get('workout', 'N/A')}")
         week_context = "REST OF THE WEEK:\n" + "\n".join(other_days)
 
-    # Build badminton info for this specific day
-    badminton_today = None
-    for session in badminton_sessions:
-        if session.get('day', '').lower() == day:
-            badminton_today = session
-            break
-
-    badminton_info = "No badminton today"
-    if badminton_today:
-        duration = badminton_today.get('duration_minutes', 0)
-        intensity = badminton_today.get('intensity', 'moderate')
-        session_type = badminton_today.get('type', 'training')
-        badminton_info = f"Badminton today: {duration}min {intensity} {session_type}"
-
-    # Build injury description
-    injury_text = "No current injuries"
-    if injuries and len(injuries) > 0:
-        injury_list = [f"{inj.get('area', 'unknown')} ({inj.get('severity', 'unknown')})" for inj in injuries]
-        injury_text = f"Current injuries: {', '.join(injury_list)}"
+    badminton_info = profile.badminton_by_day.get(day, "No badminton today")
 
     context = f"""Regenerate a single day's workout for {day.capitalize()}:
 
 ATHLETE PROFILE:
-- Primary focus: {primary_sport}
-- Running goal: {running_goal}
-- Weekly run volume target: {weekly_volume} minutes
-- Experience: {running_exp}
-- {injury_text}
+- Primary focus: {data['primary_sport']}
+- Running goal: {profile.goal_text}
+- Weekly run volume target: {data['weekly_run_volume_target']} minutes
+- Experience: {profile.exp_desc}
+{f"- {profile.pace_desc}" if profile.pace_desc else ""}
+- {profile.injury_text}
+
+CONSTRAINTS & PREFERENCES:
+{profile.constraints_text}
 
 TODAY'S CONTEXT ({day.upper()}):
 {badminton_info}
@@ -313,27 +318,19 @@ Return ONLY a valid JSON object with this structure:
 Do not include any markdown formatting, just the JSON object."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        workout_json = complete(
+            "single_day_workout",
             messages=[
                 {"role": "system",
                  "content": "You are an expert coach creating personalized workouts. Always return valid JSON only."},
                 {"role": "user", "content": context}
             ],
-            max_tokens=500,
-            temperature=0.8  # Higher temperature for more variety
-        )
-
-        workout_json = response.choices[0].message.content.strip()
+            max_tokens=tokens.max_tokens("single_day_workout"),
+            temperature=0.8,  # Higher temperature for more variety
+            context={"profile": data, "day": day, "date_str": date_str, "existing_plan": existing_plan}
+        ).strip()
 
-        # Remove markdown code blocks if present
-        if workout_json.startswith("```"):
-            workout_json = workout_json.split("```")[1]
-            if workout_json.startswith("json"):
-                workout_json = workout_json[4:]
-            workout_json = workout_json.strip()
-
-        workout = json.loads(workout_json)
+        workout = json.loads(_strip_json(workout_json))
 
         # Ensure date is set
         workout['date'] = date_str
@@ -392,7 +389,7 @@ TODAY'S RECOVERY METRICS:
 - HRV: {hrv if hrv else 'not provided'} ms
 - Energy level: {energy}/5
 - Soreness level: {soreness}/5
-- Additional notes: {checkin_data.get('notes', 'None')}
+- Additional notes: {tokens.fit(checkin_data.get('notes'), "checkin_notes") or 'None'}
 - Assessment: {recovery_status}
 
 {f"AI COACH RECOMMENDATION: {recommendation}" if recommendation else ""}
@@ -428,27 +425,19 @@ Return ONLY a valid JSON object with adjusted workout:
 Do not include any markdown formatting, just the JSON object."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        workout_json = complete(
+            "adjust_workout",
             messages=[
                 {"role": "system",
                  "content": "You are a smart training coach who adjusts workouts based on recovery. You err on the side of caution and prioritize athlete health. Always return valid JSON only."},
                 {"role": "user", "content": context}
             ],
-            max_tokens=500,
-            temperature=0.7
-        )
-
-        workout_json = response.choices[0].message.content.strip()
-
-        # Remove markdown code blocks if present
-        if workout_json.startswith("```"):
-            workout_json = workout_json.split("```")[1]
-            if workout_json.startswith("json"):
-                workout_json = workout_json[4:]
-            workout_json = workout_json.strip()
+            max_tokens=tokens.max_tokens("adjust_workout"),
+            temperature=0.7,
+            context={"current_workout": current_workout, "checkin_data": checkin_data, "recommendation": recommendation}
+        ).strip()
 
-        adjusted_workout = json.loads(workout_json)
+        adjusted_workout = json.loads(_strip_json(workout_json))
 
         # Ensure date is set
         adjusted_workout['date'] = current_workout.get('date', date.today().isoformat())
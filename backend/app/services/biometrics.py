@@ -0,0 +1,278 @@
+"""
+Wearable samples: bulk ingest with COPY and the nightly rollup into daily_checkins.
+
+A night belongs to the day the athlete wakes up: samples from 18:00 the
+evening before until 12:00 that day, in the athlete's local time. Each
+ingest rolls up the nights it touched, so the check-in has HRV (RMSSD),
+resting HR and sleep stages as soon as the watch syncs. The module's
+command line runs the same rollup for everyone (cron, once a day), in the
+UTC offset each athlete's last rollup used, and creates monthly partitions
+ahead of time:
+
+    python -m app.services.biometrics [--day 2026-10-19]
+"""
+import argparse
+import csv
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.tracing import span
+from app.models.biometric_sample import SLEEP_STAGES
+from app.models.daily_checkin import DailyCheckin
+
+NIGHT_START_HOUR = 18  # evening before, local time
+NIGHT_END_HOUR = 12
+MAX_UTC_OFFSET_MINUTES = 14 * 60
+
+STAGE_NAMES = {code: name for name, code in SLEEP_STAGES.items()}
+
+STAGING_SQL = text("""
+    CREATE TEMP TABLE IF NOT EXISTS biometric_staging (
+        ts timestamptz NOT NULL, value real NOT NULL, kind smallint NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# Duplicate timestamps in a batch keep the last value; re-sent samples overwrite
+MERGE_SQL = text("""
+    INSERT INTO biometric_samples (user_id, ts, value, kind)
+    SELECT DISTINCT ON (kind, ts) :user_id, ts, value, kind
+    FROM biometric_staging
+    ORDER BY kind, ts
+    ON CONFLICT (user_id, kind, ts) DO UPDATE SET value = excluded.value
+""")
+
+# One pass over the night's samples (a range scan on the primary key per kind).
+# RMSSD comes from RR intervals when the device sends them (artifacts dropped),
+# else from the device's own RMSSD readings. Resting HR is the lowest 5-minute
+# average, which ignores single-beat dips. A sleep stage lasts until the next
+# stage sample, capped so a gap in the data doesn't count as sleep.
+NIGHT_SQL = text("""
+    WITH night AS (
+        SELECT ts, value, kind FROM biometric_samples
+        WHERE user_id = :user_id AND ts >= :start AND ts < :end
+    ),
+    rr AS (
+        SELECT value - LAG(value) OVER (ORDER BY ts) AS diff
+        FROM night WHERE kind = 2 AND value BETWEEN 300 AND 2000
+    ),
+    hr AS (
+        SELECT AVG(value) OVER (ORDER BY ts RANGE BETWEEN INTERVAL '5 minutes' PRECEDING AND CURRENT ROW) AS smoothed
+        FROM night WHERE kind = 1
+    ),
+    stages AS (
+        SELECT value::int AS stage,
+               LEAST(COALESCE(LEAD(ts) OVER (ORDER BY ts), :end) - ts, INTERVAL '30 minutes') AS duration
+        FROM night WHERE kind = 4
+    ),
+    stage_minutes AS (
+        SELECT stage, ROUND(EXTRACT(EPOCH FROM SUM(duration)) / 60)::int AS minutes
+        FROM stages GROUP BY stage
+    )
+    SELECT
+        COALESCE(
+            (SELECT SQRT(AVG(diff * diff)) FROM rr WHERE ABS(diff) < 200 HAVING COUNT(*) >= 30),
+            (SELECT AVG(value) FROM night WHERE kind = 3)
+        ) AS rmssd,
+        (SELECT MIN(smoothed) FROM hr) AS min_hr,
+        (SELECT jsonb_object_agg(stage, minutes) FROM stage_minutes) AS stages,
+        (SELECT COUNT(*) FROM night) AS samples
+""")
+
+# BRIN on ts keeps this cheap even though it spans every user
+USERS_SQL = text("SELECT DISTINCT user_id FROM biometric_samples WHERE ts >= :start AND ts < :end")
+
+# The offset ingest last rolled up in, per user
+OFFSETS_SQL = text("""
+    SELECT DISTINCT ON (user_id) user_id, (wearable->>'utc_offset_minutes')::int AS utc_offset_minutes
+    FROM daily_checkins
+    WHERE user_id = ANY(:user_ids) AND wearable ? 'utc_offset_minutes'
+    ORDER BY user_id, date DESC
+""")
+
+
+def night_window(day: date, utc_offset_minutes: int = 0) -> Tuple[datetime, datetime]:
+    """UTC bounds of the night that ends on `day`"""
+    offset = timedelta(minutes=utc_offset_minutes)
+    start = datetime.combine(day - timedelta(days=1), time(NIGHT_START_HOUR), tzinfo=timezone.utc) - offset
+    end = datetime.combine(day, time(NIGHT_END_HOUR), tzinfo=timezone.utc) - offset
+    return start, end
+
+
+def nights_for(timestamps: Iterable[datetime], utc_offset_minutes: int = 0) -> Set[date]:
+    """Days whose night contains any of the timestamps"""
+    offset = timedelta(minutes=utc_offset_minutes)
+    days = set()
+    for ts in timestamps:
+        local = ts.astimezone(timezone.utc) + offset
+        if local.hour >= NIGHT_START_HOUR:
+            days.add(local.date() + timedelta(days=1))
+        elif local.hour < NIGHT_END_HOUR:
+            days.add(local.date())
+    return days
+
+
+def ingest(db: Session, user_id, samples: List[Tuple[datetime, int, float]]) -> int:
+    """
+    Bulk-load (ts, kind, value) samples with COPY and merge them in (caller commits)
+
+    Returns:
+        Number of rows inserted or updated
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for ts, kind, value in samples:
+        writer.writerow((ts.isoformat(), value, kind))
+    buffer.seek(0)
+
+    db.execute(STAGING_SQL)
+    db.execute(text("TRUNCATE biometric_staging"))
+    with span("db", "copy biometric_staging", rows=len(samples)):
+        cursor = db.connection().connection.cursor()
+        cursor.copy_expert("COPY biometric_staging (ts, value, kind) FROM STDIN WITH (FORMAT csv)", buffer)
+    return db.execute(MERGE_SQL, {"user_id": user_id}).rowcount
+
+
+def _derived(wearable: Optional[dict]) -> dict:
+    """Check-in values implied by a rollup (the columns are whole numbers)"""
+    wearable = wearable or {}
+    return {
+        "hrv": round(wearable["rmssd"]) if wearable.get("rmssd") is not None else None,
+        "rhr": round(wearable["min_hr"]) if wearable.get("min_hr") is not None else None,
+        "sleep_hours": round(wearable["sleep_minutes"] / 60) if wearable.get("sleep_minutes") else None,
+    }
+
+
+def update_checkin(checkin: DailyCheckin, values: dict):
+    """
+    Apply a posted check-in to an existing row
+
+    A field the athlete left empty keeps what the wearable rollup derived, so the
+    morning check-in doesn't wipe the watch's hrv, rhr and sleep_hours.
+    """
+    derived = _derived(checkin.wearable)
+    for field, value in values.items():
+        if value is None and derived.get(field) is not None:
+            value = derived[field]
+        setattr(checkin, field, value)
+
+
+def rollup(db: Session, user_id, day: date, utc_offset_minutes: int = 0) -> bool:
+    """
+    Summarize the night ending on `day` into that day's check-in (caller commits)
+
+    hrv, rhr and sleep_hours are only overwritten while they still hold the
+    previous rollup's values, so numbers the athlete typed in win.
+
+    Returns:
+        Whether the check-in changed
+    """
+    start, end = night_window(day, utc_offset_minutes)
+    row = db.execute(NIGHT_SQL, {"user_id": user_id, "start": start, "end": end}).mappings().first()
+    if not row or not row["samples"]:
+        return False
+
+    stages = {STAGE_NAMES.get(int(code), "unknown"): minutes for code, minutes in (row["stages"] or {}).items()}
+    wearable = {
+        "rmssd": round(row["rmssd"], 1) if row["rmssd"] is not None else None,
+        "min_hr": round(row["min_hr"], 1) if row["min_hr"] is not None else None,
+        "sleep_minutes": sum(minutes for stage, minutes in stages.items() if stage != "awake") or None,
+        "stages": stages,
+        "samples": row["samples"],
+        "utc_offset_minutes": utc_offset_minutes,
+    }
+
+    checkin = db.query(DailyCheckin).filter(
+        DailyCheckin.user_id == user_id,
+        DailyCheckin.date == day
+    ).first()
+    if checkin is None:
+        checkin = DailyCheckin(user_id=user_id, date=day)
+        db.add(checkin)
+    elif checkin.wearable == wearable:
+        return False
+
+    previous = _derived(checkin.wearable)
+    for field, value in _derived(wearable).items():
+        current = getattr(checkin, field)
+        if value is not None and (current is None or current == previous[field]):
+            setattr(checkin, field, value)
+    checkin.wearable = wearable
+    return True
+
+
+def ensure_partitions(db: Session, months_ahead: int = 2, today: Optional[date] = None):
+    """
+    Create monthly partitions for the next `months_ahead` months (caller commits)
+
+    This month is left alone: once the setting is turned on its rows are
+    already in the default partition, and Postgres won't create a partition
+    over them; such a month has to be moved by hand. A month that fails for
+    the same reason (future-dated samples) is logged and skipped.
+    """
+    month = (today or date.today()).replace(day=1)
+    for _ in range(months_ahead):
+        month = (month + timedelta(days=32)).replace(day=1)
+        following = (month + timedelta(days=32)).replace(day=1)
+        try:
+            with db.begin_nested():
+                db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS biometric_samples_{month:%Y_%m} PARTITION OF biometric_samples "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+                ))
+        except Exception as e:
+            print(f"Could not create the biometric_samples partition for {month:%Y-%m}: {e}")
+
+
+def rollup_all(db: Session, day: date) -> int:
+    """
+    Roll up the night ending on `day` for every user with samples in it
+
+    Each night is taken in the UTC offset of the user's last rollup, as ingest
+    took it. Users without one are left to ingest: a UTC night would overwrite
+    their local one.
+    """
+    # Wide enough for the night in any offset
+    start, _ = night_window(day, MAX_UTC_OFFSET_MINUTES)
+    _, end = night_window(day, -MAX_UTC_OFFSET_MINUTES)
+    user_ids = [row[0] for row in db.execute(USERS_SQL, {"start": start, "end": end})]
+    if not user_ids:
+        return 0
+    offsets = dict(db.execute(OFFSETS_SQL, {"user_ids": user_ids}).all())
+
+    changed = 0
+    for user_id, utc_offset_minutes in offsets.items():
+        if rollup(db, user_id, day, utc_offset_minutes):
+            changed += 1
+        db.commit()
+    return changed
+
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Nightly wearable rollup and partition maintenance")
+    parser.add_argument("--day", type=date.fromisoformat, default=date.today(), help="Wake-up day to roll up")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        # Partition maintenance never stops the rollup
+        if settings.BIOMETRIC_MONTHLY_PARTITIONS:
+            try:
+                ensure_partitions(db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Partition maintenance failed: {e}")
+        print(f"Rolled up {rollup_all(db, args.day)} check-ins for {args.day}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional
+import orjson
+from app.core import single_flight
+from app.core.config import settings
+from app.core.tracing import span
+from app.services import tokens, usage
+
+# Latency/cost class per coach task. "fast" routes to the cheapest quick model,
+# "quality" to the strongest one. Override per task with LLM_TASK_CLASSES.
+TASK_CLASSES = {
+    "daily_recommendation": "fast",
+    "single_day_workout": "fast",
+    "adjust_workout": "fast",
+    "weekly_plan": "quality",
+    "mesocycle": "quality",
+}
+
+# Set per request (see app.core.rate_limit) to charge LLM tokens to a user's quota
+usage_recorder: ContextVar[Optional[Callable[[int], None]]] = ContextVar("usage_recorder", default=None)
+
+
+@dataclass(frozen=True)
+class Caller:
+    user_id: str
+    endpoint: str  # "POST /api/coach/training-plan", or the background job
+
+
+# Set alongside it: usage is recorded per caller, and identical concurrent
+# completions for the same user are coalesced
+llm_caller: ContextVar[Optional[Caller]] = ContextVar("llm_caller", default=None)
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class LLMProvider:
+    """Base class for chat completion backends"""
+
+    name = "base"
+
+    def model_for(self, model_class: str) -> str:
+        raise NotImplementedError
+
+    def complete(self, task: str, messages: List[dict], model: str, max_tokens: int,
+                 temperature: float, context: Optional[dict] = None) -> Completion:
+        """
+        Run one chat completion
+
+        Args:
+            task: Coach task name (a key of TASK_CLASSES)
+            messages: OpenAI-style chat messages
+            model: Model name picked by the router
+            max_tokens: Completion token limit
+            temperature: Sampling temperature
+            context: Structured inputs behind the prompt, for backends that don't read prose
+
+        Returns:
+            Completion with the text and token usage
+        """
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI itself or any server that speaks its chat completions API"""
+
+    def __init__(self, name: str, api_key: Optional[str], base_url: Optional[str], fast_model: str, quality_model: str):
+        # openai is the heaviest import in the app, so load it with the first provider
+        from openai import OpenAI
+
+        self.name = name
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.models = {"fast": fast_model, "quality": quality_model}
+
+    def model_for(self, model_class: str) -> str:
+        return self.models[model_class]
+
+    def complete(self, task, messages, model, max_tokens, temperature, context=None):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        text = response.choices[0].message.content
+        if response.usage is None:
+            return Completion(text, tokens.count_messages(messages, model), tokens.count(text, model))
+        return Completion(text, response.usage.prompt_tokens, response.usage.completion_tokens)
+
+
+class TemplateProvider(LLMProvider):
+    """Deterministic rule-based backend: no network, same output for the same inputs"""
+
+    name = "template"
+
+    def model_for(self, model_class: str) -> str:
+        return f"template-{model_class}"
+
+    def complete(self, task, messages, model, max_tokens, temperature, context=None):
+        from app.services.template_coach import render
+
+        text = render(task, context or {})
+        # Counted as if a real model had run, so usage and quotas behave the same
+        return Completion(text, tokens.count_messages(messages), tokens.count(text))
+
+
+@lru_cache(maxsize=None)
+def get_provider(name: str) -> LLMProvider:
+    """Build each provider once, on first use"""
+    if name == "openai":
+        return OpenAIProvider(
+            "openai",
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            fast_model=settings.OPENAI_FAST_MODEL,
+            quality_model=settings.OPENAI_QUALITY_MODEL
+        )
+    if name == "local":
+        return OpenAIProvider(
+            "local",
+            api_key=settings.LOCAL_LLM_API_KEY,
+            base_url=settings.LOCAL_LLM_BASE_URL,
+            fast_model=settings.LOCAL_LLM_FAST_MODEL,
+            quality_model=settings.LOCAL_LLM_QUALITY_MODEL
+        )
+    if name == "template":
+        return TemplateProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+def route(task: str):
+    """Pick the provider and model for a task from settings"""
+    provider = get_provider(settings.LLM_TASK_PROVIDERS.get(task, settings.LLM_PROVIDER))
+    model_class = settings.LLM_TASK_CLASSES.get(task, TASK_CLASSES.get(task, "quality"))
+    return provider, provider.model_for(model_class)
+
+
+def input_hash(provider: LLMProvider, model: str, messages: List[dict], max_tokens: int, temperature: float) -> str:
+    """Everything that determines a completion; the prompt already carries the structured context"""
+    payload = orjson.dumps([provider.name, model, max_tokens, temperature, messages])
+    return hashlib.sha256(payload).hexdigest()
+
+
+def complete(task: str, messages: List[dict], max_tokens: int, temperature: float, context: Optional[dict] = None) -> str:
+    """
+    Run the task's completion and charge its tokens to the current user
+
+    A call identical to one already running for the same user (a double-tap,
+    two devices) waits for that one and shares its text; see app.core.single_flight.
+    """
+    provider, model = route(task)
+    caller = llm_caller.get()
+
+    # Prompts are assembled from optional parts; drop the blank lines they leave
+    messages = [dict(m, content=tokens.compact(m["content"])) for m in messages]
+    prompt_tokens = tokens.count_messages(messages, model)
+    if prompt_tokens > settings.LLM_PROMPT_TOKEN_WARNING:
+        print(f"LLM prompt for {task} is {prompt_tokens} tokens (warning at {settings.LLM_PROMPT_TOKEN_WARNING})")
+
+    def run() -> str:
+        with span("llm", f"llm {task}", task=task, provider=provider.name, model=model,
+                  prompt_tokens=prompt_tokens, max_tokens=max_tokens):
+            completion = provider.complete(task, messages, model, max_tokens, temperature, context)
+
+        # Only the call that ran is charged; coalesced callers used no tokens
+        record = usage_recorder.get()
+        if record is not None:
+            record(completion.total_tokens)
+        if caller is not None:
+            usage.record(caller.user_id, caller.endpoint, task, provider.name, model,
+                         completion.prompt_tokens, completion.completion_tokens)
+
+        return completion.text
+
+    user = caller.user_id if caller is not None else "-"
+    key = f"{user}:{task}:{input_hash(provider, model, messages, max_tokens, temperature)}"
+    return single_flight.run("llm", key, run)
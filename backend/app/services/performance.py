@@ -0,0 +1,226 @@
+"""
+Running performance from recent race times: VDOT, training pace bands and
+race predictions.
+
+VDOT and the paces follow Daniels & Gilbert's oxygen cost / time-to-exhaustion
+model. Race times per VDOT are precomputed once into array-backed tables
+(one column per standard distance), so a lookup is a bisect plus a linear
+interpolation instead of solving the model. Distances the model doesn't
+cover well (under 1500 m, beyond the marathon) are predicted with Riegel's
+formula from the closest race.
+
+Results are built into the profile snapshot, so they're computed once per
+profile version and the prompts carry exact paces.
+"""
+import math
+import re
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# VDOT grid for the lookup tables
+VDOT_MIN, VDOT_MAX, VDOT_STEP = 20.0, 90.0, 0.5
+
+# Distances with a precomputed race-time column, metres
+RACE_DISTANCES = {
+    "1500m": 1500, "mile": 1609.34, "3K": 3000, "5K": 5000,
+    "10K": 10000, "15K": 15000, "half marathon": 21097.5, "marathon": 42195,
+}
+MODEL_MIN_DISTANCE, MODEL_MAX_DISTANCE = 1500, 42195
+RIEGEL_EXPONENT = 1.06
+
+# Training bands as a fraction of VDOT (oxygen uptake), slow end first
+PACE_BANDS = {
+    "easy": (0.62, 0.72),
+    "long_run": (0.60, 0.68),
+    "threshold": (0.83, 0.88),
+    "interval": (0.95, 1.0),
+}
+
+DISTANCE_NAMES = {
+    "marathon": 42195, "full marathon": 42195, "half marathon": 21097.5, "half": 21097.5, "hm": 21097.5,
+    "mile": 1609.34, "1 mile": 1609.34,
+}
+DISTANCE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(km|k|m|mi|miles?)\b", re.IGNORECASE)
+
+
+def _oxygen_cost(velocity: float) -> float:
+    """ml/kg/min at `velocity` m/min"""
+    return -4.60 + 0.182258 * velocity + 0.000104 * velocity ** 2
+
+
+def _fraction_sustained(minutes: float) -> float:
+    """Fraction of VO2max that can be held for a race lasting `minutes`"""
+    return 0.8 + 0.1894393 * math.exp(-0.012778 * minutes) + 0.2989558 * math.exp(-0.1932605 * minutes)
+
+
+def _velocity(oxygen: float) -> float:
+    """m/min that costs `oxygen` ml/kg/min (inverse of _oxygen_cost)"""
+    a, b, c = 0.000104, 0.182258, -4.60 - oxygen
+    return (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+
+def vdot(distance_m: float, seconds: float) -> float:
+    minutes = seconds / 60
+    return _oxygen_cost(distance_m / minutes) / _fraction_sustained(minutes)
+
+
+def _race_seconds(distance_m: float, target: float) -> float:
+    """Race time at which `vdot` equals target (vdot falls as the time grows)"""
+    low, high = 60.0, 60.0 * 60 * 10
+    for _ in range(50):
+        middle = (low + high) / 2
+        if vdot(distance_m, middle) > target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+@lru_cache(maxsize=1)
+def _tables() -> Tuple[array, Dict[str, array]]:
+    """VDOT grid plus a race-time column (seconds) per standard distance, built on first use"""
+    count = int(round((VDOT_MAX - VDOT_MIN) / VDOT_STEP)) + 1
+    grid = array("d", (VDOT_MIN + i * VDOT_STEP for i in range(count)))
+    columns = {name: array("d", (_race_seconds(distance, value) for value in grid))
+               for name, distance in RACE_DISTANCES.items()}
+    return grid, columns
+
+
+def _interpolate(xs, ys, x: float) -> float:
+    """Linear interpolation in ascending xs, clamped to the ends"""
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    i = bisect_left(xs, x)
+    x0, x1 = xs[i - 1], xs[i]
+    return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - x0) / (x1 - x0)
+
+
+def parse_time(value) -> Optional[float]:
+    """Seconds from "23:45", "1:45:30" or "2:05.4"; None when unreadable"""
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    parts = str(value or "").strip().split(":")
+    if not 2 <= len(parts) <= 3:
+        return None
+    try:
+        numbers = [float(part) for part in parts]
+    except ValueError:
+        return None
+    seconds = 0.0
+    for number in numbers:
+        seconds = seconds * 60 + number
+    return seconds if seconds > 0 else None
+
+
+def parse_distance(value: Optional[str]) -> Optional[float]:
+    """Metres from "5K", "10 km", "800m", "half marathon", ...; None when unreadable"""
+    text = (value or "").strip().lower()
+    if not text:
+        return None
+    # A number with a unit wins over a name: "10 mile", "50K ultra marathon"
+    match = DISTANCE_PATTERN.search(text)
+    if match:
+        number, unit = float(match.group(1)), match.group(2).lower()
+        if unit in ("k", "km"):
+            return number * 1000
+        if unit.startswith("mi"):
+            return number * 1609.34
+        return number
+    for name in sorted(DISTANCE_NAMES, key=len, reverse=True):
+        if re.search(rf"\b{name}\b", text):
+            return DISTANCE_NAMES[name]
+    return None
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def _pace(fraction: float, value: float) -> float:
+    """Seconds per km at `fraction` of VDOT"""
+    return 60_000 / _velocity(fraction * value)
+
+
+def predict(distance_m: float, value: float, races: Dict[float, float]) -> Optional[float]:
+    """
+    Race time in seconds at `distance_m`
+
+    Standard distances are read from the tables, others inside the model's
+    range are solved directly; outside it, Riegel from the closest race.
+    """
+    for name, distance in RACE_DISTANCES.items():
+        if abs(distance - distance_m) < 1:
+            grid, columns = _tables()
+            return _interpolate(grid, columns[name], value)
+    if MODEL_MIN_DISTANCE <= distance_m <= MODEL_MAX_DISTANCE:
+        return _race_seconds(distance_m, value)
+    if not races:
+        return None
+    closest = min(races, key=lambda distance: abs(math.log(distance / distance_m)))
+    return races[closest] * (distance_m / closest) ** RIEGEL_EXPONENT
+
+
+def analyze(race_times: Optional[dict], target_race: Optional[str] = None) -> Optional[dict]:
+    """
+    VDOT, pace bands and predictions from {"5K": "23:45", ...}
+
+    The best race sets the VDOT (older or softer efforts just read lower).
+
+    Returns:
+        Dict with vdot, paces (s/km, fast and slow end per band) and predictions,
+        or None when no race time could be read
+    """
+    races = {}
+    for name, time in (race_times or {}).items():
+        distance, seconds = parse_distance(name), parse_time(time)
+        if distance and seconds:
+            races[distance] = min(seconds, races.get(distance, seconds))
+    modelled = {distance: seconds for distance, seconds in races.items()
+                if MODEL_MIN_DISTANCE <= distance <= MODEL_MAX_DISTANCE}
+    if not modelled:
+        return None
+
+    grid, _ = _tables()
+    best = max(vdot(distance, seconds) for distance, seconds in modelled.items())
+    best = min(max(best, grid[0]), grid[-1])
+
+    paces = {band: {"fast_s_per_km": round(_pace(high, best)), "slow_s_per_km": round(_pace(low, best))}
+             for band, (low, high) in PACE_BANDS.items()}
+    predictions = {name: round(predict(distance, best, races)) for name, distance in RACE_DISTANCES.items()}
+
+    target = None
+    target_distance = parse_distance(target_race)
+    if target_distance:
+        seconds = predict(target_distance, best, races)
+        target = {"distance_m": round(target_distance), "seconds": round(seconds)} if seconds else None
+
+    return {"vdot": round(best, 1), "paces": paces, "predictions": predictions, "target_race": target}
+
+
+def _pace_text(seconds: float) -> str:
+    return f"{format_duration(seconds)}/km"
+
+
+def describe(performance: Optional[dict]) -> str:
+    """Prompt line with the paces and predictions, or "" without race times"""
+    if not performance:
+        return ""
+    paces = ", ".join(
+        f"{band.replace('_', ' ')} {_pace_text(p['fast_s_per_km'])}-{_pace_text(p['slow_s_per_km'])}"
+        for band, p in performance["paces"].items()
+    )
+    predictions = ", ".join(
+        f"{name} {format_duration(performance['predictions'][name])}" for name in ("5K", "10K", "half marathon")
+    )
+    text = f"VDOT {performance['vdot']}. Training paces: {paces}. Predicted: {predictions}"
+    target = performance.get("target_race")
+    if target:
+        text += f"; target race ({target['distance_m']}m) {format_duration(target['seconds'])}"
+    return text
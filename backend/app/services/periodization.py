@@ -0,0 +1,134 @@
+"""
+Local periodization for multi-week training blocks.
+
+Works out the shape of a mesocycle (weekly run volume, deload weeks, race
+taper) from the profile alone, so the progression rules the weekly prompt
+only asks for are actually enforced. The LLM then just writes the sessions
+for each week's targets.
+"""
+import re
+from datetime import date, timedelta
+from typing import List, Optional
+
+MIN_WEEKS = 4
+MAX_WEEKS = 12
+
+MAX_WEEKLY_INCREASE = 0.10  # never add more than 10% over the last loaded week
+DELOAD_EVERY = 4  # 3 loaded weeks then 1 recovery week
+DELOAD_FACTOR = 0.75
+TAPER_STEP = 0.15  # each taper week drops another 15% of peak volume
+RACE_WEEK_FACTOR = 0.5
+
+TAPER_WEEKS = {"marathon": 3, "half_marathon": 2, "short": 1}
+LONG_RUN_CAP = {"marathon": 150, "half_marathon": 120, "short": 100}
+
+
+def _round5(minutes: float) -> int:
+    return int(5 * round(minutes / 5))
+
+
+def race_distance(text: Optional[str]) -> str:
+    text = (text or "").lower()
+    if "half" in text:
+        return "half_marathon"
+    if "marathon" in text:
+        return "marathon"
+    return "short"
+
+
+def parse_race_date(target_race: Optional[str], today: date) -> Optional[date]:
+    """
+    Race date from the free-text target_race ("10k on 2026-11-29", "800m in 6 weeks")
+
+    Returns:
+        The date, or None when target_race doesn't say when
+    """
+    if not target_race:
+        return None
+    text = target_race.lower()
+
+    match = re.search(r"\d{4}-\d{2}-\d{2}", text)
+    if match:
+        try:
+            return date.fromisoformat(match.group(0))
+        except ValueError:
+            return None
+
+    match = re.search(r"in (\d+)\s*(day|week|month)s?", text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        days = {"day": 1, "week": 7, "month": 30}[unit]
+        return today + timedelta(days=count * days)
+    return None
+
+
+def build_skeleton(profile: dict, start_date: date, weeks: int, today: Optional[date] = None) -> List[dict]:
+    """
+    Week-by-week targets for a training block
+
+    Args:
+        profile: Normalized profile (ProfileSnapshot.data)
+        start_date: First day of the block
+        weeks: Block length, MIN_WEEKS to MAX_WEEKS
+        today: Reference date for relative race dates (defaults to today)
+
+    Returns:
+        One dict per week with week_number, week_start_date, phase
+        (base, build, deload, taper, race or recovery), run_minutes,
+        long_run_minutes and quality_sessions
+    """
+    if not MIN_WEEKS <= weeks <= MAX_WEEKS:
+        raise ValueError(f"A block is {MIN_WEEKS} to {MAX_WEEKS} weeks long")
+
+    today = today or date.today()
+    target = profile.get('weekly_run_volume_target') or 180
+    experience = profile.get('running_experience') or {}
+    current = experience.get('current_weekly_volume') or target
+    experienced = (experience.get('years_running') or 0) >= 1 or current >= 120
+
+    distance = race_distance(profile.get('target_race') or profile.get('running_goal'))
+    race_date = parse_race_date(profile.get('target_race'), today)
+    race_week = None
+    if race_date is not None and race_date >= start_date:
+        index = (race_date - start_date).days // 7
+        if index < weeks:
+            race_week = index
+    # Leave at least two thirds of the block for loading
+    taper_weeks = min(TAPER_WEEKS[distance], weeks // 3) if race_week is not None else 0
+    loading_weeks = race_week - taper_weeks if race_week is not None else weeks
+
+    level = int(min(current, target))
+    peak = level
+    skeleton = []
+    for i in range(weeks):
+        if race_week is not None and i > race_week:
+            phase, volume, quality = "recovery", peak * RACE_WEEK_FACTOR, 0
+        elif race_week is not None and i == race_week:
+            phase, volume, quality = "race", peak * RACE_WEEK_FACTOR, 0
+        elif i >= loading_weeks:
+            step = i - loading_weeks + 1
+            phase, volume, quality = "taper", peak * (1 - TAPER_STEP * step), 1
+        elif (i + 1) % DELOAD_EVERY == 0:
+            phase, volume, quality = "deload", level * DELOAD_FACTOR, 1
+        else:
+            if skeleton:
+                # Rounded down so the cap holds on whole minutes
+                level = min(target, int(level * (1 + MAX_WEEKLY_INCREASE)))
+            peak = max(peak, level)
+            phase = "base" if i < max(1, loading_weeks // 3) else "build"
+            volume = level
+            quality = 2 if phase == "build" and experienced else 1
+
+        run_minutes = volume if phase in ("base", "build") else _round5(volume)
+        skeleton.append({
+            "week_number": i + 1,
+            "week_start_date": (start_date + timedelta(weeks=i)).isoformat(),
+            "phase": phase,
+            "run_minutes": run_minutes,
+            "long_run_minutes": min(_round5(run_minutes * 0.35), LONG_RUN_CAP[distance]),
+            "quality_sessions": quality if run_minutes else 0
+        })
+
+    if race_week is not None:
+        skeleton[race_week]["race_date"] = race_date.isoformat()
+    return skeleton
@@ -0,0 +1,273 @@
+"""
+Checks generated plans against the profile and repairs them locally.
+
+Violations are fixed by swapping days, converting or downgrading a session,
+or scaling easy/long run durations, so a bad plan rarely needs another LLM
+call. Every check is recorded in plan_validations.
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.plan_validation import PlanValidation
+from app.services.scheduler import (
+    DAYS, EASY_MIN, QUALITY, badminton_by_day, default_targets, injury_adjusted, injury_level, protected_days,
+    summarize
+)
+
+VOLUME_TOLERANCE = 0.10
+MAX_SCALE = 1.5  # repairs never stretch or shrink a run by more than this factor
+MAX_REPAIR_STEPS = 10
+
+# Hard violations must be fixed; soft ones only lower the score
+HARD = ("avoid_day", "near_hard_badminton", "back_to_back", "volume")
+SOFT = ("strength_count", "core_count")
+
+# LLM-written days don't carry a session label, so fall back to the description
+HARD_WORDS = re.compile(r"tempo|threshold|interval|vo2|fartlek|hill repeat|race pace|\d+\s*[x×]\s*\d+", re.IGNORECASE)
+LONG_WORDS = re.compile(r"long run", re.IGNORECASE)
+
+
+@dataclass
+class Violation:
+    code: str
+    day: Optional[str] = None
+    detail: str = ""
+
+    @property
+    def hard(self) -> bool:
+        return self.code in HARD
+
+
+def _is_run(day_plan: dict) -> bool:
+    return day_plan.get('type') == 'run'
+
+
+def _is_quality(day_plan: dict) -> bool:
+    if day_plan.get('session'):
+        return day_plan['session'] in QUALITY + ("race",)
+    return _is_run(day_plan) and bool(HARD_WORDS.search(day_plan.get('workout') or ''))
+
+
+def _is_key(day_plan: dict) -> bool:
+    """Quality or long run: what must stay away from hard badminton and from each other"""
+    if day_plan.get('session'):
+        return day_plan['session'] in QUALITY + ("race", "long")
+    return _is_quality(day_plan) or (_is_run(day_plan) and bool(LONG_WORDS.search(day_plan.get('workout') or '')))
+
+
+def _mentions(day_plan: dict, kind: str) -> bool:
+    if day_plan.get('type') == kind or any(e.get('type') == kind for e in day_plan.get('extras') or []):
+        return True
+    return kind in (day_plan.get('workout') or '').lower()
+
+
+def _has_badminton(day_plan: dict) -> bool:
+    return day_plan.get('type') == 'badminton' or any(e.get('type') == 'badminton' for e in day_plan.get('extras') or [])
+
+
+def _is_volume(day_plan: dict, injured: bool) -> bool:
+    # With a major injury the scheduler turns every run into cross-training of the same length
+    return _is_run(day_plan) or (injured and day_plan.get('type') == 'cross-training')
+
+
+def run_minutes(plan: dict, injured: bool = False) -> int:
+    """Minutes toward the run volume target (cross-training too when `injured`)"""
+    return sum(plan[d].get('duration_minutes') or 0 for d in DAYS if d in plan and _is_volume(plan[d], injured))
+
+
+def _volume_target(profile: dict, targets: Optional[dict]) -> tuple:
+    """(run minutes the scheduler aims for, whether cross-training counts toward them)"""
+    injury = injury_level(profile)
+    return injury_adjusted(targets or default_targets(profile), injury)['run_minutes'], injury == "major"
+
+
+def validate(plan: dict, profile: dict, targets: Optional[dict] = None) -> List[Violation]:
+    """
+    Check a week plan against the profile's constraints
+
+    Args:
+        plan: Day -> workout dict, as stored in training_plans.plan_data
+        profile: Normalized profile (ProfileSnapshot.data)
+        targets: Week targets (block weeks); run volume defaults to the profile's target,
+            cut like the scheduler cuts it for a major injury
+    """
+    avoid = {d.lower() for d in profile.get('avoid_run_days') or []}
+    protected = protected_days(badminton_by_day(profile))
+    violations = []
+
+    for day in DAYS:
+        day_plan = plan.get(day) or {}
+        if day in avoid and _is_run(day_plan):
+            violations.append(Violation("avoid_day", day, "run on a day the athlete can't run"))
+        if day in protected and _is_key(day_plan):
+            violations.append(Violation("near_hard_badminton", day, "key session on or next to hard badminton"))
+
+    for a, b in zip(DAYS, DAYS[1:]):
+        if _is_key(plan.get(a) or {}) and _is_key(plan.get(b) or {}):
+            violations.append(Violation("back_to_back", b, f"key sessions on {a} and {b}"))
+
+    target, injured = _volume_target(profile, targets)
+    total = run_minutes(plan, injured)
+    if target and abs(total - target) > target * VOLUME_TOLERANCE:
+        kind = "running and cross-training" if injured else "running"
+        violations.append(Violation("volume", None, f"{total}min {kind} vs {target}min target"))
+
+    if sum(_mentions(plan.get(d) or {}, "strength") for d in DAYS) < 2:
+        violations.append(Violation("strength_count", None, "fewer than 2 strength sessions"))
+    if sum(_mentions(plan.get(d) or {}, "core") for d in DAYS) < 3:
+        violations.append(Violation("core_count", None, "fewer than 3 core sessions"))
+
+    return violations
+
+
+def score(violations: List[Violation]) -> int:
+    """100 for a clean plan; hard violations cost 25, soft ones 5"""
+    return max(0, 100 - sum(25 if v.hard else 5 for v in violations))
+
+
+def _hard_count(plan: dict, profile: dict, targets: Optional[dict]) -> int:
+    return sum(1 for v in validate(plan, profile, targets) if v.hard)
+
+
+def _swapped(plan: dict, a: str, b: str) -> dict:
+    """Move the workouts of two days, keeping each day's date"""
+    fixed = dict(plan)
+    fixed[a], fixed[b] = dict(plan[b]), dict(plan[a])
+    for day in (a, b):
+        if 'date' in plan[day]:
+            fixed[day]['date'] = plan[day]['date']
+    return fixed
+
+
+def _replaced(plan: dict, day: str, session: str, note: str) -> dict:
+    """Turn the day into an easy run or low-impact cross-training of the same length"""
+    minutes = plan[day].get('duration_minutes') or 0
+    slot = {"type": "cross-training" if session == "cross" else "run", "session": session,
+            "duration_minutes": minutes, "intensity": "easy", "extras": plan[day].get('extras') or []}
+    fixed = dict(plan)
+    fixed[day] = dict(plan[day], type=slot['type'], session=session, intensity="easy",
+                      workout=summarize(slot), notes=note)
+    return fixed
+
+
+def _scaled(plan: dict, profile: dict, targets: Optional[dict], scope: List[str]) -> Optional[dict]:
+    """Scale easy and long runs in `scope` so the week hits its run volume target"""
+    target, injured = _volume_target(profile, targets)
+    adjustable = [d for d in scope if _is_volume(plan[d], injured) and not _is_quality(plan[d])]
+    current = sum(plan[d].get('duration_minutes') or 0 for d in adjustable)
+    if not adjustable or not current:
+        return None
+
+    fixed_minutes = run_minutes(plan, injured) - current
+    factor = min(MAX_SCALE, max(1 / MAX_SCALE, max(target - fixed_minutes, 0) / current))
+    fixed = dict(plan)
+    for day in adjustable:
+        old = plan[day].get('duration_minutes') or 0
+        new = max(EASY_MIN, int(5 * round(old * factor / 5)))
+        workout = re.sub(rf"\b{old}\s*min", f"{new}min", plan[day].get('workout') or '', count=1)
+        fixed[day] = dict(plan[day], duration_minutes=new, workout=workout)
+    return fixed
+
+
+def _candidates(plan: dict, violation: Violation, scope: List[str], profile: dict, targets: Optional[dict]):
+    """Possible fixes for one violation, least invasive first"""
+    day = violation.day
+    if violation.code == "volume":
+        scaled = _scaled(plan, profile, targets, scope)
+        if scaled:
+            yield scaled
+        return
+    if day not in scope:
+        return
+
+    # Swap with a day in scope that takes the session without breaking anything;
+    # the badminton schedule itself never moves
+    if not _has_badminton(plan[day]):
+        for other in scope:
+            if other != day and not _has_badminton(plan[other]):
+                yield _swapped(plan, day, other)
+
+    if violation.code == "avoid_day":
+        yield _replaced(plan, day, "cross", "Changed to low-impact cross-training: no running on this day.")
+    else:
+        yield _replaced(plan, day, "easy", "Downgraded to an easy run to protect recovery.")
+
+
+def repair(plan: dict, profile: dict, targets: Optional[dict] = None, scope: Optional[List[str]] = None) -> dict:
+    """
+    Fix hard violations locally
+
+    Args:
+        scope: Days the repair may change (defaults to the whole week)
+
+    Returns:
+        The repaired plan; check it with validate() to see what's left
+    """
+    scope = [d for d in (scope or DAYS) if d in plan]
+    for _ in range(MAX_REPAIR_STEPS):
+        violations = [v for v in validate(plan, profile, targets) if v.hard]
+        if not violations:
+            break
+        current = len(violations)
+        for violation in violations:
+            fixed = next((c for c in _candidates(plan, violation, scope, profile, targets)
+                          if _hard_count(c, profile, targets) < current), None)
+            if fixed is not None:
+                plan = fixed
+                break
+        else:
+            break
+    return plan
+
+
+def check(db: Session, user_id, source: str, plan: dict, profile: dict, targets: Optional[dict] = None,
+          scope: Optional[List[str]] = None, baseline: Optional[dict] = None,
+          regenerate: Optional[Callable[[], dict]] = None) -> dict:
+    """
+    Validate, repair if needed, and only regenerate when the repair fails
+
+    Adds a plan_validations row to `db`; the caller commits it with the plan.
+
+    Args:
+        source: What produced the plan ("weekly_plan", "single_day", "mesocycle")
+        scope: Days the repair may change (defaults to the whole week)
+        baseline: Plan before this change; its violations don't count as a failed repair
+        regenerate: Produces a fresh plan (another LLM call) as a last resort
+
+    Returns:
+        The plan to store
+    """
+    tolerated = {(v.code, v.day) for v in validate(baseline, profile, targets)} if baseline else set()
+
+    def failed(candidate: dict) -> bool:
+        return any(v.hard and (v.code, v.day) not in tolerated for v in validate(candidate, profile, targets))
+
+    before = validate(plan, profile, targets)
+    result = plan
+    regenerated = False
+
+    if failed(plan):
+        result = repair(plan, profile, targets, scope)
+        if regenerate is not None and failed(result):
+            try:
+                fresh = regenerate()
+                regenerated = True
+                result = repair(fresh, profile, targets, scope)
+            except Exception as e:
+                print(f"Could not regenerate plan after failed repair: {e}")
+
+    after = validate(result, profile, targets)
+    db.add(PlanValidation(
+        user_id=user_id,
+        source=source,
+        score_before=score(before),
+        score_after=score(after),
+        violations=[v.code for v in before],
+        remaining=[v.code for v in after],
+        repaired=result is not plan and not regenerated,
+        regenerated=regenerated
+    ))
+    return result
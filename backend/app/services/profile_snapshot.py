@@ -0,0 +1,161 @@
+"""
+Normalized training profile plus the prompt text derived from it.
+
+Built once per profile version (bumped by create_profile / update_profile) and
+shared by every coach path, so the plan and single-day prompts see the same
+fields and the descriptions aren't re-rendered on each LLM call. Snapshots are
+kept in the shared cache (app.core.cache) under the user and version, so
+every worker uses the same copy and an update is picked up by all of them.
+"""
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.models.user_profile import UserProfile
+from app.services import performance, tokens
+
+CACHE_NAMESPACE = "profile_snapshot"
+CACHE_TTL = 24 * 3600  # entries are per version, so this only bounds unused ones
+SNAPSHOT_FORMAT = 1  # part of the key; bump when ProfileSnapshot's fields change
+
+
+@dataclass(frozen=True)
+class ProfileSnapshot:
+    """Read-only view of a profile version. Don't mutate `data`, it's shared."""
+    user_id: object
+    version: int
+    data: dict
+    badminton_by_day: dict
+    exp_desc: str
+    goal_text: str  # running_goal and target_race held to their prompt budgets
+    target_race_text: Optional[str]
+    injury_text: str
+    constraints_text: str
+    performance: Optional[dict]  # VDOT, pace bands and race predictions (app.services.performance)
+    pace_desc: str  # "" without race times
+
+
+def normalize(profile: UserProfile) -> dict:
+    """Profile fields with the defaults the coach prompts assume"""
+    return {
+        'badminton_sessions': profile.badminton_sessions or [],
+        'primary_sport': profile.primary_sport or 'both',
+        'running_goal': profile.running_goal or 'general fitness',
+        'target_race': profile.target_race,
+        'weekly_run_volume_target': profile.weekly_run_volume_target or 180,
+        'running_experience': profile.running_experience or {},
+        'preferred_run_days': profile.preferred_run_days or [],
+        'avoid_run_days': profile.avoid_run_days or [],
+        'morning_person': profile.morning_person,
+        'current_injuries': profile.current_injuries or [],
+        'sleep_average': profile.sleep_average,
+        'other_commitments': profile.other_commitments
+    }
+
+
+def _session_desc(session: dict) -> str:
+    duration = session.get('duration_minutes', 0)
+    intensity = session.get('intensity', 'moderate')
+    session_type = session.get('type', 'training')
+    return f"{duration}min {intensity} {session_type}"
+
+
+def build(profile: UserProfile) -> ProfileSnapshot:
+    data = normalize(profile)
+
+    # First session per day, as the single-day prompt only mentions one
+    badminton_by_day = {}
+    for session in data['badminton_sessions']:
+        badminton_by_day.setdefault(session.get('day', '').lower(), f"Badminton today: {_session_desc(session)}")
+
+    # Running experience description
+    running_exp = data['running_experience']
+    if running_exp:
+        exp_parts = []
+        if running_exp.get('years_running'):
+            exp_parts.append(f"{running_exp['years_running']} years running")
+        if running_exp.get('current_weekly_volume'):
+            exp_parts.append(f"currently {running_exp['current_weekly_volume']}min/week")
+        if running_exp.get('longest_run'):
+            exp_parts.append(f"longest run: {running_exp['longest_run']}min")
+        if running_exp.get('recent_race_times'):
+            times = ", ".join([f"{dist}: {time}" for dist, time in running_exp['recent_race_times'].items()])
+            exp_parts.append(f"recent times: {times}")
+        exp_desc = ", ".join(exp_parts) if exp_parts else "beginner runner"
+    else:
+        exp_desc = "experience level not specified"
+
+    # Injury description; free text, so each one is held to its token budget
+    injury_text = "No current injuries"
+    if data['current_injuries']:
+        injuries = data['current_injuries']
+        injury_list = [
+            tokens.fit(f"{inj.get('area', 'unknown')} ({inj.get('severity', 'unknown')})"
+                       f"{': ' + inj['notes'] if inj.get('notes') else ''}", "injury")
+            for inj in injuries[:tokens.MAX_INJURIES]
+        ]
+        if len(injuries) > tokens.MAX_INJURIES:
+            injury_list.append(f"{len(injuries) - tokens.MAX_INJURIES} more")
+        injury_text = f"Current injuries: {', '.join(injury_list)}"
+
+    # Constraints
+    constraints = []
+    if data['preferred_run_days']:
+        constraints.append(f"Prefers to run on: {', '.join(data['preferred_run_days'])}")
+    if data['avoid_run_days']:
+        constraints.append(f"Cannot run on: {', '.join(data['avoid_run_days'])}")
+    if data['sleep_average']:
+        constraints.append(f"Average sleep: {data['sleep_average']} hours")
+    if data['other_commitments']:
+        constraints.append(f"Other commitments: {tokens.fit(data['other_commitments'], 'other_commitments')}")
+    constraints_text = "\n".join(constraints) if constraints else "No specific constraints"
+
+    # Paces from race times, so the prompts don't leave the model to estimate them
+    running_performance = performance.analyze(running_exp.get('recent_race_times'), data['target_race'])
+
+    return ProfileSnapshot(
+        user_id=profile.user_id,
+        version=profile.version,
+        data=data,
+        badminton_by_day=badminton_by_day,
+        exp_desc=exp_desc,
+        goal_text=tokens.fit(data['running_goal'], "running_goal"),
+        target_race_text=tokens.fit(data['target_race'], "target_race"),
+        injury_text=injury_text,
+        constraints_text=constraints_text,
+        performance=running_performance,
+        pace_desc=performance.describe(running_performance)
+    )
+
+
+def get_snapshot(db: Session, user_id) -> Optional[ProfileSnapshot]:
+    """
+    Current snapshot of the user's profile
+
+    Only the version number is read on a hit. The version is the cache
+    key's generation: an update bumps it, so other workers never serve the
+    old snapshot.
+
+    Returns:
+        ProfileSnapshot, or None if the user has no profile
+    """
+    version = db.query(UserProfile.version).filter(UserProfile.user_id == user_id).scalar()
+    if version is None:
+        return None
+
+    def load() -> Optional[dict]:
+        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        return asdict(build(profile)) if profile is not None else None
+
+    fields = cache.get_or_load(CACHE_NAMESPACE, f"{SNAPSHOT_FORMAT}:{user_id}:{version}", load, ttl=CACHE_TTL)
+    if fields is None:
+        return None
+    # Cached values come back as plain JSON: the id is a string there
+    return ProfileSnapshot(**dict(fields, user_id=user_id))
+
+
+def invalidate(user_id, version: int):
+    """Drop the cached snapshot for a version that was written again (a recreated profile starts over at 1)"""
+    cache.delete(CACHE_NAMESPACE, f"{SNAPSHOT_FORMAT}:{user_id}:{version}")
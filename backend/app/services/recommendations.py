@@ -0,0 +1,140 @@
+import hashlib
+import json
+from datetime import date
+from typing import Optional, Tuple
+
+from fastapi import BackgroundTasks
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.core import push
+from app.core.database import SessionLocal
+from app.models.daily_checkin import DailyCheckin
+from app.models.daily_recommendation import DailyRecommendation
+from app.services.training_plans import get_active_plan
+
+DAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def recommendation_inputs(db: Session, user_id, day: date) -> Optional[Tuple[dict, Optional[str]]]:
+    """
+    Load what the daily recommendation is generated from
+
+    Returns:
+        (checkin_data, planned_workout) or None when there is no check-in for `day`
+    """
+    checkin = db.query(DailyCheckin).filter(
+        DailyCheckin.user_id == user_id,
+        DailyCheckin.date == day
+    ).first()
+
+    if not checkin:
+        return None
+
+    checkin_data = {
+        'sleep_hours': checkin.sleep_hours,
+        'sleep_quality': checkin.sleep_quality,
+        'hrv': checkin.hrv,
+        'rhr': checkin.rhr,
+        'energy_level': checkin.energy_level,
+        'soreness_level': checkin.soreness_level,
+        'notes': checkin.notes
+    }
+
+    # Get the day's planned workout from the training plan
+    planned_workout = None
+    try:
+        plan = get_active_plan(db, user_id, day)
+
+        if plan:
+            day_workout = plan.plan_data.get(DAY_NAMES[day.weekday()])
+
+            if day_workout:
+                planned_workout = f"{day_workout.get('type', 'workout').upper()}: {day_workout.get('workout', 'N/A')} ({day_workout.get('duration_minutes', 0)}min)"
+    except Exception as e:
+        print(f"Could not fetch planned workout: {e}")
+        planned_workout = None
+
+    return checkin_data, planned_workout
+
+
+def inputs_hash(checkin_data: dict, planned_workout: Optional[str]) -> str:
+    payload = json.dumps({"checkin": checkin_data, "planned": planned_workout}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_stored(db: Session, user_id, day: date) -> Optional[DailyRecommendation]:
+    return db.query(DailyRecommendation).filter(
+        DailyRecommendation.user_id == user_id,
+        DailyRecommendation.date == day
+    ).first()
+
+
+def store(db: Session, user_id, day: date, input_hash: str, text: str):
+    """Upsert the recommendation for (user_id, day)"""
+    stmt = insert(DailyRecommendation).values(
+        user_id=user_id, date=day, input_hash=input_hash, recommendation=text
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_daily_recommendations_user_date',
+        set_={"input_hash": stmt.excluded.input_hash, "recommendation": stmt.excluded.recommendation,
+              "updated_at": func.now()}
+    )
+    db.execute(stmt)
+    push.notify(db, user_id, "recommendation.updated", {"date": day.isoformat()})
+    db.commit()
+
+
+def schedule_refresh(background_tasks: BackgroundTasks, db: Session, user, day: date):
+    """
+    Queue a recompute of the day's recommendation if its inputs changed.
+
+    Called after writes that can change the check-in or the day's planned
+    workout. The background call counts against the user's daily quota and
+    llm_light bucket like a read would; over either, nothing is queued and the
+    next read generates it. The stale row stays until store() replaces it; reads
+    only serve a row whose input_hash matches, and one that arrives while the
+    precompute runs shares its LLM call (app.core.single_flight).
+    """
+    from app.core.rate_limit import allow
+
+    inputs = recommendation_inputs(db, user.id, day)
+    if inputs is None:
+        return
+
+    checkin_data, planned_workout = inputs
+    new_hash = inputs_hash(checkin_data, planned_workout)
+
+    stored = get_stored(db, user.id, day)
+    if stored is not None and stored.input_hash == new_hash:
+        return
+    if not allow(user.id, "llm_light"):
+        print(f"Skipped recommendation precompute for {user.id}: over the rate limit or daily quota")
+        return
+
+    background_tasks.add_task(precompute, user.id, user.name, day, checkin_data, planned_workout, new_hash)
+
+
+def precompute(user_id, user_name: str, day: date, checkin_data: dict, planned_workout: Optional[str], input_hash: str):
+    """Background task: generate and store the recommendation outside the request path"""
+    from app.core.rate_limit import track_usage
+    from app.services.ai_coach import generate_daily_recommendation
+
+    track_usage(user_id, "background recommendations.precompute")
+
+    db = SessionLocal()
+    try:
+        text = generate_daily_recommendation(user_name, checkin_data, planned_workout)
+
+        # A later write may have changed the inputs while we were generating;
+        # its own refresh will store the up-to-date version
+        current = recommendation_inputs(db, user_id, day)
+        if current is None or inputs_hash(*current) != input_hash:
+            return
+
+        store(db, user_id, day, input_hash, text)
+    except Exception as e:
+        print(f"Could not precompute recommendation: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,47 @@
+"""
+Refresh token housekeeping.
+
+Rotation leaves a revoked row behind on every refresh. Revoked rows are kept
+for REFRESH_TOKEN_REVOKED_RETENTION_DAYS so a replayed token still ends its
+session; after that, and once a token has expired, the row goes. Prune daily:
+
+    python -m app.services.refresh_tokens --prune
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.refresh_token import RefreshToken
+
+
+def prune(db: Session) -> int:
+    """Delete expired tokens and tokens revoked past the retention window (caller commits)"""
+    now = datetime.now(timezone.utc)
+    return db.query(RefreshToken).filter(
+        (RefreshToken.expires_at <= now)
+        | (RefreshToken.revoked_at < now - timedelta(days=settings.REFRESH_TOKEN_REVOKED_RETENTION_DAYS))
+    ).delete(synchronize_session=False)
+
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Refresh token maintenance")
+    parser.add_argument("--prune", action="store_true", help="Delete expired and long-revoked refresh tokens")
+    args = parser.parse_args()
+
+    if not args.prune:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        print(f"Pruned {prune(db)} refresh tokens")
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
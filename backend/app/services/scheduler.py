@@ -0,0 +1,369 @@
+"""
+Deterministic weekly scheduler.
+
+Places session types and durations across the week from the profile (and,
+inside a training block, the week's periodization targets) under the rules
+the coach prompts used to ask the LLM to follow: no quality running next to
+hard badminton, avoid/preferred run days, 2 strength and 3 core sessions,
+run volume on target. The search is exhaustive over at most a few thousand
+candidates, so a week solves in a couple of milliseconds. The LLM only
+writes the descriptions for the result.
+"""
+from datetime import date
+from itertools import combinations
+from typing import Dict, List, Optional
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+QUALITY = ("tempo", "intervals")
+KEY_SESSIONS = QUALITY + ("long",)
+
+EASY_MIN = 20
+CORE_MINUTES = 15
+STRENGTH_SESSIONS = (
+    ("heavy", "compound lifts and plyometrics", 40),
+    ("light", "mobility, activation and stability", 30),
+)
+
+
+def _round5(minutes: float) -> int:
+    return int(5 * round(minutes / 5))
+
+
+def is_experienced(profile: dict) -> bool:
+    experience = profile.get('running_experience') or {}
+    return (experience.get('years_running') or 0) >= 1 or (experience.get('current_weekly_volume') or 0) >= 120
+
+
+def is_hard_badminton(session: dict) -> bool:
+    return session.get('intensity') in ('hard', 'competition') or session.get('type') == 'competition'
+
+
+def badminton_by_day(profile: dict) -> Dict[str, dict]:
+    """First badminton session per day"""
+    badminton = {}
+    for session in profile.get('badminton_sessions') or []:
+        badminton.setdefault((session.get('day') or '').lower(), session)
+    return badminton
+
+
+def protected_days(badminton: Dict[str, dict]) -> set:
+    """Hard/competition badminton days and the days either side of them"""
+    hard_days = [d for d, s in badminton.items() if d in DAYS and is_hard_badminton(s)]
+    return {DAYS[j] for d in hard_days for j in (DAYS.index(d) - 1, DAYS.index(d), DAYS.index(d) + 1) if 0 <= j < 7}
+
+
+def injury_level(profile: dict) -> str:
+    """"none", "minor" or "major" (anything worse than minor)"""
+    injuries = profile.get('current_injuries') or []
+    if not injuries:
+        return "none"
+    if all((inj.get('severity') or '').lower() == 'minor' for inj in injuries):
+        return "minor"
+    return "major"
+
+
+def default_targets(profile: dict) -> dict:
+    """Week targets when the plan isn't part of a periodized block"""
+    volume = profile.get('weekly_run_volume_target') or 180
+    experienced = is_experienced(profile)
+    return {
+        "run_minutes": volume,
+        "long_run_minutes": min(_round5(volume * 0.35), 120 if experienced else 80),
+        # Beginners build aerobic base first; intervals only once volume allows
+        "quality_sessions": (2 if volume >= 200 else 1) if experienced else 0
+    }
+
+
+def injury_adjusted(targets: dict, injury: str) -> dict:
+    """The targets solve_week plans for: a major injury drops quality and cuts volume"""
+    if injury == "major":
+        return dict(targets, quality_sessions=0, run_minutes=_round5(targets['run_minutes'] * 0.8),
+                    long_run_minutes=min(targets['long_run_minutes'], 60))
+    if injury == "minor":
+        return dict(targets, quality_sessions=min(targets['quality_sessions'], 1))
+    return targets
+
+
+def _quality_kinds(profile: dict, count: int) -> List[str]:
+    goal = f"{profile.get('running_goal') or ''} {profile.get('target_race') or ''}".lower()
+    middle_distance = any(key in goal for key in ("800", "1500", "mile"))
+    kinds = ["intervals", "tempo"] if middle_distance else ["tempo", "intervals"]
+    return kinds[:count]
+
+
+def _run_count(volume: int, experienced: bool) -> int:
+    if volume <= 0:
+        return 0
+    if experienced:
+        return max(3, min(6, round(volume / 45)))
+    return max(2, min(4, round(volume / 40)))
+
+
+def _durations(volume: int, runs: int, kinds: List[str], has_long: bool, long_target: int,
+               easy_min: int = EASY_MIN) -> Optional[dict]:
+    """Minutes per role, or None if the easy runs would be shorter than `easy_min`"""
+    quality = {kind: max(35, min(60 if kind == "tempo" else 70, _round5(volume * 0.2))) for kind in kinds}
+    long_minutes = long_target if has_long else 0
+    easy_count = runs - len(kinds) - (1 if has_long else 0)
+
+    remaining = volume - long_minutes - sum(quality.values())
+    if easy_count:
+        easy = _round5(remaining / easy_count)
+        if easy < easy_min:
+            return None
+        if has_long:
+            # The long run absorbs the rounding so the week total stays on target
+            long_minutes = volume - sum(quality.values()) - easy * easy_count
+    else:
+        easy = 0
+        if has_long:
+            long_minutes = volume - sum(quality.values())
+        elif remaining:
+            return None
+    if has_long and long_minutes < EASY_MIN:
+        return None
+    return {"easy": easy, "long": long_minutes, **quality}
+
+
+def _adjacent(day_a: str, day_b: str) -> bool:
+    return abs(DAYS.index(day_a) - DAYS.index(day_b)) == 1
+
+
+def _spread(days) -> int:
+    """Smallest gap in days between any two of `days`"""
+    indexes = sorted(DAYS.index(d) for d in days)
+    return min((b - a for a, b in zip(indexes, indexes[1:])), default=7)
+
+
+def _score(roles: Dict[str, str], preferred: set, badminton: dict) -> float:
+    score = 0.0
+    for day, role in roles.items():
+        if day in preferred:
+            score += 3
+        if day in badminton:
+            score -= 4 if is_hard_badminton(badminton[day]) else 2
+        if role == "long" and day in ('saturday', 'sunday'):
+            score += 2
+    score -= 0.5 * sum(1 for a, b in zip(DAYS, DAYS[1:]) if a in roles and b in roles)
+    key_days = [d for d, role in roles.items() if role in KEY_SESSIONS]
+    if len(key_days) > 1:
+        score += min(_spread(key_days), 3)
+    return score
+
+
+def _assign_roles(run_days, kinds: List[str], has_long: bool, protected: set,
+                  preferred: set, badminton: dict) -> Optional[Dict[str, str]]:
+    """Best feasible role per run day, or None if the hard constraints can't be met"""
+    best, best_score = None, None
+    for long_day in (run_days if has_long else [None]):
+        if long_day in protected:
+            continue
+        others = [d for d in run_days if d != long_day]
+        for quality_days in combinations(others, len(kinds)):
+            # Hard: no quality running on or next to hard badminton
+            if any(d in protected for d in quality_days):
+                continue
+            key_days = list(quality_days) + ([long_day] if long_day else [])
+            # Hard: key sessions never on consecutive days
+            if any(_adjacent(a, b) for a, b in combinations(key_days, 2)):
+                continue
+
+            roles = {d: "easy" for d in run_days}
+            if long_day:
+                roles[long_day] = "long"
+            for day, kind in zip(quality_days, kinds):
+                roles[day] = kind
+
+            score = _score(roles, preferred, badminton)
+            if best_score is None or score > best_score:
+                best, best_score = roles, score
+    return best
+
+
+def _pick_spread(candidates: List[str], count: int) -> List[str]:
+    """`count` days from `candidates` (in preference order), as far apart as possible"""
+    best, best_key = [], None
+    for combo in combinations(candidates, min(count, len(candidates))):
+        preference = sum(candidates.index(d) for d in combo)
+        key = (min(_spread(combo), 3), -preference)
+        if best_key is None or key > best_key:
+            best, best_key = list(combo), key
+    return sorted(best, key=DAYS.index)
+
+
+def solve_week(profile: dict, targets: Optional[dict] = None, week_start: Optional[date] = None) -> Dict[str, dict]:
+    """
+    Lay out a week of sessions
+
+    Args:
+        profile: Normalized profile (ProfileSnapshot.data)
+        targets: run_minutes, long_run_minutes and quality_sessions for the week
+            (a periodization skeleton week works as is); defaults from the profile
+        week_start: Monday of the week, only needed to place a race_date target
+
+    Returns:
+        Dict of day -> slot with type, session, duration_minutes, intensity and
+        extras (strength, core or badminton added to the day)
+    """
+    experienced = is_experienced(profile)
+    injury = injury_level(profile)
+    targets = injury_adjusted(targets or default_targets(profile), injury)
+
+    badminton = badminton_by_day(profile)
+    hard_days = {d for d, s in badminton.items() if d in DAYS and is_hard_badminton(s)}
+    protected = protected_days(badminton)
+    avoid = {d.lower() for d in profile.get('avoid_run_days') or []}
+    preferred = {d.lower() for d in profile.get('preferred_run_days') or []}
+
+    volume = targets['run_minutes']
+    quality = targets['quality_sessions']
+    long_target = targets['long_run_minutes']
+
+    # Race week: the race is a fixed session and takes the long run's place
+    race_day = None
+    if targets.get('race_date') and week_start is not None:
+        offset = (date.fromisoformat(targets['race_date']) - week_start).days
+        if 0 <= offset < 7:
+            race_day = DAYS[offset]
+            volume = max(0, volume - long_target)
+            quality = 0
+    runnable = [d for d in DAYS if d not in avoid and d != race_day]
+
+    # Relax in order: fewer runs, then fewer quality sessions, and only then drop the long run
+    roles, durations = {}, {}
+    desired_runs = min(_run_count(volume, experienced), len(runnable))
+    easy_min = 30 if experienced else EASY_MIN
+    relaxations = [(q, has_long) for has_long in ((True, False) if race_day is None else (False,))
+                   for q in range(quality, -1, -1)]
+    for q, has_long in relaxations:
+        kinds = _quality_kinds(profile, q)
+        for runs in range(desired_runs, len(kinds) + (1 if has_long else 0), -1):
+            durations = _durations(volume, runs, kinds, has_long, long_target, easy_min)
+            if durations is None:
+                continue
+            best, best_score = None, None
+            for run_days in combinations(runnable, runs):
+                candidate = _assign_roles(run_days, kinds, has_long, protected, preferred, badminton)
+                if candidate is None:
+                    continue
+                score = _score(candidate, preferred, badminton)
+                if best_score is None or score > best_score:
+                    best, best_score = candidate, score
+            if best:
+                roles = best
+                break
+        if roles:
+            break
+
+    week = {}
+    for day in DAYS:
+        if day == race_day:
+            week[day] = {"type": "run", "session": "race", "duration_minutes": long_target,
+                         "intensity": "hard", "extras": []}
+        elif day in roles:
+            role = roles[day]
+            slot = {"type": "run", "session": role, "duration_minutes": durations[role],
+                    "intensity": "hard" if role in QUALITY else ("moderate" if role == "long" else "easy"),
+                    "extras": []}
+            if injury == "major":
+                # Low-impact replacement while injured
+                slot.update(type="cross-training", session="cross", intensity="easy")
+            if day in badminton:
+                session = badminton[day]
+                slot['extras'].append({"type": "badminton", "duration_minutes": session.get('duration_minutes', 90),
+                                       "intensity": session.get('intensity', 'moderate')})
+            week[day] = slot
+        elif day in badminton:
+            session = badminton[day]
+            week[day] = {"type": "badminton", "session": session.get('type', 'training'),
+                         "duration_minutes": session.get('duration_minutes', 90),
+                         "intensity": session.get('intensity', 'moderate'), "extras": []}
+        else:
+            week[day] = {"type": "rest", "session": "rest", "duration_minutes": 0, "intensity": "easy", "extras": []}
+
+    key_days = {d for d, s in week.items() if s['session'] in KEY_SESSIONS + ("race",)}
+    hard_run_days = {d for d, s in week.items() if s['session'] in QUALITY + ("race",)}
+
+    # Strength: never on hard badminton or interval/tempo days, rest days first
+    low_load = [d for d in DAYS if d not in hard_days and d not in key_days]
+    strength_candidates = (
+        [d for d in low_load if week[d]['type'] == 'rest' and d not in protected]
+        + [d for d in low_load if week[d]['type'] != 'rest' and d not in protected]
+        + [d for d in low_load if d in protected]
+    )
+    strength_days = _pick_spread(strength_candidates, len(STRENGTH_SESSIONS))
+    # Heavier session first, away from the next key session where there's a choice
+    strength_days.sort(key=lambda d: any(_adjacent(d, k) for k in key_days))
+    for (focus, label, minutes), day in zip(STRENGTH_SESSIONS, strength_days):
+        if week[day]['type'] == 'rest':
+            week[day] = {"type": "strength", "session": "strength", "focus": focus, "label": label,
+                         "duration_minutes": minutes, "intensity": "moderate", "extras": []}
+        else:
+            week[day]['extras'].append({"type": "strength", "focus": focus, "label": label,
+                                        "duration_minutes": minutes})
+
+    # Core three times a week on easy, rest or strength days
+    core_candidates = [d for d in DAYS if d not in hard_days and d not in hard_run_days
+                       and week[d]['session'] != 'long']
+    core_candidates.sort(key=lambda d: week[d]['type'] not in ('rest', 'strength'))
+    for day in _pick_spread(core_candidates, 3):
+        week[day]['extras'].append({"type": "core", "duration_minutes": CORE_MINUTES})
+
+    return week
+
+
+RUN_TEXT = {
+    "easy": "Easy run {m}min Z2, conversational (HR 65-75% HRmax)",
+    "long": "Long run {m}min steady Z2 (HR 65-75% HRmax)",
+    "tempo": "Tempo: 15min warm-up, {work}min at threshold, 10min cool-down",
+    "intervals": "Intervals: 15min warm-up, 6-8 x 3min at 3-5k effort with 2min jog, cool-down ({m}min total)",
+    "race": "Race day ({m}min incl. warm-up)",
+    "cross": "Easy bike or elliptical {m}min Z2 (low impact)",
+}
+
+
+def summarize(slot: dict) -> str:
+    """Plain one-line description of a slot (also the fallback when the LLM skips a day)"""
+    minutes = slot['duration_minutes']
+    session = slot['session']
+    if slot['type'] in ('run', 'cross-training'):
+        text = RUN_TEXT[session].format(m=minutes, work=max(minutes - 25, 15))
+    elif slot['type'] == 'badminton':
+        text = f"{slot['intensity'].capitalize()} badminton {session} {minutes}min"
+    elif slot['type'] == 'strength':
+        text = f"Strength {minutes}min: {slot['label']}"
+    else:
+        text = "Rest day, optional 15min mobility"
+
+    for extra in slot['extras']:
+        if extra['type'] == 'strength':
+            text += f" + {extra['duration_minutes']}min strength: {extra['label']}"
+        elif extra['type'] == 'core':
+            text += f" + {extra['duration_minutes']}min core (planks, bird dogs, V-ups)"
+        elif extra['type'] == 'badminton':
+            text += f" + {extra['intensity']} badminton {extra['duration_minutes']}min"
+    return text
+
+
+def to_plan(week: Dict[str, dict], descriptions: Optional[dict] = None) -> Dict[str, dict]:
+    """
+    Merge written descriptions into the solved week
+
+    Types and durations always come from the schedule; `descriptions` maps
+    day -> {"workout", "notes"} and may miss days.
+    """
+    descriptions = descriptions or {}
+    plan = {}
+    for day, slot in week.items():
+        written = descriptions.get(day) or {}
+        plan[day] = {
+            "type": slot['type'],
+            "workout": written.get('workout') or summarize(slot),
+            "duration_minutes": slot['duration_minutes'],
+            "notes": written.get('notes') or "",
+            "session": slot['session'],
+            "intensity": slot['intensity'],
+            "extras": slot['extras']
+        }
+    return plan
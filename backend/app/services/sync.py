@@ -0,0 +1,225 @@
+"""
+Delta sync for offline-first clients: what changed since a token, and
+batched offline writes with conflict detection.
+
+Every synced row carries sync_version, the id of the transaction that last
+wrote it (set by triggers, see app.models.sync); deletes leave a tombstone
+with the same kind of version. A token is the xmin of the snapshot the
+changes were read under: every transaction below it had finished, so the
+next sync asks for versions >= that xmin and can't miss a write that
+committed late. Rows from transactions still running at the time come back
+once more, which is harmless since clients apply rows by id.
+
+Tombstones are kept for TOMBSTONE_DAYS; older tokens get a reset (the
+recent window of data, to replace the client's copy). Prune them daily:
+
+    python -m app.services.sync --prune
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import push
+from app.models.daily_checkin import DailyCheckin
+from app.models.sync import SYNC_TABLES, SyncTombstone
+from app.models.training_plan import TrainingPlan
+from app.models.user_profile import UserProfile
+from app.models.workout_completion import WorkoutCompletion
+from app.schemas.sync import SyncWriteBatch
+from app.services import biometrics, workout_stats
+
+TOMBSTONE_DAYS = 60
+FULL_SYNC_DAYS = 90  # check-ins and completions sent on a reset
+
+SNAPSHOT_XMIN_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+ENTITIES = {table: entity for entity, table in SYNC_TABLES.items()}
+
+
+def make_token(xmin: int) -> str:
+    return f"{xmin}.{int(time.time())}"
+
+
+def parse_token(token: str) -> Tuple[int, int]:
+    """
+    Raises:
+        ValueError: Not a token this server issued
+    """
+    xmin, issued = token.split(".")
+    return int(xmin), int(issued)
+
+
+def _changed(db: Session, model, user_id, version: int):
+    return db.query(model).filter(model.user_id == user_id, model.sync_version >= version).all()
+
+
+def changes(db: Session, user_id, since: Optional[str]) -> dict:
+    """
+    Rows changed or deleted since `since`, or a reset when there's no usable token
+
+    Raises:
+        ValueError: Malformed token
+    """
+    # Taken before reading any rows: later statements see at least everything below it
+    xmin = db.execute(SNAPSHOT_XMIN_SQL).scalar()
+    result = {"token": make_token(xmin)}
+
+    version = None
+    if since:
+        version, issued = parse_token(since)
+        if time.time() - issued > TOMBSTONE_DAYS * 86400 or version > xmin:
+            version = None
+
+    if version is None:
+        horizon = date.today() - timedelta(days=FULL_SYNC_DAYS)
+        result["reset"] = True
+        result["checkins"] = db.query(DailyCheckin).filter(
+            DailyCheckin.user_id == user_id, DailyCheckin.date >= horizon
+        ).order_by(DailyCheckin.date).all()
+        result["completions"] = db.query(WorkoutCompletion).filter(
+            WorkoutCompletion.user_id == user_id, WorkoutCompletion.date >= horizon
+        ).order_by(WorkoutCompletion.date, WorkoutCompletion.slot).all()
+        result["plans"] = db.query(TrainingPlan).filter(
+            TrainingPlan.user_id == user_id, TrainingPlan.is_active == 1
+        ).order_by(TrainingPlan.week_start_date).all()
+        result["profile"] = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        return _compact(result)
+
+    result["checkins"] = _changed(db, DailyCheckin, user_id, version)
+    result["completions"] = _changed(db, WorkoutCompletion, user_id, version)
+    result["plans"] = _changed(db, TrainingPlan, user_id, version)
+    profiles = _changed(db, UserProfile, user_id, version)
+    result["profile"] = profiles[0] if profiles else None
+
+    deleted = defaultdict(list)
+    for table, row_id in db.query(SyncTombstone.entity, SyncTombstone.row_id).filter(
+        SyncTombstone.user_id == user_id,
+        SyncTombstone.sync_version >= version
+    ):
+        deleted[ENTITIES.get(table, table)].append(row_id)
+    result["deleted"] = dict(deleted) or None
+    return _compact(result)
+
+
+def _compact(result: dict) -> dict:
+    """Drop empty lists so an unchanged resume is just the token"""
+    return {key: value for key, value in result.items() if value not in (None, [], {})}
+
+
+def _matches(current, base_version: Optional[int]) -> bool:
+    """The client edited what's on the server now (nothing, for a row it created offline)"""
+    if current is None:
+        return base_version is None
+    return base_version is not None and base_version == current.sync_version
+
+
+def _last_per_key(items, key) -> List[Tuple[int, object]]:
+    """An offline queue can hold several edits of one row with the same base; the last one wins"""
+    latest = {}
+    for index, item in enumerate(items):
+        latest[key(item)] = (index, item)
+    return sorted(latest.values(), key=lambda pair: pair[0])
+
+
+def apply(db: Session, user_id, batch: SyncWriteBatch) -> dict:
+    """
+    Apply offline writes whose base_version still matches the server (caller commits)
+
+    Writes that conflict are skipped and reported with the server's current row,
+    so the client can merge and retry.
+    """
+    conflicts = []
+    checkins, completions, deleted = [], [], []
+
+    if batch.checkins:
+        existing = {row.date: row for row in db.query(DailyCheckin).filter(
+            DailyCheckin.user_id == user_id,
+            DailyCheckin.date.in_({item.date for item in batch.checkins})
+        ).with_for_update()}
+        for index, item in _last_per_key(batch.checkins, lambda item: item.date):
+            current = existing.get(item.date)
+            if not _matches(current, item.base_version):
+                conflicts.append({"entity": "checkins", "index": index, "checkin": current})
+                continue
+            if current is None:
+                current = DailyCheckin(user_id=user_id, date=item.date)
+                db.add(current)
+            biometrics.update_checkin(current, item.model_dump(exclude={"date", "base_version"}))
+            checkins.append(current)
+
+    if batch.completions or batch.completion_deletes:
+        dates = {item.date for item in batch.completions} | {item.date for item in batch.completion_deletes}
+        existing = {(row.date, row.slot): row for row in db.query(WorkoutCompletion).filter(
+            WorkoutCompletion.user_id == user_id,
+            WorkoutCompletion.date.in_(dates)
+        ).with_for_update()}
+
+        for index, item in _last_per_key(batch.completions, lambda item: (item.date, item.slot or item.workout_type)):
+            slot = item.slot or item.workout_type
+            current = existing.get((item.date, slot))
+            if not _matches(current, item.base_version):
+                conflicts.append({"entity": "completions", "index": index, "completion": current})
+                continue
+            if current is None:
+                current = WorkoutCompletion(user_id=user_id, date=item.date, slot=slot)
+                db.add(current)
+                existing[(item.date, slot)] = current
+            current.workout_type = item.workout_type
+            current.completed = item.completed
+            current.notes = item.notes
+            completions.append(current)
+
+        for index, item in _last_per_key(batch.completion_deletes, lambda item: (item.date, item.slot)):
+            current = existing.get((item.date, item.slot))
+            if current is None or current in completions or not _matches(current, item.base_version):
+                conflicts.append({"entity": "completion_deletes", "index": index, "completion": current})
+                continue
+            deleted.append(current.id)
+            db.delete(current)
+
+    if checkins or completions or deleted:
+        db.flush()
+        touched = [row.date for row in completions] + [item.date for item in batch.completion_deletes]
+        if completions or deleted:
+            workout_stats.refresh(db, user_id, min(touched), max(touched))
+        push.notify(db, user_id, "sync.updated")
+
+    return _compact({
+        "checkins": checkins,
+        "completions": completions,
+        "deleted": {"completions": deleted} if deleted else None,
+        "conflicts": conflicts,
+    })
+
+
+def prune_tombstones(db: Session, days: int = TOMBSTONE_DAYS) -> int:
+    """Delete tombstones no valid token can still ask for (caller commits)"""
+    return db.query(SyncTombstone).filter(
+        SyncTombstone.deleted_at < text(f"now() - interval '{int(days)} days'")
+    ).delete(synchronize_session=False)
+
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delta sync maintenance")
+    parser.add_argument("--prune", action="store_true", help=f"Delete tombstones older than {TOMBSTONE_DAYS} days")
+    args = parser.parse_args()
+
+    if not args.prune:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        print(f"Pruned {prune_tombstones(db)} sync tombstones")
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
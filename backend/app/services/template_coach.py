@@ -0,0 +1,127 @@
+"""
+Deterministic, rule-based coach used by the "template" LLM provider.
+
+Produces the same shapes the LLM prompts ask for (recommendation text, week
+descriptions, single workout JSON) from the structured inputs alone, so the app
+runs end to end without network access in tests and benchmarks.
+"""
+import json
+
+from app.services.scheduler import solve_week, summarize, to_plan
+
+
+def _round5(minutes: float) -> int:
+    return int(5 * round(minutes / 5))
+
+
+def recovery_flags(checkin_data: dict) -> list:
+    """Same thresholds adjust_todays_workout uses to describe recovery"""
+    flags = []
+    sleep_hours = checkin_data.get('sleep_hours')
+    sleep_quality = checkin_data.get('sleep_quality')
+    energy = checkin_data.get('energy_level')
+    soreness = checkin_data.get('soreness_level')
+
+    if sleep_hours and sleep_hours < 6:
+        flags.append("short sleep")
+    if sleep_quality and sleep_quality <= 2:
+        flags.append("poor sleep quality")
+    if energy and energy <= 2:
+        flags.append("low energy")
+    if soreness and soreness >= 4:
+        flags.append("high soreness")
+    return flags
+
+
+def daily_recommendation(context: dict) -> str:
+    flags = recovery_flags(context.get('checkin_data') or {})
+    planned = context.get('planned_workout') or "today's session"
+
+    if not flags:
+        return (f"Recovery looks good, so go ahead with {planned} as planned. "
+                "Keep easy efforts genuinely easy and stay on top of hydration.")
+    if len(flags) == 1:
+        return (f"Yellow flag: {flags[0]}. Do {planned} but cut volume or intensity by 20-30% "
+                "(e.g. drop a rep or swap tempo for steady aerobic running).")
+    return (f"Red flag: {', '.join(flags)}. Skip {planned} and take rest or 20-30min of very easy "
+            "active recovery and mobility; recovery today protects the rest of the week.")
+
+
+# Rationale line per scheduled session
+NOTES = {
+    "easy": "Easy volume.",
+    "long": "Aerobic base for the goal event.",
+    "tempo": "Kept away from hard badminton days.",
+    "intervals": "Kept away from hard badminton days.",
+    "race": "Race day: warm up well and pace the first half evenly.",
+    "cross": "Low-impact while the injury settles.",
+    "strength": "Strength on a low-load day.",
+    "rest": "Recovery.",
+}
+
+
+def describe_week(week: dict) -> dict:
+    """The {"workout", "notes"} per day the weekly prompt asks for"""
+    return {
+        day: {"workout": summarize(slot),
+              "notes": NOTES.get(slot['session'], "From your badminton schedule.")}
+        for day, slot in week.items()
+    }
+
+
+def weekly_plan(profile: dict) -> dict:
+    week = solve_week(profile)
+    return to_plan(week, describe_week(week))
+
+
+def mesocycle(context: dict) -> dict:
+    """Descriptions for each solved week of a block, keyed by week number"""
+    return {str(week['week_number']): describe_week(week['days']) for week in context.get('weeks') or []}
+
+
+def single_day_workout(context: dict) -> dict:
+    day = context['day']
+    workout = weekly_plan(context.get('profile') or {})[day]
+    existing = (context.get('existing_plan') or {}).get(day) or {}
+
+    # The user asked for something different: swap easy running for cross-training
+    if existing.get('workout') == workout['workout'] and workout.get('session') == 'easy':
+        workout = {"type": "cross-training",
+                   "workout": f"Easy bike or elliptical {workout['duration_minutes']}min Z2",
+                   "duration_minutes": workout['duration_minutes'], "notes": "Low-impact variation of an easy run."}
+    workout['date'] = context.get('date_str')
+    return workout
+
+
+def adjust_workout(context: dict) -> dict:
+    current = dict(context.get('current_workout') or {})
+    flags = recovery_flags(context.get('checkin_data') or {})
+    duration = current.get('duration_minutes') or 0
+
+    if len(flags) >= 2:
+        return {"type": "rest", "workout": "Rest or 20min easy mobility and walking",
+                "duration_minutes": 20, "notes": f"Replaced planned session: {', '.join(flags)}.",
+                "date": current.get('date')}
+    if flags:
+        current['duration_minutes'] = _round5(duration * 0.7)
+        current['workout'] = f"{current.get('workout', '')} (reduced ~30%, keep effort easy)"
+        current['notes'] = f"Reduced for {flags[0]}."
+        return current
+    current['notes'] = "Recovery looks good, no changes."
+    return current
+
+
+def render(task: str, context: dict) -> str:
+    """Return the completion text a model would give for `task`"""
+    if task == "daily_recommendation":
+        return daily_recommendation(context)
+    if task == "weekly_plan":
+        week = context.get('week') or solve_week(context.get('profile') or {})
+        return json.dumps(describe_week(week))
+    if task == "mesocycle":
+        return json.dumps(mesocycle(context))
+    if task == "single_day_workout":
+        return json.dumps(single_day_workout(context))
+    if task == "adjust_workout":
+        return json.dumps(adjust_workout(context))
+    raise ValueError(f"Template provider has no template for task: {task}")
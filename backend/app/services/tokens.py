@@ -0,0 +1,144 @@
+"""
+Local token counts for prompts, budgets for the free text users put in them,
+and completion limits sized from what each task is asked to return.
+
+Counts use tiktoken's encoding for the model (o200k_base for models it
+doesn't know, such as local ones). tiktoken downloads an encoding on first
+use, so servers without internet access should ship them in
+TIKTOKEN_CACHE_DIR; when an encoding can't be loaded the counts fall back to
+a word/number/punctuation estimate that stays within ~15% for English.
+"""
+import json
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional, Union
+
+DEFAULT_ENCODING = "o200k_base"
+
+# Chat formatting around each message and the reply primer (OpenAI's counting recipe)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Most tokens a user-written field may take in a prompt
+FIELD_BUDGETS = {
+    "running_goal": 40,
+    "target_race": 30,
+    "other_commitments": 80,
+    "injury": 40,  # each injury: area, severity and notes
+    "checkin_notes": 100,
+}
+MAX_INJURIES = 5
+
+# Tokens expected per field of each task's output. Dicts mirror the JSON the
+# prompt asks for; an int is prose. JSON keys and punctuation are counted on top.
+_WEEK = {day: {"workout": 70, "notes": 20} for day in
+         ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")}
+_WORKOUT = {"type": 3, "workout": 160, "duration_minutes": 2, "notes": 60, "date": 6}
+OUTPUT_SHAPES = {
+    "daily_recommendation": 150,  # 2-3 sentences
+    "weekly_plan": _WEEK,
+    "mesocycle": {"1": _WEEK},  # per week, keyed by week number
+    "single_day_workout": _WORKOUT,
+    "adjust_workout": _WORKOUT,
+}
+OUTPUT_MARGIN = 1.25  # models run long; a cut-off JSON reply is a failed call
+
+_PIECES = re.compile(r"\d{1,3}|[^\W\d_]+|[^\w\s]|\n")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    """The tiktoken encoding for `model`, or None when it can't be loaded"""
+    try:
+        import tiktoken
+
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"Token counts for {model or DEFAULT_ENCODING} are estimated: {e}")
+        return None
+
+
+def _estimate(text: str) -> int:
+    # Common words are one token, long ones about one per four characters;
+    # digits go in groups of three and punctuation mostly stands alone
+    total = 0
+    for piece in _PIECES.findall(text):
+        total += 1 if len(piece) <= 6 else math.ceil(len(piece) / 4)
+    return total
+
+
+def count(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return _estimate(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_messages(messages: List[dict], model: Optional[str] = None) -> int:
+    """Prompt tokens for a chat request"""
+    return sum(count(m["content"], model) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_PER_REPLY
+
+
+def compact(text: str) -> str:
+    """Collapse runs of spaces and blank lines; prompts built from optional parts leave plenty"""
+    lines = (_SPACES.sub(" ", line).rstrip() for line in text.strip().split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+
+def truncate(text: str, budget: int, model: Optional[str] = None) -> str:
+    """`text` cut to at most `budget` tokens at a word boundary, marked with an ellipsis"""
+    if count(text, model) <= budget:
+        return text
+    encoding = _encoding(model)
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max(budget - 1, 0)])
+    else:
+        cut = text
+        while cut and _estimate(cut) > budget - 1:
+            cut = cut[:int(len(cut) * 0.9)]
+    # Drop the partial word the cut may have left
+    if " " in cut.strip():
+        cut = cut.rstrip().rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:.-") + "…"
+
+
+def fit(text: Optional[str], field: str) -> Optional[str]:
+    """User free text for a prompt: whitespace compacted and held to the field's budget"""
+    if not text:
+        return text
+    return truncate(" ".join(text.split()), FIELD_BUDGETS[field])
+
+
+def _shape_tokens(shape: Union[dict, int]) -> int:
+    """Value tokens in an output shape, without the JSON around them"""
+    if isinstance(shape, int):
+        return shape
+    return sum(_shape_tokens(value) for value in shape.values())
+
+
+def _skeleton(shape: Union[dict, int]):
+    if isinstance(shape, int):
+        return ""
+    return {key: _skeleton(value) for key, value in shape.items()}
+
+
+@lru_cache(maxsize=None)
+def max_tokens(task: str, repeat: int = 1) -> int:
+    """
+    Completion limit for `task`: its expected output (`repeat` times, e.g. weeks
+    in a mesocycle batch) plus the JSON structure, with OUTPUT_MARGIN headroom
+    """
+    shape = OUTPUT_SHAPES[task]
+    structure = count(json.dumps(_skeleton(shape))) if isinstance(shape, dict) else 0
+    expected = (_shape_tokens(shape) + structure) * repeat
+    return int(math.ceil(expected * OUTPUT_MARGIN / 16) * 16)
@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, case
+from sqlalchemy.orm import Session
+
+from app.core import push
+from app.models.training_block import TrainingBlock
+from app.models.training_plan import TrainingPlan
+from app.services import workout_stats
+
+
+def get_active_plan(db: Session, user_id, day: Optional[date] = None) -> Optional[TrainingPlan]:
+    """
+    The active week plan for `day` (defaults to today)
+
+    With a multi-week block several weeks are active at once, so the week
+    containing `day` wins. Otherwise it's the newest active plan (e.g. next
+    week's plan generated on a Sunday), first week first within a block.
+    """
+    day = day or date.today()
+    covers_day = and_(
+        TrainingPlan.week_start_date <= day,
+        TrainingPlan.week_start_date > day - timedelta(days=7)
+    )
+    return db.query(TrainingPlan).filter(
+        TrainingPlan.user_id == user_id,
+        TrainingPlan.is_active == 1
+    ).order_by(
+        case((covers_day, 0), else_=1),
+        TrainingPlan.created_at.desc(),
+        TrainingPlan.week_start_date
+    ).first()
+
+
+def archive_active(db: Session, user_id):
+    """Retire the current plans and block before a new one is saved (caller commits)"""
+    db.query(TrainingPlan).filter(
+        TrainingPlan.user_id == user_id,
+        TrainingPlan.is_active == 1
+    ).update({"is_active": 0})
+    db.query(TrainingBlock).filter(
+        TrainingBlock.user_id == user_id,
+        TrainingBlock.is_active == 1
+    ).update({"is_active": 0})
+
+
+def store_block(db: Session, user_id, start_date: date, profile_version: int, target_race: Optional[str],
+                skeleton: List[dict], week_plans: List[dict]) -> TrainingBlock:
+    """
+    Save a block and one active training_plans row per week, replacing the current plans
+
+    Args:
+        skeleton: Per-week targets from periodization.build_skeleton
+        week_plans: Day-by-day plan for each week, in the same order
+    """
+    archive_active(db, user_id)
+
+    block = TrainingBlock(
+        user_id=user_id,
+        start_date=start_date,
+        weeks=len(skeleton),
+        target_race=target_race,
+        profile_version=profile_version,
+        skeleton=skeleton,
+        is_active=1
+    )
+    db.add(block)
+    db.flush()
+
+    db.add_all([
+        TrainingPlan(
+            user_id=user_id,
+            week_start_date=date.fromisoformat(week['week_start_date']),
+            plan_data=plan,
+            block_id=block.id,
+            week_number=week['week_number'],
+            is_active=1
+        )
+        for week, plan in zip(skeleton, week_plans)
+    ])
+    workout_stats.refresh(db, user_id, start_date, start_date + timedelta(weeks=len(skeleton)) - timedelta(days=1))
+    push.notify(db, user_id, "plan.updated", {"week_start": start_date.isoformat(), "block_id": str(block.id)})
+    db.commit()
+    db.refresh(block)
+    return block
+
+
+def get_active_block(db: Session, user_id) -> Optional[TrainingBlock]:
+    return db.query(TrainingBlock).filter(
+        TrainingBlock.user_id == user_id,
+        TrainingBlock.is_active == 1
+    ).order_by(TrainingBlock.created_at.desc()).first()
+
+
+def block_weeks(db: Session, block: TrainingBlock) -> List[TrainingPlan]:
+    return db.query(TrainingPlan).filter(
+        TrainingPlan.block_id == block.id
+    ).order_by(TrainingPlan.week_number).all()
+
+
+def week_targets(db: Session, plan: TrainingPlan) -> Optional[dict]:
+    """Periodization targets for a block week, None for a standalone week"""
+    if plan.block_id is None:
+        return None
+    block = db.query(TrainingBlock).filter(TrainingBlock.id == plan.block_id).first()
+    if block is None:
+        return None
+    return next((week for week in block.skeleton if week['week_number'] == plan.week_number), None)
+
+
+def summaries(db: Session, user_id, start: Optional[date] = None, end: Optional[date] = None,
+              session_type: Optional[str] = None) -> List[dict]:
+    """
+    Per-week totals of the active plans from the trigger-kept summary columns,
+    without loading plan_data
+
+    Args:
+        start, end: Weeks starting in this range (inclusive), all when omitted
+        session_type: Only weeks with at least one session of this type ("strength")
+    """
+    query = db.query(
+        TrainingPlan.week_start_date,
+        TrainingPlan.week_number,
+        TrainingPlan.planned_minutes,
+        TrainingPlan.run_minutes,
+        TrainingPlan.hard_sessions,
+        TrainingPlan.minutes_by_type,
+        TrainingPlan.days_by_type
+    ).filter(
+        TrainingPlan.user_id == user_id,
+        TrainingPlan.is_active == 1
+    )
+    if start is not None:
+        query = query.filter(TrainingPlan.week_start_date >= start)
+    if end is not None:
+        query = query.filter(TrainingPlan.week_start_date <= end)
+    if session_type is not None:
+        query = query.filter(TrainingPlan.days_by_type.has_key(session_type))
+
+    return [
+        {
+            "week_start_date": row.week_start_date.isoformat(),
+            "week_number": row.week_number,
+            "planned_minutes": row.planned_minutes,
+            "run_minutes": row.run_minutes,
+            "hard_sessions": row.hard_sessions,
+            "minutes_by_type": row.minutes_by_type,
+            "days_by_type": row.days_by_type,
+        }
+        for row in query.order_by(TrainingPlan.week_start_date)
+    ]
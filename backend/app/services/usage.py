@@ -0,0 +1,121 @@
+"""
+LLM spend: calls and tokens per user, UTC day, endpoint and model in the
+llm_usage table, and what they cost at LLM_PRICES.
+
+Every completion adds to its row as it finishes (coalesced callers that
+shared one add nothing). The report groups the rows for a date range:
+
+    python -m app.services.usage --days 30 --by endpoint
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_engine
+from app.models.llm_usage import LLMUsage
+
+RECORD_SQL = text("""
+    INSERT INTO llm_usage AS u (user_id, day, endpoint, task, model, provider, calls, prompt_tokens, completion_tokens)
+    VALUES (:user_id, (now() AT TIME ZONE 'utc')::date, :endpoint, :task, :model, :provider, 1,
+            :prompt_tokens, :completion_tokens)
+    ON CONFLICT (user_id, day, endpoint, task, model) DO UPDATE SET
+        calls = u.calls + 1,
+        prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+        completion_tokens = u.completion_tokens + excluded.completion_tokens,
+        provider = excluded.provider,
+        updated_at = now()
+""")
+
+GROUPS = {
+    "endpoint": LLMUsage.endpoint,
+    "user": LLMUsage.user_id,
+    "day": LLMUsage.day,
+    "task": LLMUsage.task,
+    "model": LLMUsage.model,
+}
+
+
+def record(user_id, endpoint: str, task: str, provider: str, model: str, prompt_tokens: int, completion_tokens: int):
+    """Add one completion to today's row; a failure is logged, never raised to the caller"""
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(RECORD_SQL, {
+                "user_id": user_id, "endpoint": endpoint[:100], "task": task, "model": model[:100],
+                "provider": provider, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            })
+    except Exception as e:
+        print(f"Could not record LLM usage for {endpoint}: {e}")
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD at LLM_PRICES; 0 for models without a price (local, template)"""
+    price = settings.LLM_PRICES.get(model)
+    if not price:
+        return 0.0
+    return (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1_000_000
+
+
+def report(db: Session, start: date, end: date, by: str = "endpoint", user_id=None) -> List[dict]:
+    """
+    Calls, tokens and cost from `start` to `end` (inclusive) grouped by
+    "endpoint", "user", "day", "task" or "model", most expensive first
+    """
+    column = GROUPS[by]
+    query = db.query(
+        column, LLMUsage.model,
+        func.sum(LLMUsage.calls), func.sum(LLMUsage.prompt_tokens), func.sum(LLMUsage.completion_tokens)
+    ).filter(LLMUsage.day >= start, LLMUsage.day <= end)
+    if user_id is not None:
+        query = query.filter(LLMUsage.user_id == user_id)
+
+    # Summed per model first, since each model has its own price
+    totals = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+    for key, model, calls, prompt_tokens, completion_tokens in query.group_by(column, LLMUsage.model):
+        row = totals[str(key)]
+        row["calls"] += int(calls)
+        row["prompt_tokens"] += int(prompt_tokens)
+        row["completion_tokens"] += int(completion_tokens)
+        row["cost_usd"] += cost(model, int(prompt_tokens), int(completion_tokens))
+
+    rows = [dict(row, **{by: key}) for key, row in totals.items()]
+    for row in rows:
+        row["cost_usd"] = round(row["cost_usd"], 4)
+    return sorted(rows, key=lambda row: (-row["cost_usd"], -row["prompt_tokens"] - row["completion_tokens"]))
+
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="LLM calls, tokens and cost from the llm_usage table")
+    parser.add_argument("--days", type=int, default=30, help="Days back from today, today included")
+    parser.add_argument("--by", choices=sorted(GROUPS), default="endpoint")
+    parser.add_argument("--user", help="Only this user id")
+    args = parser.parse_args()
+
+    end = date.today()
+    start = end - timedelta(days=args.days - 1)
+    db = SessionLocal()
+    try:
+        rows = report(db, start, end, args.by, args.user)
+    finally:
+        db.close()
+
+    print(f"LLM usage {start} to {end} by {args.by}")
+    width = max([len(args.by)] + [len(row[args.by]) for row in rows])
+    print(f"{args.by:<{width}}  {'calls':>7}  {'prompt':>10}  {'completion':>10}  {'cost USD':>10}")
+    for row in rows:
+        print(f"{row[args.by]:<{width}}  {row['calls']:>7}  {row['prompt_tokens']:>10}  "
+              f"{row['completion_tokens']:>10}  {row['cost_usd']:>10.4f}")
+    total = sum(row["cost_usd"] for row in rows)
+    print(f"{'total':<{width}}  {sum(row['calls'] for row in rows):>7}  "
+          f"{sum(row['prompt_tokens'] for row in rows):>10}  "
+          f"{sum(row['completion_tokens'] for row in rows):>10}  {total:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
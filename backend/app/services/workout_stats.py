@@ -0,0 +1,277 @@
+"""
+Adherence analytics: planned sessions from training_plans.plan_data joined
+with workout_completions.
+
+Finished weeks are kept in workout_weekly_stats and refreshed whenever a
+completion or plan in the week changes, so a long range is one indexed read
+of ~52 rows a year. Only the days at the edges of the range and the current
+week are computed live. Weeks without planned sessions are stored as empty
+rows, so a missing row always means the week was never computed.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models.workout_stats import WorkoutWeeklyStats
+
+# One row per week in [:start, :end] with totals, per-type numbers and streak edges.
+# Overlapping plans (e.g. a regenerated week) count once: the newest plan wins per day.
+WEEKS_SQL = text("""
+    WITH plan_days AS (
+        SELECT DISTINCT ON (day) day, type, minutes
+        FROM (
+            -- Plan JSON comes from the model: durations written as text or fractions are
+            -- rounded (anything else counts as 0, as in plan_summary) and a day whose date
+            -- isn't a real date is skipped, so one malformed plan never fails the query
+            SELECT CASE
+                       WHEN raw.date IS NULL THEN
+                           tp.week_start_date + array_position(
+                               ARRAY['monday','tuesday','wednesday','thursday','friday','saturday','sunday'], d.key) - 1
+                       WHEN raw.date ~ '^[1-9][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$' THEN
+                           CASE WHEN substr(raw.date, 9, 2)::int <= extract(
+                                     day FROM (substr(raw.date, 1, 8) || '01')::date + interval '1 month - 1 day')
+                                THEN raw.date::date END
+                   END AS day,
+                   COALESCE(d.value->>'type', 'workout') AS type,
+                   CASE WHEN raw.minutes ~ '^[0-9]+([.][0-9]+)?$' THEN round(raw.minutes::numeric)::int ELSE 0 END AS minutes,
+                   tp.created_at
+            FROM training_plans tp
+            CROSS JOIN LATERAL jsonb_each(CASE jsonb_typeof(tp.plan_data) WHEN 'object' THEN tp.plan_data ELSE '{}' END) AS d
+            CROSS JOIN LATERAL (SELECT d.value->>'date' AS date, d.value->>'duration_minutes' AS minutes) AS raw
+            WHERE tp.user_id = :user_id
+              AND tp.week_start_date BETWEEN CAST(:start AS date) - 6 AND :end
+              AND jsonb_typeof(d.value) = 'object'
+        ) candidates
+        WHERE day BETWEEN :start AND :end
+        ORDER BY day, created_at DESC
+    ),
+    -- A day can have several completions (one per slot). The one matching the planned
+    -- type decides; days logged under other types fall back to any completion.
+    days AS (
+        SELECT p.day, p.type, p.minutes,
+               COALESCE(
+                   bool_or(c.completed) FILTER (WHERE c.workout_type = p.type),
+                   bool_or(c.completed),
+                   false
+               ) AS completed,
+               -- Recorded moving time from an uploaded activity beats the planned duration
+               COALESCE(
+                   MAX(c.duration_minutes) FILTER (WHERE c.workout_type = p.type),
+                   MAX(c.duration_minutes)
+               ) AS actual_minutes,
+               date_trunc('week', p.day)::date AS week_start
+        FROM plan_days p
+        LEFT JOIN workout_completions c ON c.user_id = :user_id AND c.date = p.day
+        WHERE p.type <> 'rest'
+        GROUP BY p.day, p.type, p.minutes
+    ),
+    -- Gaps and islands: consecutive completed sessions share an island number
+    numbered AS (
+        SELECT *,
+               ROW_NUMBER() OVER w AS pos,
+               COUNT(*) OVER (PARTITION BY week_start) AS sessions,
+               ROW_NUMBER() OVER w
+                 - ROW_NUMBER() OVER (PARTITION BY week_start, completed ORDER BY day) AS island
+        FROM days
+        WINDOW w AS (PARTITION BY week_start ORDER BY day)
+    ),
+    islands AS (
+        SELECT week_start, MIN(pos) AS first_pos, MAX(pos) AS last_pos, MAX(sessions) AS sessions, COUNT(*) AS length
+        FROM numbered
+        WHERE completed
+        GROUP BY week_start, island
+    ),
+    streaks AS (
+        SELECT week_start,
+               COALESCE(MAX(length) FILTER (WHERE first_pos = 1), 0) AS lead_streak,
+               COALESCE(MAX(length) FILTER (WHERE last_pos = sessions), 0) AS tail_streak,
+               MAX(length) AS best_streak
+        FROM islands
+        GROUP BY week_start
+    ),
+    by_type AS (
+        SELECT week_start, type,
+               COUNT(*) AS planned_sessions,
+               COUNT(*) FILTER (WHERE completed) AS completed_sessions,
+               SUM(minutes) AS planned_minutes,
+               COALESCE(SUM(COALESCE(actual_minutes, minutes)) FILTER (WHERE completed), 0) AS completed_minutes
+        FROM numbered
+        GROUP BY week_start, type
+    )
+    SELECT t.week_start,
+           SUM(t.planned_sessions)::int AS planned_sessions,
+           SUM(t.completed_sessions)::int AS completed_sessions,
+           SUM(t.planned_minutes)::int AS planned_minutes,
+           SUM(t.completed_minutes)::int AS completed_minutes,
+           jsonb_object_agg(t.type, jsonb_build_object(
+               'planned_sessions', t.planned_sessions, 'completed_sessions', t.completed_sessions,
+               'planned_minutes', t.planned_minutes, 'completed_minutes', t.completed_minutes
+           )) AS by_type,
+           COALESCE(MAX(s.lead_streak), 0)::int AS lead_streak,
+           COALESCE(MAX(s.tail_streak), 0)::int AS tail_streak,
+           COALESCE(MAX(s.best_streak), 0)::int AS best_streak
+    FROM by_type t
+    LEFT JOIN streaks s ON s.week_start = t.week_start
+    GROUP BY t.week_start
+    ORDER BY t.week_start
+""")
+
+SUMMARY_FIELDS = ("planned_sessions", "completed_sessions", "planned_minutes", "completed_minutes")
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _compute(db: Session, user_id, start: date, end: date) -> List[dict]:
+    if end < start:
+        return []
+    rows = db.execute(WEEKS_SQL, {"user_id": user_id, "start": start, "end": end}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def _empty(monday: date) -> dict:
+    return {"week_start": monday, "by_type": {}, "lead_streak": 0, "tail_streak": 0, "best_streak": 0,
+            **dict.fromkeys(SUMMARY_FIELDS, 0)}
+
+
+def _mondays(first: date, last: date) -> List[date]:
+    return [first + timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+
+
+def refresh(db: Session, user_id, start: date, end: Optional[date] = None) -> List[dict]:
+    """
+    Recompute the stored weeks covering [start, end] (caller commits)
+
+    Call after writing completions or plans for those days.
+
+    Returns:
+        The recomputed weeks that have planned sessions
+    """
+    first = week_start(start)
+    last = week_start(end or start)
+
+    # Plans and completions added in this session have to be visible to the query
+    db.flush()
+    weeks = _compute(db, user_id, first, last + timedelta(days=6))
+    computed = {week["week_start"] for week in weeks}
+    rows = weeks + [_empty(monday) for monday in _mondays(first, last) if monday not in computed]
+
+    db.query(WorkoutWeeklyStats).filter(
+        WorkoutWeeklyStats.user_id == user_id,
+        WorkoutWeeklyStats.week_start.between(first, last)
+    ).delete(synchronize_session=False)
+    # A concurrent backfill of the same weeks may have inserted them first
+    stmt = insert(WorkoutWeeklyStats).values([dict(row, user_id=user_id) for row in rows])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_start"],
+        set_=dict({column: stmt.excluded[column] for column in rows[0] if column != "week_start"}, updated_at=func.now())
+    ))
+    return weeks
+
+
+def _stored(db: Session, user_id, first: date, last: date) -> List[dict]:
+    rows = db.query(WorkoutWeeklyStats).filter(
+        WorkoutWeeklyStats.user_id == user_id,
+        WorkoutWeeklyStats.week_start.between(first, last)
+    ).order_by(WorkoutWeeklyStats.week_start).all()
+    weeks = {
+        row.week_start: {
+            "week_start": row.week_start, "by_type": row.by_type,
+            "lead_streak": row.lead_streak, "tail_streak": row.tail_streak, "best_streak": row.best_streak,
+            **{field: getattr(row, field) for field in SUMMARY_FIELDS}
+        }
+        for row in rows
+    }
+
+    # Weeks never computed (data from before the table existed, or around a later
+    # refresh): build each run of them once
+    missing = [monday for monday in _mondays(first, last) if monday not in weeks]
+    if missing:
+        runs = [[missing[0]]]
+        for monday in missing[1:]:
+            if monday - runs[-1][-1] == timedelta(weeks=1):
+                runs[-1].append(monday)
+            else:
+                runs.append([monday])
+        for run in runs:
+            weeks.update((week["week_start"], week) for week in refresh(db, user_id, run[0], run[-1]))
+        db.commit()
+
+    # Empty rows only mark weeks as computed
+    return [week for _, week in sorted(weeks.items()) if week["planned_sessions"]]
+
+
+def _rate(completed: int, planned: int) -> Optional[float]:
+    return round(completed / planned, 3) if planned else None
+
+
+def _summary(weeks: List[dict]) -> dict:
+    totals = {field: sum(week[field] for week in weeks) for field in SUMMARY_FIELDS}
+    totals["adherence"] = _rate(totals["completed_sessions"], totals["planned_sessions"])
+    return totals
+
+
+def get_stats(db: Session, user_id, start: date, end: date, today: Optional[date] = None) -> dict:
+    """
+    Adherence between `start` and `end` (inclusive); days after today aren't counted
+
+    Returns:
+        Totals, by_type, weekly and monthly adherence, and current/longest streaks
+        of completed planned sessions
+    """
+    today = today or date.today()
+    end = min(end, today)
+
+    # Whole finished weeks come from the stored aggregates, the rest is computed live
+    first_full = week_start(start) if start == week_start(start) else week_start(start) + timedelta(days=7)
+    last_full = week_start(end) - timedelta(days=7) if end < week_start(end) + timedelta(days=6) else week_start(end)
+    if first_full > last_full:
+        weeks = _compute(db, user_id, start, end)
+    else:
+        weeks = (
+            _compute(db, user_id, start, first_full - timedelta(days=1))
+            + _stored(db, user_id, first_full, last_full)
+            + _compute(db, user_id, last_full + timedelta(days=7), end)
+        )
+
+    by_type = defaultdict(lambda: dict.fromkeys(SUMMARY_FIELDS, 0))
+    for week in weeks:
+        for workout_type, numbers in week["by_type"].items():
+            for field in SUMMARY_FIELDS:
+                by_type[workout_type][field] += numbers[field]
+
+    # Join week streak edges: a fully completed week carries the streak through
+    current = longest = 0
+    for week in weeks:
+        if week["completed_sessions"] == week["planned_sessions"]:
+            current += week["planned_sessions"]
+        else:
+            longest = max(longest, current + week["lead_streak"])
+            current = week["tail_streak"]
+        longest = max(longest, week["best_streak"], current)
+
+    # Weeks belong to the month their Thursday falls in (ISO week convention)
+    months = defaultdict(list)
+    for week in weeks:
+        thursday = week["week_start"] + timedelta(days=3)
+        months[thursday.strftime("%Y-%m")].append(week)
+
+    return {
+        "start": start,
+        "end": end,
+        **_summary(weeks),
+        "by_type": {
+            workout_type: dict(numbers, adherence=_rate(numbers["completed_sessions"], numbers["planned_sessions"]))
+            for workout_type, numbers in sorted(by_type.items())
+        },
+        "weekly": [dict(_summary([week]), period=week["week_start"].isoformat()) for week in weeks],
+        "monthly": [dict(_summary(month_weeks), period=month) for month, month_weeks in months.items()],
+        "current_streak": current,
+        "longest_streak": longest
+    }
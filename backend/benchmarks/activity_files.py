@@ -0,0 +1,132 @@
+"""
+Activity file ingestion benchmark: parse + analyze time and peak memory for
+synthetic FIT, GPX and TCX files (default: a 3 hour run recorded at 1 Hz).
+
+    python -m benchmarks.activity_files --hours 3 --runs 5
+    python -m benchmarks.activity_files --write-dir /tmp/activities   # keep the generated files
+"""
+import argparse
+import io
+import json
+import math
+import os
+import statistics
+import struct
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.services.activity_analysis import analyze
+from app.services.activity_files import FIT_EPOCH, read_activity
+
+START = datetime(2026, 10, 18, 7, 0, tzinfo=timezone.utc)
+
+
+def synthetic_points(seconds: int):
+    """A hilly straight run north at ~5:00/km with HR drifting up, one point per second"""
+    for i in range(seconds):
+        distance = i * 3.33
+        yield {
+            "time": START + timedelta(seconds=i),
+            "lat": 52.0 + distance / 111_195,  # metres per degree of latitude
+            "lon": 4.0,
+            "altitude": 20 + 15 * math.sin(i / 300),
+            "heart_rate": int(135 + 25 * i / seconds + 8 * math.sin(i / 90)),
+            "distance": distance,
+        }
+
+
+def write_gpx(points) -> bytes:
+    out = io.StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<gpx version="1.1" creator="bench" '
+              'xmlns="http://www.topografix.com/GPX/1/1" '
+              'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">'
+              '<trk><type>running</type><trkseg>\n')
+    for p in points:
+        out.write(f'<trkpt lat="{p["lat"]:.7f}" lon="{p["lon"]:.7f}"><ele>{p["altitude"]:.1f}</ele>'
+                  f'<time>{p["time"]:%Y-%m-%dT%H:%M:%SZ}</time><extensions><gpxtpx:TrackPointExtension>'
+                  f'<gpxtpx:hr>{p["heart_rate"]}</gpxtpx:hr></gpxtpx:TrackPointExtension></extensions></trkpt>\n')
+    out.write("</trkseg></trk></gpx>\n")
+    return out.getvalue().encode()
+
+
+def write_tcx(points) -> bytes:
+    out = io.StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<TrainingCenterDatabase '
+              'xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"><Activities>'
+              '<Activity Sport="Running"><Lap><AverageHeartRateBpm><Value>150</Value></AverageHeartRateBpm>'
+              '<Track>\n')
+    for p in points:
+        out.write(f'<Trackpoint><Time>{p["time"]:%Y-%m-%dT%H:%M:%SZ}</Time><Position>'
+                  f'<LatitudeDegrees>{p["lat"]:.7f}</LatitudeDegrees><LongitudeDegrees>{p["lon"]:.7f}'
+                  f'</LongitudeDegrees></Position><AltitudeMeters>{p["altitude"]:.1f}</AltitudeMeters>'
+                  f'<DistanceMeters>{p["distance"]:.1f}</DistanceMeters><HeartRateBpm><Value>{p["heart_rate"]}'
+                  f'</Value></HeartRateBpm></Trackpoint>\n')
+    out.write("</Track></Lap></Activity></Activities></TrainingCenterDatabase>\n")
+    return out.getvalue().encode()
+
+
+def write_fit(points) -> bytes:
+    """Minimal FIT: a session definition/message for the sport and one record per point"""
+    body = io.BytesIO()
+    # Session (global 18): sport (field 5, enum)
+    body.write(struct.pack("<BBBHB", 0x40 | 1, 0, 0, 18, 1) + bytes([5, 1, 0x00]))
+    body.write(struct.pack("<BB", 1, 1))
+    # Record (global 20): timestamp, lat, long, enhanced_altitude, heart_rate, distance
+    fields = [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (78, 4, 0x86), (3, 1, 0x02), (5, 4, 0x86)]
+    body.write(struct.pack("<BBBHB", 0x40, 0, 0, 20, len(fields)) + bytes(b for f in fields for b in f))
+    record = struct.Struct("<BIiiIBI")
+    for p in points:
+        body.write(record.pack(
+            0, int(p["time"].timestamp()) - FIT_EPOCH,
+            round(p["lat"] / 180 * 2 ** 31), round(p["lon"] / 180 * 2 ** 31),
+            round((p["altitude"] + 500) * 5), p["heart_rate"], round(p["distance"] * 100)
+        ))
+    data = body.getvalue()
+    header = struct.pack("<BBHI4sH", 14, 0x20, 2132, len(data), b".FIT", 0)
+    return header + data + b"\x00\x00"
+
+
+WRITERS = {"fit": write_fit, "gpx": write_gpx, "tcx": write_tcx}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--write-dir", help="Also save the generated files here")
+    args = parser.parse_args()
+
+    seconds = int(args.hours * 3600)
+    results = {}
+    for name, writer in WRITERS.items():
+        data = writer(synthetic_points(seconds))
+        if args.write_dir:
+            os.makedirs(args.write_dir, exist_ok=True)
+            with open(os.path.join(args.write_dir, f"bench.{name}"), "wb") as f:
+                f.write(data)
+
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            summary = analyze(read_activity(io.BytesIO(data), f"bench.{name}"), max_hr=190, resting_hr=50)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        analyze(read_activity(io.BytesIO(data), f"bench.{name}"), max_hr=190, resting_hr=50)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "file_bytes": len(data),
+            "points": summary["samples"],
+            "median_ms": round(statistics.median(timings) * 1000, 1),
+            "peak_memory_kb": round(peak / 1024),
+            "distance_m": summary["distance_m"],
+            "trimp": summary["trimp"],
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Auth CPU cost per active user per day: password logins vs refresh-token rotation.
+
+Measures one bcrypt verify (what every POST /api/auth/login pays) and the
+crypto work of POST /api/auth/refresh (HMAC lookup key, new random token,
+JWT signing), then models a day of use: the client needs a fresh access
+token every ACCESS_TOKEN_EXPIRE_MINUTES while the app is in use.
+
+    python -m benchmarks.auth_cost --active-hours 14
+"""
+import argparse
+import math
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/forathlete")
+os.environ.setdefault("SECRET_KEY", "auth-cost-benchmark")
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import (  # noqa: E402
+    create_access_token, create_refresh_token, get_password_hash, hash_refresh_token, verify_password
+)
+
+
+def per_call_ms(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--active-hours", type=float, default=14, help="Hours per day the app is in use")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("correct horse battery staple")
+    bcrypt_ms = per_call_ms(lambda: verify_password("correct horse battery staple", hashed), args.iterations)
+
+    def refresh_work():
+        hash_refresh_token(create_refresh_token())  # stored token lookup key
+        hash_refresh_token(create_refresh_token())  # rotated token
+        create_access_token({"sub": "athlete@example.com"})
+
+    refresh_ms = per_call_ms(refresh_work, args.iterations * 100)
+
+    renewals = math.ceil(args.active_hours * 60 / settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    before_ms = renewals * bcrypt_ms
+    # Worst case: one password login per refresh-token lifetime, every renewal via /refresh
+    after_ms = renewals * refresh_ms + bcrypt_ms / settings.REFRESH_TOKEN_EXPIRE_DAYS
+
+    print(f"bcrypt verify:            {bcrypt_ms:8.2f} ms")
+    print(f"refresh crypto:           {refresh_ms:8.3f} ms")
+    print(f"token renewals per day:   {renewals:8d}  ({args.active_hours:g}h active, "
+          f"{settings.ACCESS_TOKEN_EXPIRE_MINUTES}min access tokens)")
+    print(f"auth CPU per user-day:    {before_ms:8.1f} ms with password logins")
+    print(f"                          {after_ms:8.1f} ms with refresh tokens "
+          f"({(1 - after_ms / before_ms) * 100:.1f}% less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Diff two load-test reports produced by `benchmarks.load_test`.
+
+    python -m benchmarks.compare bench-base.json bench-head.json [--threshold 10]
+
+Prints p50/p95/p99 and throughput per endpoint with the relative change, and
+exits non-zero when any endpoint's p95 regressed by more than --threshold
+percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta'].get('commit')}  ->  head {head['meta'].get('commit')}")
+    print(f"{'endpoint':<48}" + "".join(f"{m:>24}" for m in METRICS))
+
+    regressions = []
+    for key in sorted(set(base["endpoints"]) | set(head["endpoints"])):
+        before = base["endpoints"].get(key)
+        after = head["endpoints"].get(key)
+        if before is None or after is None:
+            print(f"{key:<48}{'only in ' + ('head' if before is None else 'base'):>24}")
+            continue
+
+        cells = []
+        for metric in METRICS:
+            change = _change(before[metric], after[metric])
+            cells.append(f"{before[metric]:>8.1f} -> {after[metric]:>7.1f} {change:+5.0f}%")
+        print(f"{key:<48}" + "".join(f"{c:>24}" for c in cells))
+
+        if _change(before["p95_ms"], after["p95_ms"]) > args.threshold:
+            regressions.append(key)
+
+    if regressions:
+        print(f"\np95 regressed more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Local OpenAI-compatible chat completions server for benchmarks.
+
+Answers POST /v1/chat/completions with canned but well-formed content in
+the shape each coach prompt asks for (day descriptions for a week, the same
+keyed by week number for a block batch, a single workout, recommendation
+text). Every response waits `latency_ms` (time to first token) plus
+`completion_tokens / tokens_per_second`, so the API sees realistic LLM timing
+without any network access or cost.
+
+    python -m benchmarks.fake_llm --port 9100 --latency-ms 600 --tokens-per-second 80
+
+Point the API at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1.
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+WEEK_TEMPLATE = [
+    ("run", "Easy Z2 run, conversational pace, finish with 4x20s strides", 45),
+    ("badminton", "Scheduled badminton training session", 90),
+    ("run", "Threshold: 15min warm-up, 3x10min at LT pace with 2min jog, 10min cool-down", 60),
+    ("strength", "Lower-body strength: squats, RDLs, split squats, plus 15min core", 40),
+    ("rest", "Full rest or 20min mobility", 0),
+    ("run", "Long run in Z2, steady effort, fuel every 30min", 90),
+    ("badminton", "Scheduled badminton match play", 120),
+]
+
+WEEK_KEYS = re.compile(r"keyed by week number \(([^)]*)\)")
+WEEK_HEADER = re.compile(r"^WEEK (\d+) ", re.MULTILINE)
+SCHEDULE_LINE = re.compile(rf"^({'|'.join(DAYS)}): (.+)$", re.MULTILINE)
+
+RECOMMENDATION = (
+    "Recovery looks solid: sleep and energy are in a good range and soreness is low, "
+    "so go ahead with the planned session as written. Keep the easy parts genuinely "
+    "easy and cut the main set by one rep if your legs feel flat in the warm-up."
+)
+
+
+def _workout(day_index: int) -> dict:
+    workout_type, description, duration = WEEK_TEMPLATE[day_index % 7]
+    return {
+        "type": workout_type,
+        "workout": description,
+        "duration_minutes": duration,
+        "notes": "Placed to keep hard sessions away from hard badminton days.",
+    }
+
+
+def _descriptions(schedule: str) -> dict:
+    """{"monday": {"workout", "notes"}, ...} written around the scheduled sessions"""
+    sessions = dict(SCHEDULE_LINE.findall(schedule))
+    return {
+        day: {
+            "workout": f"{sessions.get(day, WEEK_TEMPLATE[i][1])}. Start with 10min easy and drills, "
+                       "keep the effort controlled and finish with 5min walking.",
+            "notes": "Placed to keep hard sessions away from hard badminton days.",
+        }
+        for i, day in enumerate(DAYS)
+    }
+
+
+def build_content(messages: list) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    prompt = " ".join(m.get("content", "") for m in messages if m.get("role") == "user")
+    if "training plans" in system:
+        keys = WEEK_KEYS.search(prompt)
+        if keys:
+            # Block batch: each WEEK n section holds that week's schedule
+            sections = dict(zip(WEEK_HEADER.findall(prompt), WEEK_HEADER.split(prompt)[2::2]))
+            return json.dumps({key: _descriptions(sections.get(key, ""))
+                               for key in re.findall(r'"(\d+)"', keys.group(1))})
+        return json.dumps(_descriptions(prompt))
+    if "workouts" in system:
+        # Single-day regeneration or recovery adjustment
+        return json.dumps(_workout(int(time.time()) % 7))
+    return RECOMMENDATION
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(latency_ms: float, tokens_per_second: float) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        content = build_content(messages)
+
+        completion_tokens = estimate_tokens(content)
+        if body.get("max_tokens"):
+            completion_tokens = min(completion_tokens, body["max_tokens"])
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+
+        delay = latency_ms / 1000
+        if tokens_per_second > 0:
+            delay += completion_tokens / tokens_per_second
+        await asyncio.sleep(delay)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model"}]}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=600, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="0 disables the generation delay")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency_ms, args.tokens_per_second), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
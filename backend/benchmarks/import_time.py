@@ -0,0 +1,89 @@
+"""
+Import-time report for the API, built from `python -X importtime`.
+
+Imports the target module in a fresh interpreter and summarizes the result:
+cumulative time per app module, and cumulative time of each third-party
+top-level package the first time the app pulls it in.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module app.routes.coach --top 15 --json imports.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.load_test import BACKEND_DIR
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def collect(module: str) -> list:
+    """Return (module, self_us, cumulative_us, depth) rows in import order"""
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://localhost/forathlete")
+    env.setdefault("SECRET_KEY", "import-time-report")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def summarize(rows: list) -> dict:
+    app_modules = {}
+    packages = defaultdict(int)
+    for name, self_us, cumulative_us, depth in rows:
+        top = name.split(".")[0]
+        if top == "app":
+            app_modules[name] = {"self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+        elif name == top:
+            # Only the outermost import of a package carries its whole cost
+            packages[top] = max(packages[top], cumulative_us)
+
+    total_us = sum(cumulative_us for _, _, cumulative_us, depth in rows if depth == 0)
+    return {
+        "total_ms": total_us / 1000,
+        "app_modules": app_modules,
+        "packages": {name: us / 1000 for name, us in packages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=10, help="Rows per section")
+    parser.add_argument("--json", dest="json_path", help="Write the full summary to this file")
+    args = parser.parse_args()
+
+    summary = summarize(collect(args.module))
+
+    print(f"import {args.module}: {summary['total_ms']:.1f}ms\n")
+    print(f"{'app module':<40}{'self ms':>10}{'cumul ms':>10}")
+    app_rows = sorted(summary["app_modules"].items(), key=lambda kv: -kv[1]["cumulative_ms"])
+    for name, timing in app_rows[:args.top]:
+        print(f"{name:<40}{timing['self_ms']:>10.1f}{timing['cumulative_ms']:>10.1f}")
+
+    print(f"\n{'package':<40}{'cumul ms':>20}")
+    for name, ms in sorted(summary["packages"].items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<40}{ms:>20.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
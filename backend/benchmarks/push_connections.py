@@ -0,0 +1,270 @@
+"""
+Push channel capacity: thousands of idle WebSocket (or SSE) connections on
+one uvicorn worker.
+
+Boots the API against a local Postgres database, creates one user per
+connection, opens every connection, holds them idle through a few
+heartbeats and then fans out NOTIFY events to a sample of users. Reports
+connect time, worker memory per connection, heartbeats received, failed or
+dropped connections and NOTIFY-to-client delivery latency as JSON.
+
+    python -m benchmarks.push_connections --database-url postgresql://localhost/forathlete_bench \\
+        --connections 5000 --hold 30 --heartbeat 5
+
+Each connection is a file descriptor on both sides, so raise `ulimit -n`
+first (the script lifts its own soft limit to the hard limit). Without
+--database-url a throwaway Postgres is started with testcontainers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import timedelta
+from typing import List, Tuple
+
+import httpx
+
+from benchmarks.load_test import _database, _free_port, _process, percentile, prepare_schema
+
+
+def _raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def _rss_kb(pid: int) -> int:
+    """Resident memory of a process plus its children (uvicorn --workers forks)"""
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            if int(entry) != pid and parent != pid:
+                continue
+            with open(f"/proc/{entry}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, ValueError, IndexError):
+            continue
+    return total
+
+
+def create_users(database_url: str, count: int) -> Tuple[List[str], List[str]]:
+    """Insert bench users straight into the table (signup would be bcrypt-bound); returns (ids, tokens)"""
+    from sqlalchemy import create_engine, text
+    from app.core.security import create_access_token
+
+    emails = [f"push-bench-{i}@example.com" for i in range(count)]
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO users (id, email, name, hashed_password) "
+                 "SELECT gen_random_uuid(), email, 'Push Bench', 'x' FROM unnest(CAST(:emails AS text[])) AS email "
+                 "ON CONFLICT (email) DO NOTHING"),
+            {"emails": emails}
+        )
+        ids = dict(connection.execute(
+            text("SELECT email, id::text FROM users WHERE email = ANY(:emails)"), {"emails": emails}
+        ).all())
+    engine.dispose()
+    tokens = [create_access_token({"sub": email}, timedelta(hours=2)) for email in emails]
+    return [ids[email] for email in emails], tokens
+
+
+class Connection:
+    def __init__(self, index: int, user_id: str):
+        self.index = index
+        self.user_id = user_id
+        self.pings = 0
+        self.events = {}  # event marker -> receive time
+        self.closed_early = False
+
+
+async def _ws_client(base_url: str, token: str, conn: Connection, ready: asyncio.Event, stop: asyncio.Event):
+    import websockets
+
+    url = base_url.replace("http", "ws", 1) + f"/api/events/ws?token={token}"
+    async with websockets.connect(url, ping_interval=None, max_queue=64) as socket:
+        ready.set()
+        receiver = asyncio.ensure_future(_ws_receive(socket, conn))
+        await stop.wait()
+        receiver.cancel()
+
+
+async def _ws_receive(socket, conn: Connection):
+    try:
+        async for message in socket:
+            _record(conn, json.loads(message))
+    except Exception:
+        pass
+    conn.closed_early = True
+
+
+async def _sse_client(client: httpx.AsyncClient, token: str, conn: Connection, ready: asyncio.Event,
+                      stop: asyncio.Event):
+    async with client.stream("GET", "/api/events/stream", headers={"Authorization": f"Bearer {token}"}) as response:
+        response.raise_for_status()
+        ready.set()
+
+        async def receive():
+            try:
+                async for line in response.aiter_lines():
+                    if line.startswith(": ping"):
+                        conn.pings += 1
+                    elif line.startswith("data: "):
+                        _record(conn, json.loads(line[6:]))
+            except Exception:
+                pass
+            conn.closed_early = True
+
+        receiver = asyncio.ensure_future(receive())
+        await stop.wait()
+        receiver.cancel()
+
+
+def _record(conn: Connection, event: dict):
+    if event.get("type") == "ping":
+        conn.pings += 1
+    elif event.get("type") == "bench":
+        conn.events[event["data"]["marker"]] = time.perf_counter()
+
+
+async def run(base_url: str, database_url: str, user_ids: List[str], tokens: List[str], args, server_pid: int):
+    connections = [Connection(i, user_id) for i, user_id in enumerate(user_ids)]
+    stop = asyncio.Event()
+    opened = asyncio.Semaphore(args.connect_concurrency)
+    failures = 0
+    connect_times = []
+    baseline_kb = _rss_kb(server_pid)
+
+    client = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(30, read=None),
+                               limits=httpx.Limits(max_connections=None, max_keepalive_connections=0))
+
+    async def open_one(conn: Connection):
+        nonlocal failures
+        ready = asyncio.Event()
+        async with opened:
+            start = time.perf_counter()
+            if args.transport == "ws":
+                task = asyncio.ensure_future(_ws_client(base_url, tokens[conn.index], conn, ready, stop))
+            else:
+                task = asyncio.ensure_future(_sse_client(client, tokens[conn.index], conn, ready, stop))
+            ready_wait = asyncio.ensure_future(ready.wait())
+            await asyncio.wait([task, ready_wait], return_when=asyncio.FIRST_COMPLETED)
+            if not ready.is_set():
+                ready_wait.cancel()
+                failures += 1
+                if task.exception() is not None and failures <= 3:
+                    print(f"Connection failed: {task.exception()!r}", file=sys.stderr)
+                return None
+            connect_times.append(time.perf_counter() - start)
+        return task
+
+    print(f"Opening {len(connections)} {args.transport} connections", file=sys.stderr)
+    started = time.perf_counter()
+    tasks = [task for task in await asyncio.gather(*(open_one(conn) for conn in connections)) if task]
+    open_seconds = time.perf_counter() - started
+    open_kb = _rss_kb(server_pid)
+
+    print(f"Holding {len(tasks)} idle connections for {args.hold}s", file=sys.stderr)
+    await asyncio.sleep(args.hold)
+    held_kb = _rss_kb(server_pid)
+
+    # Fan-out: NOTIFY from the database, as a committed write would
+    import psycopg2
+
+    sample = random.Random(1).sample(connections, min(args.notify_users, len(connections)))
+    sent = {}
+    notifier = psycopg2.connect(database_url)
+    notifier.autocommit = True
+    with notifier.cursor() as cursor:
+        for conn in sample:
+            marker = f"m{conn.index}"
+            payload = json.dumps({"user_id": conn.user_id, "type": "bench", "data": {"marker": marker}})
+            sent[marker] = (conn, time.perf_counter())
+            cursor.execute("SELECT pg_notify('user_events', %s)", (payload,))
+    notifier.close()
+    await asyncio.sleep(2)
+
+    latencies = sorted((conn.events[marker] - sent_at) * 1000 for marker, (conn, sent_at) in sent.items()
+                       if marker in conn.events)
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await client.aclose()
+
+    opened_count = len(tasks)
+    pings = [conn.pings for conn in connections]
+    return {
+        "transport": args.transport,
+        "connections_requested": len(connections),
+        "connections_opened": opened_count,
+        "connections_failed": failures,
+        "closed_early": sum(conn.closed_early for conn in connections),
+        "open_seconds": round(open_seconds, 2),
+        "connect_p50_ms": round(percentile(sorted(t * 1000 for t in connect_times), 50), 1) if connect_times else None,
+        "connect_p99_ms": round(percentile(sorted(t * 1000 for t in connect_times), 99), 1) if connect_times else None,
+        "server_rss_mb": {"baseline": round(baseline_kb / 1024, 1), "open": round(open_kb / 1024, 1),
+                          "after_hold": round(held_kb / 1024, 1)},
+        "server_kb_per_connection": round((held_kb - baseline_kb) / opened_count, 1) if opened_count else None,
+        "heartbeats_per_connection": {"min": min(pings), "median": statistics.median(pings), "max": max(pings)},
+        "notify_sent": len(sent),
+        "notify_delivered": len(latencies),
+        "notify_p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "notify_p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Local Postgres to benchmark against")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--transport", choices=["ws", "sse"], default="ws")
+    parser.add_argument("--hold", type=float, default=30, help="Seconds to keep the connections idle")
+    parser.add_argument("--heartbeat", type=float, default=5, help="PUSH_HEARTBEAT_SECONDS for the server")
+    parser.add_argument("--notify-users", type=int, default=500, help="Users to send an event to after the hold")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    limit = _raise_fd_limit()
+    if limit < args.connections * 2 + 100:
+        print(f"Warning: open file limit {limit} is low for {args.connections} connections", file=sys.stderr)
+
+    with _database(args.database_url) as database_url:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = database_url
+        env.setdefault("SECRET_KEY", "bench-secret")
+        env["PUSH_MAX_CONNECTIONS"] = str(args.connections + 100)
+        env["PUSH_HEARTBEAT_SECONDS"] = str(args.heartbeat)
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["SECRET_KEY"] = env["SECRET_KEY"]
+        prepare_schema(database_url, reset=False)
+        user_ids, tokens = create_users(database_url, args.connections)
+
+        port = _free_port()
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning", "--backlog", "4096"]
+        with _process(cmd, env, f"http://127.0.0.1:{port}/health") as server:
+            report = asyncio.run(run(f"http://127.0.0.1:{port}", database_url, user_ids, tokens, args, server.pid))
+
+    report["workers"] = args.workers
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
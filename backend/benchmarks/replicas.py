@@ -0,0 +1,139 @@
+"""
+Two local Postgres instances (primary + streaming replica) for trying out
+read-replica routing, and a check that routing and lag detection work.
+
+Needs the Postgres server binaries (initdb, pg_ctl, pg_basebackup) on PATH.
+
+    python -m benchmarks.replicas start --dir /tmp/forathlete-pg
+    # prints DATABASE_URL / DATABASE_REPLICA_URL / CACHE_BACKEND to export for uvicorn or the load test
+    python -m benchmarks.replicas check --dir /tmp/forathlete-pg
+    python -m benchmarks.replicas stop --dir /tmp/forathlete-pg
+
+`check` creates a table on the primary, measures how long a write takes to
+show up on the replica, then pauses WAL replay to confirm that a lagging
+replica is skipped and that a user who just wrote reads from the primary.
+"""
+import argparse
+import os
+import subprocess
+import time
+
+DATABASE = "forathlete"
+
+
+def _urls(args):
+    primary = f"postgresql://{args.user}@127.0.0.1:{args.primary_port}/{DATABASE}"
+    replica = f"postgresql://{args.user}@127.0.0.1:{args.replica_port}/{DATABASE}"
+    return primary, replica
+
+
+def _run(*command):
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+
+def start(args):
+    primary_dir = os.path.join(args.dir, "primary")
+    replica_dir = os.path.join(args.dir, "replica")
+    os.makedirs(args.dir, exist_ok=True)
+
+    if not os.path.exists(primary_dir):
+        _run("initdb", "-D", primary_dir, "-U", args.user, "--auth=trust")
+        with open(os.path.join(primary_dir, "postgresql.conf"), "a") as f:
+            f.write("\nwal_level = replica\nmax_wal_senders = 4\nhot_standby = on\n")
+        with open(os.path.join(primary_dir, "pg_hba.conf"), "a") as f:
+            f.write("\nhost replication all 127.0.0.1/32 trust\n")
+    _run("pg_ctl", "-D", primary_dir, "-o", f"-p {args.primary_port} -k {args.dir}", "-l",
+         os.path.join(args.dir, "primary.log"), "-w", "start")
+    subprocess.run(["createdb", "-h", "127.0.0.1", "-p", str(args.primary_port), "-U", args.user, DATABASE],
+                   stderr=subprocess.DEVNULL)
+
+    if not os.path.exists(replica_dir):
+        # -R writes standby.signal and primary_conninfo, so the copy starts as a streaming replica
+        _run("pg_basebackup", "-h", "127.0.0.1", "-p", str(args.primary_port), "-U", args.user,
+             "-D", replica_dir, "-R", "-X", "stream")
+    _run("pg_ctl", "-D", replica_dir, "-o", f"-p {args.replica_port} -k {args.dir}", "-l",
+         os.path.join(args.dir, "replica.log"), "-w", "start")
+
+    primary, replica = _urls(args)
+    print(f"export DATABASE_URL={primary}")
+    print(f"export DATABASE_REPLICA_URL={replica}")
+    print("export CACHE_BACKEND=postgres")
+
+
+def stop(args):
+    for name in ("replica", "primary"):
+        path = os.path.join(args.dir, name)
+        if os.path.exists(path):
+            subprocess.run(["pg_ctl", "-D", path, "-m", "fast", "stop"])
+
+
+def check(args):
+    primary, replica = _urls(args)
+    os.environ.update({
+        "DATABASE_URL": primary,
+        "DATABASE_REPLICA_URL": replica,
+        "CACHE_BACKEND": "postgres",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "replica-check"),
+        "REPLICA_LAG_CHECK_SECONDS": "0",
+        "REPLICA_MAX_LAG_SECONDS": str(args.max_lag),
+    })
+    from sqlalchemy import text
+    from app.core import replicas
+    from app.core.database import get_engine, get_replica_engine
+    from app.models.cache import CacheEntry, CacheNamespace
+
+    # The sticky window lives in the postgres cache
+    CacheEntry.metadata.create_all(get_engine(), tables=[CacheEntry.__table__, CacheNamespace.__table__])
+    with get_engine().begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS replica_check (id serial PRIMARY KEY, at timestamptz)"))
+
+    # Replication delay for one small write
+    with get_engine().begin() as conn:
+        row_id = conn.execute(text("INSERT INTO replica_check (at) VALUES (now()) RETURNING id")).scalar()
+    start_time = time.perf_counter()
+    while True:
+        with get_replica_engine().connect() as conn:
+            if conn.execute(text("SELECT 1 FROM replica_check WHERE id = :id"), {"id": row_id}).first():
+                break
+        if time.perf_counter() - start_time > 10:
+            raise SystemExit("Write never reached the replica: is it streaming from the primary?")
+        time.sleep(0.005)
+    print(f"write visible on replica after {(time.perf_counter() - start_time) * 1000:.1f}ms")
+    print(f"lag while idle: {replicas.replica_lag():.3f}s, routed to replica: {replicas.use_replica('someone')}")
+
+    # Read-your-writes: a user who just wrote stays on the primary
+    replicas.record_write("writer")
+    print(f"just wrote -> routed to replica: {replicas.use_replica('writer')} (expected False)")
+
+    # Lag: pause replay, keep writing on the primary, and the replica falls behind
+    with get_replica_engine().connect() as conn:
+        conn.execute(text("SELECT pg_wal_replay_pause()"))
+        conn.commit()
+    try:
+        deadline = time.perf_counter() + args.max_lag + 2
+        while time.perf_counter() < deadline:
+            with get_engine().begin() as conn:
+                conn.execute(text("INSERT INTO replica_check (at) VALUES (now())"))
+            time.sleep(0.2)
+        print(f"replay paused: lag {replicas.replica_lag():.2f}s, "
+              f"routed to replica: {replicas.use_replica('someone')} (expected False)")
+    finally:
+        with get_replica_engine().connect() as conn:
+            conn.execute(text("SELECT pg_wal_replay_resume()"))
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("start", "check", "stop"))
+    parser.add_argument("--dir", default="/tmp/forathlete-pg", help="Data directories and logs")
+    parser.add_argument("--primary-port", type=int, default=5433)
+    parser.add_argument("--replica-port", type=int, default=5434)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--max-lag", type=float, default=1.0, help="REPLICA_MAX_LAG_SECONDS for the check")
+    args = parser.parse_args()
+    {"start": start, "check": check, "stop": stop}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Serialization benchmark: default FastAPI response path vs orjson / single-pass
+pydantic serialization, plus bytes on the wire with gzip and brotli.
+
+Run from the backend directory:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --iterations 500 --json results.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import List
+
+import brotli
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.responses import serialize
+from app.routes.coach import TrainingPlanResponse
+from app.schemas.checkin import DailyCheckinResponse
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def make_plan() -> dict:
+    """A week plan with prose of the length gpt-4o typically returns"""
+    start = date(2025, 10, 6)
+    plan = {}
+    for i, day in enumerate(DAYS):
+        plan[day] = {
+            "type": ["run", "badminton", "strength", "run", "rest", "run", "badminton"][i],
+            "workout": (
+                "Warm-up 15min easy Z2 jog with 4x20s strides and dynamic drills "
+                "(leg swings, A-skips, B-skips). Main set: 5x1000m at 5K effort "
+                "(HR 90-95% HRmax by rep end) with 2min jog recoveries. Cool-down "
+                "10min easy jog followed by 10min core: planks, bird dogs, V-ups. "
+            ) * 2,
+            "duration_minutes": 45 + i * 5,
+            "notes": (
+                "Scheduled away from competition badminton so legs are fresh for "
+                "quality. Keep the recoveries honest and stop if form degrades. "
+            ) * 2,
+            "date": (start + timedelta(days=i)).isoformat(),
+        }
+    return plan
+
+
+def make_history(days: int = 365) -> List[SimpleNamespace]:
+    """ORM-like check-in rows, one per day"""
+    user_id = uuid.uuid4()
+    today = date(2025, 10, 5)
+    rows = []
+    for i in range(days):
+        rows.append(SimpleNamespace(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            date=today - timedelta(days=i),
+            hrv=55 + i % 20,
+            rhr=48 + i % 7,
+            sleep_hours=7 + (i % 3) * 0.5,
+            sleep_quality=1 + i % 5,
+            soreness_level=1 + i % 5,
+            soreness_areas=["quads", "calves"] if i % 4 == 0 else None,
+            energy_level=1 + (i + 2) % 5,
+            notes="Felt heavy after yesterday's match" if i % 6 == 0 else None,
+            created_at=datetime(2025, 10, 5, 7, 30, tzinfo=timezone.utc) - timedelta(days=i),
+        ))
+    return rows
+
+
+_loop = asyncio.new_event_loop()
+
+
+def baseline_body(field, content) -> bytes:
+    """What FastAPI does by default: validate response_model, jsonable_encoder, json.dumps"""
+    value = _loop.run_until_complete(serialize_response(field=field, response_content=content))
+    return JSONResponse(value).body
+
+
+def timed(fn, iterations: int) -> float:
+    fn()  # warm caches (TypeAdapters, pydantic validators)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def wire_sizes(body: bytes) -> dict:
+    return {
+        "raw": len(body),
+        "gzip": len(gzip.compress(body, compresslevel=9)),
+        "brotli": len(brotli.compress(body, quality=4)),
+    }
+
+
+def run(iterations: int) -> dict:
+    plan = {"plan": make_plan(), "generated_at": datetime.now(timezone.utc).isoformat()}
+    history = make_history()
+
+    plan_field = create_model_field("plan", TrainingPlanResponse, mode="serialization")
+    history_field = create_model_field("history", List[DailyCheckinResponse], mode="serialization")
+
+    cases = {
+        "full_plan": {
+            "default": lambda: baseline_body(plan_field, plan),
+            "optimized": lambda: ORJSONResponse(plan).body,
+        },
+        "history_365": {
+            "default": lambda: baseline_body(history_field, history),
+            "optimized": lambda: serialize(List[DailyCheckinResponse], history),
+        },
+    }
+
+    results = {}
+    for name, variants in cases.items():
+        results[name] = {}
+        for variant, fn in variants.items():
+            results[name][variant] = {
+                "ms_per_response": round(timed(fn, iterations), 4),
+                "bytes": wire_sizes(fn()),
+            }
+        default_ms = results[name]["default"]["ms_per_response"]
+        optimized_ms = results[name]["optimized"]["ms_per_response"]
+        results[name]["speedup"] = round(default_ms / optimized_ms, 2) if optimized_ms else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+
+    print(f"{'payload':<14}{'variant':<11}{'ms':>10}{'raw B':>10}{'gzip B':>10}{'br B':>10}")
+    for name, variants in results.items():
+        for variant in ("default", "optimized"):
+            r = variants[variant]
+            b = r["bytes"]
+            print(f"{name:<14}{variant:<11}{r['ms_per_response']:>10.3f}{b['raw']:>10}{b['gzip']:>10}{b['brotli']:>10}")
+        print(f"{'':<14}{'speedup':<11}{variants['speedup']:>10}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start benchmark: time from launching uvicorn to the first successful response.
+
+Each run starts a fresh `uvicorn app.main:app` process and polls the target
+path as fast as possible. No database or LLM is needed for the default
+/health target because both are created on first use.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --path /openapi.json --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_test import BACKEND_DIR, _free_port
+
+
+def time_to_first_response(path: str, env: dict, timeout: float) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                try:
+                    if client.get(url).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://localhost/forathlete")
+    env.setdefault("SECRET_KEY", "startup-benchmark")
+
+    samples = [time_to_first_response(args.path, env, args.timeout) * 1000 for _ in range(args.runs)]
+    result = {
+        "path": args.path,
+        "runs": args.runs,
+        "min_ms": round(min(samples), 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+    print(f"time to first response for {args.path}: "
+          f"min {result['min_ms']}ms, median {result['median_ms']}ms, max {result['max_ms']}ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Settings are required at first use; nothing here connects to this database
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/forathlete")
+os.environ.setdefault("SECRET_KEY", "test")
+
+
+@pytest.fixture
+def pg():
+    """A session on TEST_DATABASE_URL inside a transaction that is rolled back"""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        yield Session(bind=connection)
+        transaction.rollback()
+    engine.dispose()
@@ -0,0 +1,28 @@
+import pytest
+
+from app.services import performance
+
+
+@pytest.mark.parametrize("label, metres", [
+    ("5K", 5000),
+    ("10 km", 10000),
+    ("800m", 800),
+    ("mile", 1609.34),
+    ("1 mile", 1609.34),
+    ("10 mile", 16093.4),
+    ("10 miles", 16093.4),
+    ("Half Marathon", 21097.5),
+    ("HM", 21097.5),
+    ("marathon", 42195),
+    ("50K ultra marathon", 50000),
+    ("half marathon (21.1km)", 21100),
+    ("parkrun", None),
+    ("", None),
+])
+def test_parse_distance(label, metres):
+    expected = pytest.approx(metres) if metres is not None else None
+    assert performance.parse_distance(label) == expected
+
+
+def test_ten_miler_vdot():
+    assert performance.vdot(performance.parse_distance("10 mile"), performance.parse_time("1:10:00")) > 45
@@ -0,0 +1,49 @@
+from app.services import plan_validator, scheduler
+
+PROFILE = {
+    "badminton_sessions": [{"day": "wednesday", "duration_minutes": 90, "intensity": "hard", "type": "match"}],
+    "weekly_run_volume_target": 180,
+    "running_experience": {},
+    "preferred_run_days": ["tuesday", "saturday"],
+    "avoid_run_days": ["friday"],
+    "current_injuries": [],
+}
+
+
+def _solved(profile):
+    return scheduler.to_plan(scheduler.solve_week(profile))
+
+
+def _hard(plan, profile):
+    return [v for v in plan_validator.validate(plan, profile) if v.hard]
+
+
+def test_scheduled_week_is_valid():
+    assert _hard(_solved(PROFILE), PROFILE) == []
+
+
+def test_major_injury_counts_cross_training_toward_volume():
+    profile = dict(PROFILE, current_injuries=[{"area": "achilles", "severity": "moderate"}])
+    plan = _solved(profile)
+
+    assert plan_validator.run_minutes(plan) == 0
+    assert _hard(plan, profile) == []
+
+
+def test_major_injury_volume_is_checked_against_the_reduced_target():
+    profile = dict(PROFILE, current_injuries=[{"area": "achilles", "severity": "moderate"}])
+    plan = _solved(profile)
+    short = {day: dict(slot, duration_minutes=slot["duration_minutes"] * 3 // 4)
+             if slot["type"] == "cross-training" else slot for day, slot in plan.items()}
+
+    assert [v.code for v in _hard(short, profile)] == ["volume"]
+    assert _hard(plan_validator.repair(short, profile), profile) == []
+
+
+def test_avoid_day_run_is_repaired():
+    plan = _solved(PROFILE)
+    run_day = next(day for day, slot in plan.items() if slot["type"] == "run" and slot["session"] == "easy")
+    plan = plan_validator._swapped(plan, run_day, "friday")
+
+    assert "avoid_day" in [v.code for v in _hard(plan, PROFILE)]
+    assert _hard(plan_validator.repair(plan, PROFILE), PROFILE) == []
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core import single_flight
+
+
+class RemoteLeader(single_flight.FlightBackend):
+    """Another worker holds the lease and has already failed with `error`"""
+
+    def __init__(self, error):
+        self.result = single_flight._dump_error(error)
+
+    def claim(self, key, lease):
+        return False
+
+    def get(self, key):
+        return single_flight.FAILED, self.result
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    def leader_failed_with(error):
+        monkeypatch.setattr(single_flight, "get_backend", lambda: RemoteLeader(error))
+    return leader_failed_with
+
+
+def _not_called():
+    raise AssertionError("the waiter ran the call itself")
+
+
+def test_remote_http_error_keeps_its_status(remote):
+    remote(HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": "3"}))
+
+    with pytest.raises(HTTPException) as raised:
+        single_flight.run("test", "key", _not_called)
+
+    assert raised.value.status_code == 429
+    assert raised.value.detail == "Too many requests"
+    assert raised.value.headers == {"Retry-After": "3"}
+
+
+def test_remote_builtin_error_keeps_its_type(remote):
+    remote(ValueError("bad plan"))
+
+    with pytest.raises(ValueError, match="bad plan"):
+        single_flight.run("test", "key", _not_called)
+
+
+def test_remote_other_error_is_a_plain_exception(remote):
+    class ProviderError(Exception):
+        pass
+
+    remote(ProviderError("overloaded"))
+
+    with pytest.raises(Exception, match="overloaded") as raised:
+        single_flight.run("test", "key", _not_called)
+
+    assert type(raised.value) is Exception
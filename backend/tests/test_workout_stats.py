@@ -0,0 +1,56 @@
+import json
+import uuid
+from datetime import date
+
+from sqlalchemy import text
+
+from app.services import workout_stats
+
+USER_ID = uuid.uuid4()
+MONDAY = date(2026, 2, 23)
+
+
+def _tables(db):
+    # Temporary tables shadow the real ones for this transaction only
+    db.execute(text("""
+        CREATE TEMP TABLE training_plans (
+            user_id uuid, week_start_date date, plan_data jsonb, created_at timestamptz DEFAULT now()
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE workout_completions (
+            user_id uuid, date date, workout_type text, completed boolean, duration_minutes integer
+        ) ON COMMIT DROP
+    """))
+
+
+def _plan(db, plan_data):
+    db.execute(
+        text("INSERT INTO training_plans (user_id, week_start_date, plan_data) VALUES (:user_id, :monday, :plan)"),
+        {"user_id": USER_ID, "monday": MONDAY, "plan": json.dumps(plan_data)}
+    )
+
+
+def test_malformed_plan_days_are_tolerated(pg):
+    _tables(pg)
+    _plan(pg, {
+        "monday": {"type": "run", "duration_minutes": 45},
+        "tuesday": {"type": "run", "duration_minutes": "40.4"},
+        "wednesday": {"type": "strength", "duration_minutes": "30 min"},
+        "thursday": {"type": "run", "duration_minutes": 50, "date": "2026-02-30"},
+        "friday": {"type": "run", "duration_minutes": 20, "date": "next friday"},
+        "saturday": "long run",
+        "sunday": {"type": "rest"},
+    })
+
+    weeks = workout_stats._compute(pg, USER_ID, MONDAY, date(2026, 3, 1))
+
+    assert len(weeks) == 1
+    assert weeks[0]["planned_sessions"] == 3
+    assert weeks[0]["planned_minutes"] == 45 + 40
+    assert weeks[0]["by_type"]["strength"]["planned_minutes"] == 0
+
+
+def test_plan_that_is_not_an_object_is_skipped(pg):
+    _tables(pg)
+    _plan(pg, ["monday"])
+
+    assert workout_stats._compute(pg, USER_ID, MONDAY, date(2026, 3, 1)) == []